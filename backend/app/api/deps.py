@@ -1,19 +1,41 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.database import get_organization_by_user_id
+from app.config import settings
+from app.core.cache import get_cached_principal, cache_principal
+from app.core.token_verifier import (
+    token_verifier,
+    TokenVerificationError,
+    LocalVerificationUnavailable,
+)
 from app.utils.logger import get_logger
+from dataclasses import dataclass
+from typing import Any
 import asyncio
 from app import database
 
 logger = get_logger("deps")
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+PLAN_HIERARCHY = {"free": 0, "starter": 1, "pro": 2}
+
+@dataclass
+class Principal:
+    """Authenticated user with organization, plan and integration flags"""
+    user: Any
+    organization_id: str
+    plan: str = "free"
+    heygen_configured: bool = False
+    metricool_configured: bool = False
+
+    @property
+    def user_id(self) -> str:
+        return self.user.id
+
+async def _get_user_remote(token: str):
     """
-    Validate Supabase JWT token and return user object (calls Supabase REST verify)
-    The Supabase Python client does not expose a direct JWT verification helper, so we call auth.get_user.
+    Validate token against Supabase Auth (auth.get_user)
+    Detects revoked sessions, at the cost of one network round trip.
     """
-    token = credentials.credentials
     try:
         # supabase.auth.get_user expects a bearer token parameter in v2 client; calling in thread
         def _sync():
@@ -27,22 +49,57 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         logger.error("Auth failure", exc_info=True)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Não autenticado")
 
-async def get_current_organization(user = Depends(get_current_user)):
-    org_id = await get_organization_by_user_id(user.id)
-    if not org_id:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organização não encontrada")
-    return org_id
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Validate Supabase JWT token and return user object
+    Verifies signature/exp/aud/iss locally (JWT secret or cached JWKS); falls back to
+    Supabase REST verify only when no local key is available for the token.
+    """
+    token = credentials.credentials
+    if settings.auth_local_verification:
+        try:
+            return await token_verifier.verify(token)
+        except TokenVerificationError as e:
+            logger.warning(f"Auth failure: {e}")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido ou expirado")
+        except LocalVerificationUnavailable as e:
+            logger.debug(f"Local JWT verification unavailable, using remote: {e}")
+    return await _get_user_remote(token)
+
+async def require_active_session(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user = Depends(get_current_user)
+):
+    """
+    Revoked-session check for sensitive endpoints (credentials, account links)
+    Always confirms the token with Supabase Auth, even if it verifies locally.
+    """
+    try:
+        return await _get_user_remote(credentials.credentials)
+    except HTTPException:
+        token_verifier.forget(credentials.credentials)
+        raise
+
+async def get_current_principal(user = Depends(get_current_user)) -> Principal:
+    """
+    Resolve user -> organization -> plan/integration flags
+    Memoized per request by FastAPI's dependency cache and across requests in the
+    TTL cache (invalidated by invalidate_user_cache / invalidate_organization_cache).
+    """
+    data = await get_cached_principal(user.id)
+    if data is None:
+        data = await database.get_principal_by_user_id(user.id)
+        if not data:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organização não encontrada")
+        await cache_principal(user.id, data)
+    return Principal(user=user, **data)
+
+async def get_current_organization(principal: Principal = Depends(get_current_principal)):
+    return principal.organization_id
 
 def require_plan(min_plan: str):
-    async def plan_checker(user = Depends(get_current_user)):
-        org_id = await get_organization_by_user_id(user.id)
-        def _sync():
-            return database.supabase.table("organizations").select("plan").eq("id", org_id).single().execute()
-        res = await asyncio.to_thread(_sync)
-        data = res.data if hasattr(res, "data") else res.get("data")
-        user_plan = data.get("plan", "free") if data else "free"
-        plan_hierarchy = {"free": 0, "starter": 1, "pro": 2}
-        if plan_hierarchy.get(user_plan, 0) < plan_hierarchy.get(min_plan, 0):
+    async def plan_checker(principal: Principal = Depends(get_current_principal)):
+        if PLAN_HIERARCHY.get(principal.plan, 0) < PLAN_HIERARCHY.get(min_plan, 0):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Este recurso requer plano {min_plan}")
-        return user
+        return principal.user
     return plan_checker
@@ -25,7 +25,7 @@ from app.models.analytics import (
     BestTimesResponse,
     PlatformBreakdownResponse
 )
-from app.database import supabase
+from app.database import get_async_supabase
 from app.utils.logger import get_logger
 from app.utils.sanitize import (
     sanitize_string,
@@ -33,7 +33,6 @@ from app.utils.sanitize import (
     sanitize_enum_value,
     validate_date_format
 )
-import asyncio
 
 router = APIRouter()
 logger = get_logger("analytics")
@@ -52,10 +51,7 @@ async def _get_blog_id(org_id: str) -> int:
     Raises:
         HTTPException 404: Se organização não tem Metricool configurado
     """
-    def _sync():
-        return supabase.table("organizations").select("metricool_blog_id").eq("id", org_id).single().execute()
-    
-    org_res = await asyncio.to_thread(_sync)
+    org_res = await get_async_supabase().table("organizations").select("metricool_blog_id").eq("id", org_id).single().execute()
     org_data = org_res.data if hasattr(org_res, "data") else org_res.get("data")
     
     blog_id = org_data.get("metricool_blog_id") if org_data else None
@@ -609,49 +605,37 @@ async def get_dashboard_stats(
         start_of_last_month = (start_of_month - timedelta(days=1)).replace(day=1)
         
         # Contar scripts gerados (vídeos com recording_source='script')
-        def _count_scripts():
-            return supabase.table("videos").select(
-                "id", count="exact"
-            ).eq("organization_id", org_id).eq(
-                "recording_source", "script"
-            ).gte("created_at", start_of_month.isoformat()).execute()
-        
-        scripts_result = await asyncio.to_thread(_count_scripts)
+        scripts_result = await get_async_supabase().table("videos").select(
+            "id", count="exact"
+        ).eq("organization_id", org_id).eq(
+            "recording_source", "script"
+        ).gte("created_at", start_of_month.isoformat()).execute()
         scripts_generated = scripts_result.count if hasattr(scripts_result, "count") else 0
         
         # Contar vídeos publicados (status='ready')
-        def _count_videos():
-            return supabase.table("videos").select(
-                "id", count="exact"
-            ).eq("organization_id", org_id).eq(
-                "status", "ready"
-            ).gte("created_at", start_of_month.isoformat()).execute()
-        
-        videos_result = await asyncio.to_thread(_count_videos)
+        videos_result = await get_async_supabase().table("videos").select(
+            "id", count="exact"
+        ).eq("organization_id", org_id).eq(
+            "status", "ready"
+        ).gte("created_at", start_of_month.isoformat()).execute()
         videos_published = videos_result.count if hasattr(videos_result, "count") else 0
         
         # Contar agendamentos pendentes (posts com status='scheduled')
-        def _count_scheduled():
-            return supabase.table("posts").select(
-                "id", count="exact"
-            ).eq("organization_id", org_id).eq(
-                "status", "scheduled"
-            ).gte("scheduled_at", now.isoformat()).execute()
-        
-        scheduled_result = await asyncio.to_thread(_count_scheduled)
+        scheduled_result = await get_async_supabase().table("posts").select(
+            "id", count="exact"
+        ).eq("organization_id", org_id).eq(
+            "status", "scheduled"
+        ).gte("scheduled_at", now.isoformat()).execute()
         pending_scheduled = scheduled_result.count if hasattr(scheduled_result, "count") else 0
         
         # Calcular crescimento (comparar com mês anterior)
-        def _count_last_month():
-            return supabase.table("videos").select(
-                "id", count="exact"
-            ).eq("organization_id", org_id).eq(
-                "status", "ready"
-            ).gte("created_at", start_of_last_month.isoformat()).lt(
-                "created_at", start_of_month.isoformat()
-            ).execute()
-        
-        last_month_result = await asyncio.to_thread(_count_last_month)
+        last_month_result = await get_async_supabase().table("videos").select(
+            "id", count="exact"
+        ).eq("organization_id", org_id).eq(
+            "status", "ready"
+        ).gte("created_at", start_of_last_month.isoformat()).lt(
+            "created_at", start_of_month.isoformat()
+        ).execute()
         last_month_videos = last_month_result.count if hasattr(last_month_result, "count") else 0
         
         # Calcular percentual de crescimento
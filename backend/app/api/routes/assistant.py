@@ -20,10 +20,9 @@ from app.models.assistant import (
     ToolCallModel,
     TokenUsage
 )
-from app.database import supabase
+from app.database import get_async_supabase
 from app.utils.logger import get_logger
 from app.utils.sanitize import sanitize_string, sanitize_html
-import asyncio
 
 router = APIRouter()
 logger = get_logger("assistant")
@@ -39,10 +38,7 @@ async def _get_blog_id(org_id: str) -> int:
     Returns:
         blog_id do Metricool (pode ser None se não configurado)
     """
-    def _sync():
-        return supabase.table("organizations").select("metricool_blog_id").eq("id", org_id).single().execute()
-    
-    org_res = await asyncio.to_thread(_sync)
+    org_res = await get_async_supabase().table("organizations").select("metricool_blog_id").eq("id", org_id).single().execute()
     org_data = org_res.data if hasattr(org_res, "data") else org_res.get("data")
     
     return org_data.get("metricool_blog_id") if org_data else None
@@ -13,10 +13,9 @@ from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
 from app.api.deps import get_current_organization
-from app.database import supabase
+from app.database import get_async_supabase
 from app.utils.logger import get_logger
 from app.utils.sanitize import sanitize_string
-import asyncio
 
 router = APIRouter()
 logger = get_logger("calendar")
@@ -73,7 +72,7 @@ async def list_calendar_posts(
     
     try:
         # Construir query base
-        query = supabase.table("posts").select(
+        query = get_async_supabase().table("posts").select(
             "id, content, platform, scheduled_at, status, thumbnail_url, metricool_post_id, created_at, cancelled_at"
         ).eq("organization_id", org_id)
         
@@ -99,10 +98,7 @@ async def list_calendar_posts(
         query = query.order("scheduled_at", desc=False)
         
         # Executar query
-        def _sync_query():
-            return query.execute()
-        
-        result = await asyncio.to_thread(_sync_query)
+        result = await query.execute()
         posts = result.data if hasattr(result, "data") else result.get("data", [])
         
         return {
@@ -150,12 +146,9 @@ async def get_calendar_post(
     
     try:
         # Buscar post
-        def _sync_select():
-            return supabase.table("posts").select(
-                "id, content, platform, scheduled_at, status, thumbnail_url, metricool_post_id, created_at, cancelled_at"
-            ).eq("id", post_id).eq("organization_id", org_id).single().execute()
-        
-        result = await asyncio.to_thread(_sync_select)
+        result = await get_async_supabase().table("posts").select(
+            "id, content, platform, scheduled_at, status, thumbnail_url, metricool_post_id, created_at, cancelled_at"
+        ).eq("id", post_id).eq("organization_id", org_id).single().execute()
         post = result.data if hasattr(result, "data") else result.get("data")
         
         if not post:
@@ -223,12 +216,9 @@ async def reschedule_calendar_post(
             )
         
         # Verificar se post existe
-        def _sync_select():
-            return supabase.table("posts").select(
-                "id, metricool_post_id, status"
-            ).eq("id", post_id).eq("organization_id", org_id).single().execute()
-        
-        result = await asyncio.to_thread(_sync_select)
+        result = await get_async_supabase().table("posts").select(
+            "id, metricool_post_id, status"
+        ).eq("id", post_id).eq("organization_id", org_id).single().execute()
         post = result.data if hasattr(result, "data") else result.get("data")
         
         if not post:
@@ -247,13 +237,10 @@ async def reschedule_calendar_post(
         # Por enquanto, apenas atualizar no banco local
         
         # Atualizar post
-        def _sync_update():
-            return supabase.table("posts").update({
-                "scheduled_at": request.new_scheduled_date,
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("id", post_id).eq("organization_id", org_id).execute()
-        
-        update_result = await asyncio.to_thread(_sync_update)
+        update_result = await get_async_supabase().table("posts").update({
+            "scheduled_at": request.new_scheduled_date,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", post_id).eq("organization_id", org_id).execute()
         updated_post = update_result.data[0] if update_result.data else None
         
         if not updated_post:
@@ -314,12 +301,9 @@ async def cancel_calendar_post(
     
     try:
         # Verificar se post existe
-        def _sync_select():
-            return supabase.table("posts").select(
-                "id, metricool_post_id, status"
-            ).eq("id", post_id).eq("organization_id", org_id).single().execute()
-        
-        result = await asyncio.to_thread(_sync_select)
+        result = await get_async_supabase().table("posts").select(
+            "id, metricool_post_id, status"
+        ).eq("id", post_id).eq("organization_id", org_id).single().execute()
         post = result.data if hasattr(result, "data") else result.get("data")
         
         if not post:
@@ -344,14 +328,11 @@ async def cancel_calendar_post(
         # Por enquanto, apenas atualizar no banco local
         
         # Atualizar status para cancelled
-        def _sync_update():
-            return supabase.table("posts").update({
-                "status": "cancelled",
-                "cancelled_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("id", post_id).eq("organization_id", org_id).execute()
-        
-        await asyncio.to_thread(_sync_update)
+        await get_async_supabase().table("posts").update({
+            "status": "cancelled",
+            "cancelled_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", post_id).eq("organization_id", org_id).execute()
         
         logger.info(f"Post {post_id} cancelado com sucesso")
         
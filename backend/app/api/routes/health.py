@@ -1,6 +1,13 @@
 from fastapi import APIRouter
 from datetime import datetime
-from app.database import supabase
+from app.database import get_async_supabase, get_db_pool_stats
+from app.core.log_sink import api_log_sink
+from app.core.cache import async_cache
+from app.services.ffmpeg_scheduler import ffmpeg_scheduler
+from app.services.media_proxy import media_proxy
+from app.services.audio_analysis import audio_analyzer
+from app.services.job_workspace import workspace_manager
+from app.services.artifact_cache import artifact_cache
 from app.config import settings
 import subprocess
 import asyncio
@@ -30,9 +37,7 @@ async def health_check():
     # Check Supabase connection
     supabase_status = "connected"
     try:
-        def _sync_check():
-            return supabase.table("organizations").select("id").limit(1).execute()
-        await asyncio.to_thread(_sync_check)
+        await get_async_supabase().table("organizations").select("id").limit(1).execute()
     except Exception:
         supabase_status = "error"
     
@@ -91,7 +96,15 @@ async def health_check():
             "tavily": tavily_status,
             "claude": claude_status,
             "heygen_webhook": heygen_webhook_status
-        }
+        },
+        "db_pool": get_db_pool_stats(),
+        "api_log_queue": api_log_sink.get_stats(),
+        "cache": async_cache.get_stats(),
+        "ffmpeg_scheduler": ffmpeg_scheduler.get_stats(),
+        "media_proxy": media_proxy.get_stats(),
+        "audio_analysis": audio_analyzer.get_stats(),
+        "workspaces": workspace_manager.get_stats(),
+        "artifact_cache": artifact_cache.get_stats()
     }
 
 @router.get("/ready")
@@ -104,9 +117,7 @@ async def readiness_check():
     
     # Check Supabase
     try:
-        def _sync_check():
-            return supabase.table("organizations").select("id").limit(1).execute()
-        await asyncio.to_thread(_sync_check)
+        await get_async_supabase().table("organizations").select("id").limit(1).execute()
     except Exception as e:
         ready = False
         errors.append(f"Supabase: {str(e)}")
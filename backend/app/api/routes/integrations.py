@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from app.api.deps import get_current_organization, require_plan
+from app.api.deps import get_current_organization, require_plan, require_active_session
 from app.services.heygen import HeyGenService
 from app.services.encryption import encryption_service
-from app.database import supabase
+from app.database import get_async_supabase
+from app.core.log_sink import api_log_sink
 from app.utils.logger import get_logger
 from app.models.heygen import HeyGenCredentials, HeyGenApiKeyOnly
+from app.core.cache import ainvalidate_organization_cache
 import asyncio
 
 router = APIRouter()
@@ -101,7 +103,8 @@ async def validate_heygen_key(
 async def save_heygen_api_key(
     credentials: HeyGenApiKeyOnly,
     org_id: str = Depends(get_current_organization),
-    _: str = Depends(require_plan("pro"))
+    _: str = Depends(require_plan("pro")),
+    __ = Depends(require_active_session)
 ):
     """
     Valida e salva apenas a API Key do HeyGen (sem avatar/voz).
@@ -158,12 +161,9 @@ async def save_heygen_api_key(
         
         # 4. Executar UPDATE no banco
         logger.info("[SAVE_API_KEY] Executando UPDATE no banco...")
-        def _sync_update():
-            result = supabase.table("organizations").update(update_data).eq("id", org_id).execute()
-            logger.info(f"[SAVE_API_KEY] Resultado do UPDATE: {result}")
-            return result
-        
-        update_result = await asyncio.to_thread(_sync_update)
+        update_result = await get_async_supabase().table("organizations").update(update_data).eq("id", org_id).execute()
+        logger.info(f"[SAVE_API_KEY] Resultado do UPDATE: {update_result}")
+        await ainvalidate_organization_cache(org_id)
         logger.info(f"[SAVE_API_KEY] UPDATE concluído. Result data: {update_result.data if hasattr(update_result, 'data') else 'N/A'}")
         
         # 5. Verificar sucesso
@@ -389,7 +389,8 @@ async def validate_heygen_key_old(
 async def configure_heygen(
     credentials: HeyGenCredentials,
     org_id: str = Depends(get_current_organization),
-    _: str = Depends(require_plan("pro"))
+    _: str = Depends(require_plan("pro")),
+    __ = Depends(require_active_session)
 ):
     """
     Configura ou atualiza credenciais HeyGen da organização.
@@ -446,12 +447,9 @@ async def configure_heygen(
         
         # Salvar credenciais no banco
         logger.info("[HEYGEN_CONFIG] Executando UPDATE no banco...")
-        def _sync_update():
-            result = supabase.table("organizations").update(update_data).eq("id", org_id).execute()
-            logger.info(f"[HEYGEN_CONFIG] Resultado do UPDATE: {result}")
-            return result
-        
-        update_result = await asyncio.to_thread(_sync_update)
+        update_result = await get_async_supabase().table("organizations").update(update_data).eq("id", org_id).execute()
+        logger.info(f"[HEYGEN_CONFIG] Resultado do UPDATE: {update_result}")
+        await ainvalidate_organization_cache(org_id)
         logger.info(f"[HEYGEN_CONFIG] UPDATE concluído. Result data: {update_result.data if hasattr(update_result, 'data') else 'N/A'}")
         
         # Verificar se o update foi bem-sucedido
@@ -514,10 +512,7 @@ async def save_heygen_avatar(
         logger.info(f"[SAVE_AVATAR] Salvando avatar_id: {avatar_id} para org_id: {org_id}")
         
         # Verificar se API Key já está configurada
-        def _sync_select():
-            return supabase.table("organizations").select("heygen_api_key").eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select("heygen_api_key").eq("id", org_id).single().execute()
         data_result = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data_result or not data_result.get("heygen_api_key"):
@@ -527,12 +522,10 @@ async def save_heygen_avatar(
             )
         
         # Salvar avatar_id
-        def _sync_update():
-            return supabase.table("organizations").update({
-                "heygen_avatar_id": avatar_id
-            }).eq("id", org_id).execute()
-        
-        await asyncio.to_thread(_sync_update)
+        await get_async_supabase().table("organizations").update({
+            "heygen_avatar_id": avatar_id
+        }).eq("id", org_id).execute()
+        await ainvalidate_organization_cache(org_id)
         logger.info(f"[SAVE_AVATAR] ✅ Avatar salvo com sucesso para organização {org_id}")
         
         return {
@@ -588,10 +581,7 @@ async def save_heygen_voice(
         logger.info(f"[SAVE_VOICE] Salvando voice_id: {voice_id} para org_id: {org_id}")
         
         # Verificar se API Key já está configurada
-        def _sync_select():
-            return supabase.table("organizations").select("heygen_api_key").eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select("heygen_api_key").eq("id", org_id).single().execute()
         data_result = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data_result or not data_result.get("heygen_api_key"):
@@ -601,12 +591,10 @@ async def save_heygen_voice(
             )
         
         # Salvar voice_id
-        def _sync_update():
-            return supabase.table("organizations").update({
-                "heygen_voice_id": voice_id
-            }).eq("id", org_id).execute()
-        
-        await asyncio.to_thread(_sync_update)
+        await get_async_supabase().table("organizations").update({
+            "heygen_voice_id": voice_id
+        }).eq("id", org_id).execute()
+        await ainvalidate_organization_cache(org_id)
         logger.info(f"[SAVE_VOICE] ✅ Voz salva com sucesso para organização {org_id}")
         
         return {
@@ -649,12 +637,9 @@ async def test_heygen(
     """
     try:
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -717,12 +702,9 @@ async def get_heygen_credits(
     """
     try:
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -739,24 +721,18 @@ async def get_heygen_credits(
         credits_info = await heygen_service.get_credits(api_key)
         
         # Atualizar campos no banco
-        def _sync_update():
-            return supabase.table("organizations").update({
-                "heygen_credits_total": credits_info.get("total_credits", 0),
-                "heygen_credits_used": credits_info.get("credits_used", 0)
-            }).eq("id", org_id).execute()
-        
-        await asyncio.to_thread(_sync_update)
+        await get_async_supabase().table("organizations").update({
+            "heygen_credits_total": credits_info.get("total_credits", 0),
+            "heygen_credits_used": credits_info.get("credits_used", 0)
+        }).eq("id", org_id).execute()
         
         # Registrar chamada em api_logs
-        def _sync_log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "3",
-                "endpoint": "get_credits",
-                "status_code": 200
-            }).execute()
-        
-        await asyncio.to_thread(_sync_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "3",
+            "endpoint": "get_credits",
+            "status_code": 200
+        })
         
         remaining = credits_info.get("remaining_credits", 0)
         
@@ -813,12 +789,9 @@ async def get_heygen_avatars(
     """
     try:
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -835,15 +808,12 @@ async def get_heygen_avatars(
         result = await heygen_service.get_avatars(api_key, avatar_type=avatar_type)
         
         # Registrar chamada em api_logs
-        def _sync_log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "3",
-                "endpoint": "get_avatars",
-                "status_code": 200
-            }).execute()
-        
-        await asyncio.to_thread(_sync_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "3",
+            "endpoint": "get_avatars",
+            "status_code": 200
+        })
         
         logger.info(f"Listados {len(result.get('avatars', []))} avatares tipo '{avatar_type}' para org {org_id}")
         
@@ -892,12 +862,9 @@ async def get_heygen_voices(
     """
     try:
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -914,15 +881,12 @@ async def get_heygen_voices(
         result = await heygen_service.get_voices(api_key, language)
         
         # Registrar chamada em api_logs
-        def _sync_log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "3",
-                "endpoint": "get_voices",
-                "status_code": 200
-            }).execute()
-        
-        await asyncio.to_thread(_sync_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "3",
+            "endpoint": "get_voices",
+            "status_code": 200
+        })
         
         return result
         
@@ -964,12 +928,9 @@ async def get_heygen_credentials(
     """
     try:
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key, heygen_avatar_id, heygen_voice_id"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key, heygen_avatar_id, heygen_voice_id"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -1025,12 +986,9 @@ async def get_heygen_status(
     """
     try:
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -1065,7 +1023,8 @@ async def get_heygen_status(
 async def configure_heygen_post(
     credentials: HeyGenCredentials,
     org_id: str = Depends(get_current_organization),
-    _: str = Depends(require_plan("pro"))
+    _: str = Depends(require_plan("pro")),
+    __ = Depends(require_active_session)
 ):
     """
     Alias do PUT /heygen - configura credenciais HeyGen via POST.
@@ -1120,12 +1079,9 @@ async def test_metricool(
     """
     try:
         # Buscar credenciais Metricool da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "metricool_user_token, metricool_user_id, metricool_blog_id"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "metricool_user_token, metricool_user_id, metricool_blog_id"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("metricool_user_token"):
@@ -1169,12 +1125,9 @@ async def get_metricool_status(
     """
     try:
         # Buscar credenciais Metricool da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "metricool_user_token, metricool_blog_id"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "metricool_user_token, metricool_blog_id"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("metricool_user_token"):
@@ -1225,12 +1178,9 @@ async def list_social_accounts(
     """
     try:
         # Buscar credenciais Metricool da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "metricool_user_token, metricool_blog_id"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "metricool_user_token, metricool_blog_id"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("metricool_user_token"):
@@ -1257,7 +1207,8 @@ async def list_social_accounts(
 @router.post("/social-accounts/connect")
 async def connect_social_account(
     credentials: SocialAccountConnect,
-    org_id: str = Depends(get_current_organization)
+    org_id: str = Depends(get_current_organization),
+    _ = Depends(require_active_session)
 ):
     """
     Salva credenciais Metricool do usuário.
@@ -1274,14 +1225,12 @@ async def connect_social_account(
     """
     try:
         # Salvar credenciais na organização
-        def _sync_update():
-            return supabase.table("organizations").update({
-                "metricool_user_token": credentials.metricool_user_token,
-                "metricool_user_id": credentials.metricool_user_id,
-                "metricool_blog_id": credentials.metricool_blog_id
-            }).eq("id", org_id).execute()
-        
-        await asyncio.to_thread(_sync_update)
+        await get_async_supabase().table("organizations").update({
+            "metricool_user_token": credentials.metricool_user_token,
+            "metricool_user_id": credentials.metricool_user_id,
+            "metricool_blog_id": credentials.metricool_blog_id
+        }).eq("id", org_id).execute()
+        await ainvalidate_organization_cache(org_id)
         
         logger.info(f"Credenciais Metricool salvas para organização {org_id}")
         
@@ -1301,7 +1250,8 @@ async def connect_social_account(
 @router.delete("/social-accounts/{platform}")
 async def disconnect_social_account(
     platform: str,
-    org_id: str = Depends(get_current_organization)
+    org_id: str = Depends(get_current_organization),
+    _ = Depends(require_active_session)
 ):
     """
     Remove associação de uma plataforma específica.
@@ -7,10 +7,10 @@ from app.models.scriptai import (
     GenerateScriptRequest, RegenerateScriptRequest, ScriptResponse,
     SaveDraftRequest, UpdateDraftRequest, DraftResponse, DraftListResponse
 )
-from app.database import supabase
+from app.database import get_async_supabase
+from app.core.log_sink import api_log_sink
 from app.utils.logger import get_logger
 from datetime import datetime
-import asyncio
 import uuid
 
 router = APIRouter()
@@ -133,14 +133,12 @@ async def generate_script(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": "/generate",
-                "status_code": 200
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": "/generate",
+            "status_code": 200
+        })
 
         return ScriptResponse(
             script=script_result["script"],
@@ -266,14 +264,12 @@ async def regenerate_script(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": "/regenerate",
-                "status_code": 200
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": "/regenerate",
+            "status_code": 200
+        })
 
         return ScriptResponse(
             script=script_result["script"],
@@ -311,19 +307,16 @@ async def save_draft(
         draft_id = str(uuid.uuid4())
 
         # Inserir registro na tabela videos
-        def _insert():
-            return supabase.table("videos").insert({
-                "id": draft_id,
-                "organization_id": org_id,
-                "user_id": user.id,
-                "title": request.title,
-                "script": request.script,
-                "metadata": request.metadata,
-                "recording_source": "script",
-                "status": "draft"
-            }).execute()
-        
-        result = await asyncio.to_thread(_insert)
+        result = await get_async_supabase().table("videos").insert({
+            "id": draft_id,
+            "organization_id": org_id,
+            "user_id": user.id,
+            "title": request.title,
+            "script": request.script,
+            "metadata": request.metadata,
+            "recording_source": "script",
+            "status": "draft"
+        }).execute()
 
         if not result.data:
             raise HTTPException(
@@ -333,14 +326,12 @@ async def save_draft(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": "/drafts",
-                "status_code": 200
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": "/drafts",
+            "status_code": 200
+        })
 
         return DraftResponse(
             id=draft_id,
@@ -374,14 +365,11 @@ async def list_drafts(
     start_time = datetime.utcnow()
 
     try:
-        def _select():
-            return supabase.table("videos").select(
-                "id, title, script, metadata, created_at, updated_at"
-            ).eq("recording_source", "script").eq("status", "draft").order(
-                "created_at", desc=True
-            ).execute()
-        
-        result = await asyncio.to_thread(_select)
+        result = await get_async_supabase().table("videos").select(
+            "id, title, script, metadata, created_at, updated_at"
+        ).eq("recording_source", "script").eq("status", "draft").order(
+            "created_at", desc=True
+        ).execute()
 
         drafts = []
         for item in result.data:
@@ -397,14 +385,12 @@ async def list_drafts(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": "/drafts",
-                "status_code": 200
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": "/drafts",
+            "status_code": 200
+        })
 
         return DraftListResponse(
             drafts=drafts,
@@ -434,12 +420,9 @@ async def get_draft(
     start_time = datetime.utcnow()
 
     try:
-        def _select():
-            return supabase.table("videos").select(
-                "id, title, script, metadata, created_at, updated_at"
-            ).eq("id", draft_id).eq("recording_source", "script").eq("status", "draft").execute()
-        
-        result = await asyncio.to_thread(_select)
+        result = await get_async_supabase().table("videos").select(
+            "id, title, script, metadata, created_at, updated_at"
+        ).eq("id", draft_id).eq("recording_source", "script").eq("status", "draft").execute()
 
         if not result.data:
             raise HTTPException(
@@ -451,14 +434,12 @@ async def get_draft(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": f"/drafts/{draft_id}",
-                "status_code": 200
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": f"/drafts/{draft_id}",
+            "status_code": 200
+        })
 
         return DraftResponse(
             id=item["id"],
@@ -495,12 +476,9 @@ async def update_draft(
 
     try:
         # Verificar se o rascunho existe e pertence à organização
-        def _check():
-            return supabase.table("videos").select("id").eq(
-                "id", draft_id
-            ).eq("recording_source", "script").eq("status", "draft").execute()
-        
-        check_result = await asyncio.to_thread(_check)
+        check_result = await get_async_supabase().table("videos").select("id").eq(
+            "id", draft_id
+        ).eq("recording_source", "script").eq("status", "draft").execute()
 
         if not check_result.data:
             raise HTTPException(
@@ -519,12 +497,9 @@ async def update_draft(
             update_data["metadata"] = request.metadata
 
         # Atualizar rascunho
-        def _update():
-            return supabase.table("videos").update(
-                update_data
-            ).eq("id", draft_id).execute()
-        
-        result = await asyncio.to_thread(_update)
+        result = await get_async_supabase().table("videos").update(
+            update_data
+        ).eq("id", draft_id).execute()
 
         if not result.data:
             raise HTTPException(
@@ -536,14 +511,12 @@ async def update_draft(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": f"/drafts/{draft_id}",
-                "status_code": 200
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": f"/drafts/{draft_id}",
+            "status_code": 200
+        })
 
         return DraftResponse(
             id=item["id"],
@@ -579,12 +552,9 @@ async def delete_draft(
 
     try:
         # Deletar rascunho
-        def _delete():
-            return supabase.table("videos").delete().eq(
-                "id", draft_id
-            ).eq("recording_source", "script").eq("status", "draft").execute()
-        
-        result = await asyncio.to_thread(_delete)
+        result = await get_async_supabase().table("videos").delete().eq(
+            "id", draft_id
+        ).eq("recording_source", "script").eq("status", "draft").execute()
 
         if not result.data:
             raise HTTPException(
@@ -594,14 +564,12 @@ async def delete_draft(
 
         # Registrar em api_logs
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        def _log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "1",
-                "endpoint": f"/drafts/{draft_id}",
-                "status_code": 204
-            }).execute()
-        await asyncio.to_thread(_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "1",
+            "endpoint": f"/drafts/{draft_id}",
+            "status_code": 204
+        })
 
         return {"message": "Rascunho deletado com sucesso."}
 
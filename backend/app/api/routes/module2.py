@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Query
+from fastapi.responses import JSONResponse, FileResponse
 from typing import Optional
+from contextlib import AsyncExitStack
 import asyncio
 import os
+import re
 import uuid
 from datetime import datetime
 
-from app.api.deps import get_current_user, get_current_organization
+from app.api.deps import get_current_user, get_current_organization, get_current_principal, Principal
 from app.models.schemas import (
     VideoUploadResponse,
-    TranscriptionRequest, TranscriptionResponse,
+    TranscriptionRequest, TranscriptionResponse, WaveformResponse,
     SilenceDetectionRequest, SilenceDetectionResponse,
     VideoProcessRequest, VideoProcessResponse, VideoProcessStatus,
     DescriptionGenerateRequest, DescriptionGenerateResponse,
@@ -17,8 +19,13 @@ from app.models.schemas import (
     ScheduleRequest, ScheduleResponse
 )
 from app.services.video_processing import VideoProcessingService
+from app.services.ffmpeg_graph import RENDITION_FITS, parse_aspect_ratio
+from app.services.ffmpeg_scheduler import ffmpeg_scheduler, SchedulerQueueFull
+from app.services.media_proxy import media_proxy
+from app.services.audio_analysis import audio_analyzer
+from app.services.job_workspace import workspace_manager
 from app.services.transcription import TranscriptionService
-from app.database import supabase, log_api_call
+from app.database import supabase, get_async_supabase, log_api_call
 from app.config import settings
 from app.utils.logger import get_logger
 
@@ -45,13 +52,18 @@ PLAN_LIMITS = {
 
 ALLOWED_FORMATS = ["mp4", "mov", "avi", "webm"]
 
+# Renditions per job (each one is an extra encoder in the same FFmpeg process)
+MAX_RENDITIONS = 4
+RENDITION_NAME = re.compile(r"^[a-z0-9_-]{1,32}$")
+
 
 @router.post("/upload", response_model=VideoUploadResponse)
 async def upload_video(
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
     user = Depends(get_current_user),
-    org_id: str = Depends(get_current_organization)
+    org_id: str = Depends(get_current_organization),
+    principal: Principal = Depends(get_current_principal)
 ):
     """
     Upload video to Supabase Storage and create video record
@@ -59,12 +71,8 @@ async def upload_video(
     start_time = datetime.utcnow()
     
     try:
-        # Get organization plan
-        def _get_org():
-            return supabase.table("organizations").select("plan").eq("id", org_id).single().execute()
-        org_res = await asyncio.to_thread(_get_org)
-        org_data = org_res.data if hasattr(org_res, "data") else org_res.get("data")
-        plan = org_data.get("plan", "free") if org_data else "free"
+        # Organization plan (already resolved with the principal)
+        plan = principal.plan
         
         # Validate file format
         file_ext = file.filename.split(".")[-1].lower()
@@ -112,31 +120,36 @@ async def upload_video(
         with open(temp_path, "wb") as f:
             f.write(file_content)
         
-        metadata = await video_service.extract_metadata(temp_path)
+        # One probe + keyframe scan at upload; later stages read media_info
+        try:
+            metadata, media_info = await video_service.extract_media_info(temp_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
         
-        # Clean up temp file
-        if os.path.exists(temp_path):
+        if settings.proxy_enabled:
+            # Preview proxy + analysis audio in the background (removes the temp file when done)
+            media_proxy.schedule(video_id, temp_path, remove_source=True)
+        elif os.path.exists(temp_path):
+            # Clean up temp file
             os.remove(temp_path)
         
         # Insert video record
         video_title = title or file.filename
-        def _insert_video():
-            return supabase.table("videos").insert({
-                "id": video_id,
-                "organization_id": org_id,
-                "title": video_title,
-                "raw_url": video_url,
-                "recording_source": "upload",
-                "duration": metadata.get("duration", 0),
-                "status": "uploaded",
-                "metadata": metadata
-            }).execute()
-        
-        await asyncio.to_thread(_insert_video)
+        await get_async_supabase().table("videos").insert({
+            "id": video_id,
+            "organization_id": org_id,
+            "title": video_title,
+            "raw_url": video_url,
+            "recording_source": "upload",
+            "duration": metadata.get("duration", 0),
+            "status": "uploaded",
+            "metadata": {**metadata, "media_info": media_info}
+        }).execute()
         
         # Log API call
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        await log_api_call(
+        log_api_call(
             org_id, "module2", "/upload", "POST",
             {"filename": file.filename, "size_mb": file_size_mb},
             {"videoId": video_id},
@@ -157,6 +170,84 @@ async def upload_video(
         raise HTTPException(status_code=500, detail="Erro no upload do vídeo")
 
 
+class LeasedFileResponse(FileResponse):
+    """FileResponse that releases a cache lease once the body is sent (or the client leaves)"""
+    
+    def __init__(self, path, lease: AsyncExitStack, **kwargs):
+        super().__init__(path, **kwargs)
+        self.lease = lease
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.lease.aclose()
+
+
+@router.get("/videos/{video_id}/proxy")
+async def get_video_proxy(
+    video_id: str,
+    user = Depends(get_current_user),
+    org_id: str = Depends(get_current_organization)
+):
+    """
+    Low-resolution proxy for previews (trims, subtitle styles)
+    """
+    if not settings.proxy_enabled:
+        raise HTTPException(status_code=404, detail="Proxy desabilitado")
+    
+    try:
+        video_res = await get_async_supabase().table("videos").select("raw_url").eq("id", video_id).eq("organization_id", org_id).single().execute()
+        video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
+        
+        if not video_data:
+            raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+        
+        lease = AsyncExitStack()
+        proxy = await lease.enter_async_context(media_proxy.open(video_id, video_data["raw_url"]))
+        # FileResponse answers Range requests, so the player can seek; the
+        # proxy stays leased (not evictable) until the file has been sent
+        return LeasedFileResponse(proxy.video, lease, media_type="video/mp4")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Proxy error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao gerar proxy do vídeo")
+
+
+@router.get("/videos/{video_id}/waveform", response_model=WaveformResponse)
+async def get_waveform(
+    video_id: str,
+    samples: int = Query(800, ge=1, le=10000),
+    start: float = Query(0.0, ge=0),
+    end: Optional[float] = Query(None, gt=0),
+    user = Depends(get_current_user),
+    org_id: str = Depends(get_current_organization)
+):
+    """
+    Min/max waveform of the video audio for any sample count or zoom window
+    """
+    try:
+        video_res = await get_async_supabase().table("videos").select("raw_url").eq("id", video_id).eq("organization_id", org_id).single().execute()
+        video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
+        
+        if not video_data:
+            raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+        
+        if end is not None and end <= start:
+            raise HTTPException(status_code=400, detail="Janela inválida: start deve ser menor que end")
+        
+        async with audio_analyzer.open(video_id, video_data["raw_url"]) as analysis:
+            return WaveformResponse(**analysis.peaks(samples, start, end))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Waveform error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao gerar waveform")
+
+
 @router.post("/transcribe", response_model=TranscriptionResponse)
 async def transcribe_video(
     request: TranscriptionRequest,
@@ -170,10 +261,7 @@ async def transcribe_video(
     
     try:
         # Get video from database
-        def _get_video():
-            return supabase.table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
-        
-        video_res = await asyncio.to_thread(_get_video)
+        video_res = await get_async_supabase().table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
         video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
         
         if not video_data:
@@ -185,20 +273,18 @@ async def transcribe_video(
         # Transcribe
         result = await transcription_service.transcribe_video(
             video_url=video_data["raw_url"],
-            language=request.language
+            language=request.language,
+            video_id=request.videoId
         )
         
         # Update video with transcription
-        def _update_video():
-            return supabase.table("videos").update({
-                "transcription": result["transcription"]
-            }).eq("id", request.videoId).execute()
-        
-        await asyncio.to_thread(_update_video)
+        await get_async_supabase().table("videos").update({
+            "transcription": result["transcription"]
+        }).eq("id", request.videoId).execute()
         
         # Log API call
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        await log_api_call(
+        log_api_call(
             org_id, "module2", "/transcribe", "POST",
             {"videoId": request.videoId},
             {"success": True},
@@ -227,10 +313,7 @@ async def detect_silences(
     
     try:
         # Get video from database
-        def _get_video():
-            return supabase.table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
-        
-        video_res = await asyncio.to_thread(_get_video)
+        video_res = await get_async_supabase().table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
         video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
         
         if not video_data:
@@ -243,12 +326,13 @@ async def detect_silences(
         result = await video_service.detect_silences(
             video_url=video_data["raw_url"],
             min_silence_duration=request.minSilenceDuration,
-            silence_threshold=request.silenceThreshold
+            silence_threshold=request.silenceThreshold,
+            video_id=request.videoId
         )
         
         # Log API call
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        await log_api_call(
+        log_api_call(
             org_id, "module2", "/detect-silences", "POST",
             {"videoId": request.videoId},
             {"silences_found": len(result["silences"])},
@@ -268,7 +352,8 @@ async def detect_silences(
 async def process_video(
     request: VideoProcessRequest,
     user = Depends(get_current_user),
-    org_id: str = Depends(get_current_organization)
+    org_id: str = Depends(get_current_organization),
+    principal: Principal = Depends(get_current_principal)
 ):
     """
     Process video with subtitles, trim, and silence removal (async job)
@@ -277,10 +362,7 @@ async def process_video(
     
     try:
         # Get video from database
-        def _get_video():
-            return supabase.table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
-        
-        video_res = await asyncio.to_thread(_get_video)
+        video_res = await get_async_supabase().table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
         video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
         
         if not video_data:
@@ -292,33 +374,53 @@ async def process_video(
                 raise HTTPException(status_code=400, detail="Trim inválido: start deve ser menor que end")
             if request.trim.end - request.trim.start < 3:
                 raise HTTPException(status_code=400, detail="Duração mínima de 3 segundos")
+        if request.renditions:
+            _validate_renditions(request.renditions)
         
         # Create job
         job_id = str(uuid.uuid4())
         processing_jobs[job_id] = {
-            "status": "processing",
+            "status": "queued",
             "progress": 0,
-            "currentStep": "Iniciando processamento...",
+            "currentStep": "Aguardando na fila...",
             "processedVideoUrl": None,
             "processedDuration": None,
             "processedSizeMb": None,
+            "renditions": None,
             "error": None
         }
         
-        # Start background processing
-        asyncio.create_task(
-            _process_video_background(job_id, request, video_data, org_id)
-        )
+        # Admission control: run now if there is a free FFmpeg slot, otherwise queue
+        try:
+            admission = ffmpeg_scheduler.submit(
+                job_id,
+                org_id,
+                principal.plan,
+                lambda: _process_video_background(job_id, request, video_data, org_id)
+            )
+        except SchedulerQueueFull:
+            processing_jobs.pop(job_id, None)
+            raise HTTPException(
+                status_code=503,
+                detail="Fila de processamento cheia. Tente novamente em alguns minutos."
+            )
         
         # Log API call
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        await log_api_call(
+        log_api_call(
             org_id, "module2", "/process", "POST",
             {"videoId": request.videoId},
             {"jobId": job_id},
             202, duration_ms
         )
         
+        if admission["status"] == "queued":
+            return VideoProcessResponse(
+                jobId=job_id,
+                status="queued",
+                message=f"Vídeo na fila de processamento (posição {admission['position']})"
+            )
+        
         return VideoProcessResponse(
             jobId=job_id,
             status="processing",
@@ -332,60 +434,77 @@ async def process_video(
         raise HTTPException(status_code=500, detail="Erro ao iniciar processamento")
 
 
+def _validate_renditions(renditions):
+    """Reject rendition lists FFmpeg (or storage paths) cannot handle"""
+    if len(renditions) > MAX_RENDITIONS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_RENDITIONS} renditions por vídeo")
+    names = [r.name for r in renditions]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Nomes de renditions duplicados")
+    for rendition in renditions:
+        if not RENDITION_NAME.match(rendition.name):
+            raise HTTPException(status_code=400, detail=f"Nome de rendition inválido: {rendition.name}")
+        try:
+            parse_aspect_ratio(rendition.aspectRatio)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Aspect ratio inválido: {rendition.aspectRatio}")
+        if rendition.fit not in RENDITION_FITS:
+            raise HTTPException(status_code=400, detail=f"Modo inválido: {rendition.fit} (use crop ou pad)")
+        if not 240 <= rendition.maxResolution <= 3840:
+            raise HTTPException(status_code=400, detail="maxResolution deve estar entre 240 e 3840")
+        if rendition.maxBitrateKbps is not None and rendition.maxBitrateKbps <= 0:
+            raise HTTPException(status_code=400, detail="maxBitrateKbps deve ser positivo")
+
+
 async def _process_video_background(job_id: str, request: VideoProcessRequest, video_data: dict, org_id: str):
     """Background task for video processing"""
     try:
         video_service = VideoProcessingService()
         
         # Update progress
+        processing_jobs[job_id]["status"] = "processing"
         processing_jobs[job_id]["progress"] = 10
         processing_jobs[job_id]["currentStep"] = "Baixando vídeo..."
         
-        # Process video
-        result = await video_service.process_video(
-            video_url=video_data["raw_url"],
-            video_id=request.videoId,
-            subtitles=request.subtitles.dict() if request.subtitles else None,
-            trim=request.trim.dict() if request.trim else None,
-            silence_removal=request.silenceRemoval.dict() if request.silenceRemoval else None,
-            progress_callback=lambda p, s: _update_job_progress(job_id, p, s)
-        )
-        
-        # Upload processed video to Supabase Storage
-        processing_jobs[job_id]["progress"] = 95
-        processing_jobs[job_id]["currentStep"] = "Fazendo upload..."
-        
-        storage_path = f"{org_id}/processed/{request.videoId}.mp4"
-        
-        with open(result["output_path"], "rb") as f:
-            file_content = f.read()
-        
-        def _upload():
-            return supabase.storage.from_("videos-processed").upload(
-                storage_path,
-                file_content,
-                {"content-type": "video/mp4"}
+        # Private workspace for the job's intermediates and outputs (removed on any exit)
+        source_bytes = (video_data.get("metadata") or {}).get("sizeBytes") or 0
+        reserve = video_service.scratch_reservation(source_bytes, request.renditions)
+        async with workspace_manager.open(job_id, reserve) as workspace:
+            # Process video
+            result = await video_service.process_video(
+                video_url=video_data["raw_url"],
+                video_id=request.videoId,
+                subtitles=request.subtitles.dict() if request.subtitles else None,
+                trim=request.trim.dict() if request.trim else None,
+                silence_removal=request.silenceRemoval.dict() if request.silenceRemoval else None,
+                renditions=[r.dict() for r in request.renditions] if request.renditions else None,
+                progress_callback=lambda p, s: _update_job_progress(job_id, p, s),
+                workspace=workspace
             )
-        
-        await asyncio.to_thread(_upload)
-        
-        def _get_url():
-            return supabase.storage.from_("videos-processed").get_public_url(storage_path)
-        processed_url = await asyncio.to_thread(_get_url)
+            
+            # Upload processed video(s) to Supabase Storage
+            processing_jobs[job_id]["progress"] = 95
+            processing_jobs[job_id]["currentStep"] = "Fazendo upload..."
+            
+            renditions = result.get("renditions")
+            if renditions:
+                # All renditions upload concurrently; the first one is the primary video
+                urls = await asyncio.gather(*[
+                    _upload_processed(rendition["output_path"], f"{org_id}/processed/{request.videoId}_{rendition['name']}.mp4")
+                    for rendition in renditions
+                ])
+                processed_url = urls[0]
+            else:
+                processed_url = await _upload_processed(
+                    result["output_path"], f"{org_id}/processed/{request.videoId}.mp4"
+                )
         
         # Update video record
-        def _update_video():
-            return supabase.table("videos").update({
-                "processed_url": processed_url,
-                "status": "processed",
-                "subtitle_style": request.subtitles.style.dict() if request.subtitles else None
-            }).eq("id", request.videoId).execute()
-        
-        await asyncio.to_thread(_update_video)
-        
-        # Clean up temp files
-        if os.path.exists(result["output_path"]):
-            os.remove(result["output_path"])
+        await get_async_supabase().table("videos").update({
+            "processed_url": processed_url,
+            "status": "processed",
+            "subtitle_style": request.subtitles.style.dict() if request.subtitles else None
+        }).eq("id", request.videoId).execute()
         
         # Update job status
         processing_jobs[job_id]["status"] = "completed"
@@ -393,12 +512,40 @@ async def _process_video_background(job_id: str, request: VideoProcessRequest, v
         processing_jobs[job_id]["currentStep"] = "Concluído"
         processing_jobs[job_id]["processedVideoUrl"] = processed_url
         processing_jobs[job_id]["processedDuration"] = result.get("duration", 0)
-        processing_jobs[job_id]["processedSizeMb"] = len(file_content) / (1024 * 1024)
+        processing_jobs[job_id]["processedSizeMb"] = result.get("size", 0) / (1024 * 1024)
+        if renditions:
+            processing_jobs[job_id]["renditions"] = [
+                {
+                    "name": rendition["name"],
+                    "url": url,
+                    "width": rendition["width"],
+                    "height": rendition["height"],
+                    "sizeMb": rendition["size"] / (1024 * 1024)
+                }
+                for rendition, url in zip(renditions, urls)
+            ]
         
     except Exception as e:
-        logger.error(f"Background processing error: {e}", exc_info=True)
+        logger.error(f"Background processing error: {e}")
         processing_jobs[job_id]["status"] = "error"
         processing_jobs[job_id]["error"] = str(e)
+        # The scheduler counts the job as failed (and logs the traceback)
+        raise
+
+
+async def _upload_processed(local_path: str, storage_path: str) -> str:
+    """Upload a processed MP4 to the videos-processed bucket and return its public URL"""
+    def _upload():
+        with open(local_path, "rb") as f:
+            file_content = f.read()
+        supabase.storage.from_("videos-processed").upload(
+            storage_path,
+            file_content,
+            {"content-type": "video/mp4"}
+        )
+        return supabase.storage.from_("videos-processed").get_public_url(storage_path)
+    
+    return await asyncio.to_thread(_upload)
 
 
 def _update_job_progress(job_id: str, progress: int, step: str):
@@ -423,6 +570,7 @@ async def get_process_status(
     
     return VideoProcessStatus(
         jobId=job_id,
+        queuePosition=ffmpeg_scheduler.position(job_id) if job["status"] == "queued" else None,
         **job
     )
 
@@ -440,10 +588,7 @@ async def generate_descriptions(
     
     try:
         # Get video with transcription
-        def _get_video():
-            return supabase.table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
-        
-        video_res = await asyncio.to_thread(_get_video)
+        video_res = await get_async_supabase().table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
         video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
         
         if not video_data:
@@ -453,9 +598,7 @@ async def generate_descriptions(
             raise HTTPException(status_code=400, detail="Vídeo não possui transcrição")
         
         # Get organization profile for context
-        def _get_org():
-            return supabase.table("organizations").select("professional_profiles").eq("id", org_id).single().execute()
-        org_res = await asyncio.to_thread(_get_org)
+        org_res = await get_async_supabase().table("organizations").select("professional_profiles").eq("id", org_id).single().execute()
         org_data = org_res.data if hasattr(org_res, "data") else org_res.get("data")
         profile_context = str(org_data.get("professional_profiles", "")) if org_data else ""
         
@@ -470,7 +613,7 @@ async def generate_descriptions(
         
         # Log API call
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        await log_api_call(
+        log_api_call(
             org_id, "module2", "/descriptions/generate", "POST",
             {"videoId": request.videoId, "platforms": request.platforms},
             {"platforms_generated": len(descriptions)},
@@ -499,10 +642,7 @@ async def regenerate_description(
     
     try:
         # Get video with transcription
-        def _get_video():
-            return supabase.table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
-        
-        video_res = await asyncio.to_thread(_get_video)
+        video_res = await get_async_supabase().table("videos").select("*").eq("id", request.videoId).eq("organization_id", org_id).single().execute()
         video_data = video_res.data if hasattr(video_res, "data") else video_res.get("data")
         
         if not video_data:
@@ -520,7 +660,7 @@ async def regenerate_description(
         
         # Log API call
         duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        await log_api_call(
+        log_api_call(
             org_id, "module2", "/descriptions/regenerate", "POST",
             {"videoId": request.videoId, "platform": request.platform},
             {"success": True},
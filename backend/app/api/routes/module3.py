@@ -3,7 +3,8 @@ from typing import Optional, Dict, Any
 from app.api.deps import get_current_organization, require_plan
 from app.services.heygen import HeyGenService
 from app.services.encryption import encryption_service
-from app.database import supabase
+from app.database import supabase, get_async_supabase
+from app.core.log_sink import api_log_sink
 from app.utils.logger import get_logger
 from app.models.heygen import (
     VideoGenerationRequest, 
@@ -60,12 +61,9 @@ async def generate_video(
             )
         
         # Buscar credenciais da organização
-        def _sync_select():
-            return supabase.table("organizations").select(
-                "heygen_api_key, heygen_avatar_id, heygen_voice_id"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key, heygen_avatar_id, heygen_voice_id"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -110,29 +108,23 @@ async def generate_video(
         job_id = str(uuid.uuid4())
         
         # Salvar registro na tabela videos
-        def _sync_insert():
-            return supabase.table("videos").insert({
-                "id": job_id,
-                "organization_id": org_id,
-                "recording_source": "heygen",
-                "heygen_video_id": video_result.get("video_id"),
-                "heygen_job_status": "processing",
-                "title": request.title or "Vídeo Avatar",
-                "created_at": datetime.utcnow().isoformat()
-            }).execute()
-        
-        await asyncio.to_thread(_sync_insert)
+        await get_async_supabase().table("videos").insert({
+            "id": job_id,
+            "organization_id": org_id,
+            "recording_source": "heygen",
+            "heygen_video_id": video_result.get("video_id"),
+            "heygen_job_status": "processing",
+            "title": request.title or "Vídeo Avatar",
+            "created_at": datetime.utcnow().isoformat()
+        }).execute()
         
         # Registrar chamada em api_logs
-        def _sync_log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "3",
-                "endpoint": "generate_video",
-                "status_code": 202
-            }).execute()
-        
-        await asyncio.to_thread(_sync_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "3",
+            "endpoint": "generate_video",
+            "status_code": 202
+        })
         
         logger.info(f"Vídeo iniciado para organização {org_id}: job_id={job_id}, video_id={video_result.get('video_id')}")
         
@@ -178,12 +170,9 @@ async def get_video_status(
     """
     try:
         # Buscar registro de vídeo no banco
-        def _sync_select_video():
-            return supabase.table("videos").select(
-                "id, heygen_video_id, heygen_job_status, video_url, created_at, heygen_error_message"
-            ).eq("id", job_id).eq("organization_id", org_id).single().execute()
-        
-        video_data = await asyncio.to_thread(_sync_select_video)
+        video_data = await get_async_supabase().table("videos").select(
+            "id, heygen_video_id, heygen_job_status, video_url, created_at, heygen_error_message"
+        ).eq("id", job_id).eq("organization_id", org_id).single().execute()
         video = video_data.data if hasattr(video_data, "data") else video_data.get("data")
         
         if not video:
@@ -212,12 +201,9 @@ async def get_video_status(
             )
         
         # Buscar credenciais para consultar status no HeyGen
-        def _sync_select_org():
-            return supabase.table("organizations").select(
-                "heygen_api_key"
-            ).eq("id", org_id).single().execute()
-        
-        org_data = await asyncio.to_thread(_sync_select_org)
+        org_data = await get_async_supabase().table("organizations").select(
+            "heygen_api_key"
+        ).eq("id", org_id).single().execute()
         data = org_data.data if hasattr(org_data, "data") else org_data.get("data")
         
         if not data or not data.get("heygen_api_key"):
@@ -252,13 +238,10 @@ async def get_video_status(
                     error_msg = download_result["error"].get("message", "Erro ao baixar vídeo")
                     
                     # Atualizar registro com erro
-                    def _sync_update_error():
-                        return supabase.table("videos").update({
-                            "heygen_job_status": "failed",
-                            "heygen_error_message": error_msg
-                        }).eq("id", job_id).execute()
-                    
-                    await asyncio.to_thread(_sync_update_error)
+                    await get_async_supabase().table("videos").update({
+                        "heygen_job_status": "failed",
+                        "heygen_error_message": error_msg
+                    }).eq("id", job_id).execute()
                     
                     return VideoStatusResponse(
                         job_id=job_id,
@@ -278,13 +261,10 @@ async def get_video_status(
                 )
                 
                 # Atualizar registro no banco
-                def _sync_update():
-                    return supabase.table("videos").update({
-                        "video_url": storage_url,
-                        "heygen_job_status": "ready"
-                    }).eq("id", job_id).execute()
-                
-                await asyncio.to_thread(_sync_update)
+                await get_async_supabase().table("videos").update({
+                    "video_url": storage_url,
+                    "heygen_job_status": "ready"
+                }).eq("id", job_id).execute()
                 
                 logger.info(f"Vídeo completado e salvo: job_id={job_id}, url={storage_url}")
                 
@@ -303,13 +283,10 @@ async def get_video_status(
             error_message = status_result.get("error", "Falha na geração do vídeo")
             
             # Atualizar registro no banco
-            def _sync_update_failed():
-                return supabase.table("videos").update({
-                    "heygen_job_status": "failed",
-                    "heygen_error_message": error_message
-                }).eq("id", job_id).execute()
-            
-            await asyncio.to_thread(_sync_update_failed)
+            await get_async_supabase().table("videos").update({
+                "heygen_job_status": "failed",
+                "heygen_error_message": error_message
+            }).eq("id", job_id).execute()
             
             return VideoStatusResponse(
                 job_id=job_id,
@@ -320,15 +297,12 @@ async def get_video_status(
         
         # Vídeo ainda em processamento
         # Registrar chamada em api_logs
-        def _sync_log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "3",
-                "endpoint": "get_video_status",
-                "status_code": 200
-            }).execute()
-        
-        await asyncio.to_thread(_sync_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "3",
+            "endpoint": "get_video_status",
+            "status_code": 200
+        })
         
         return VideoStatusResponse(
             job_id=job_id,
@@ -376,12 +350,9 @@ async def send_to_postrapido(
     """
     try:
         # Buscar registro de vídeo
-        def _sync_select():
-            return supabase.table("videos").select(
-                "id, heygen_job_status, video_url"
-            ).eq("id", request.video_id).eq("organization_id", org_id).single().execute()
-        
-        video_data = await asyncio.to_thread(_sync_select)
+        video_data = await get_async_supabase().table("videos").select(
+            "id, heygen_job_status, video_url"
+        ).eq("id", request.video_id).eq("organization_id", org_id).single().execute()
         video = video_data.data if hasattr(video_data, "data") else video_data.get("data")
         
         if not video:
@@ -398,15 +369,12 @@ async def send_to_postrapido(
             )
         
         # Registrar chamada em api_logs
-        def _sync_log():
-            return supabase.table("api_logs").insert({
-                "organization_id": org_id,
-                "module": "3",
-                "endpoint": "send_to_postrapido",
-                "status_code": 200
-            }).execute()
-        
-        await asyncio.to_thread(_sync_log)
+        api_log_sink.enqueue({
+            "organization_id": org_id,
+            "module": "3",
+            "endpoint": "send_to_postrapido",
+            "status_code": 200
+        })
         
         logger.info(f"Vídeo {request.video_id} enviado para PostRápido pela organização {org_id}")
         
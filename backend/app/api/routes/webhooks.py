@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request, HTTPException, Header
 from typing import Optional
-from app.database import supabase
+from app.database import get_async_supabase
 from app.utils.logger import get_logger
 from app.core.webhooks import require_webhook_signature
 from app.config import settings
@@ -42,7 +42,7 @@ async def heygen_webhook(
         logger.info(f"Webhook HeyGen: video_id={video_id}, status={status}")
 
         if video_id and status == "completed":
-            supabase.table("videos").update({
+            await get_async_supabase().table("videos").update({
                 "video_processed_url": video_url,
                 "status": "ready"
             }).eq("id", video_id).execute()
@@ -7,7 +7,27 @@ class Settings(BaseSettings):
     supabase_url: str = Field(..., env="SUPABASE_URL")
     supabase_anon_key: str = Field(None, env="SUPABASE_ANON_KEY")
     supabase_service_role_key: str = Field(..., env="SUPABASE_SERVICE_ROLE_KEY")
-    
+
+    # Supabase async (pool HTTP do cliente PostgREST assíncrono)
+    db_pool_max_connections: int = Field(50, env="DB_POOL_MAX_CONNECTIONS")
+    db_pool_max_keepalive: int = Field(20, env="DB_POOL_MAX_KEEPALIVE")
+    db_pool_keepalive_expiry: float = Field(30.0, env="DB_POOL_KEEPALIVE_EXPIRY")
+    db_timeout: float = Field(10.0, env="DB_TIMEOUT")
+    db_connect_timeout: float = Field(5.0, env="DB_CONNECT_TIMEOUT")
+    db_http2: bool = Field(True, env="DB_HTTP2")
+
+    # api_logs (writer assíncrono em lote)
+    api_log_queue_size: int = Field(10000, env="API_LOG_QUEUE_SIZE")
+    api_log_batch_size: int = Field(200, env="API_LOG_BATCH_SIZE")
+    api_log_flush_interval: float = Field(2.0, env="API_LOG_FLUSH_INTERVAL")
+    api_log_drop_policy: str = Field("drop_oldest", env="API_LOG_DROP_POLICY")
+
+    # Auth (verificação local de JWT do Supabase)
+    supabase_jwt_secret: str | None = Field(None, env="SUPABASE_JWT_SECRET")
+    auth_local_verification: bool = Field(True, env="AUTH_LOCAL_VERIFICATION")
+    auth_token_cache_size: int = Field(1024, env="AUTH_TOKEN_CACHE_SIZE")
+    auth_jwks_ttl: int = Field(3600, env="AUTH_JWKS_TTL")
+
     # AI Services
     anthropic_api_key: str | None = Field(None, env="ANTHROPIC_API_KEY")
     
@@ -38,6 +58,26 @@ class Settings(BaseSettings):
     redis_db: int = Field(0, env="REDIS_DB")
     redis_password: str | None = Field(None, env="REDIS_PASSWORD")
     
+    # Cache assíncrono (pool do redis.asyncio usado pelo event loop da API)
+    cache_max_connections: int = Field(50, env="CACHE_MAX_CONNECTIONS")
+    cache_socket_timeout: float = Field(0.5, env="CACHE_SOCKET_TIMEOUT")
+    cache_retry_after: float = Field(30.0, env="CACHE_RETRY_AFTER")
+    
+    # Cache L1 em memória por processo (invalidação entre workers via Redis pub/sub)
+    cache_l1_enabled: bool = Field(True, env="CACHE_L1_ENABLED")
+    cache_l1_max_entries: int = Field(2048, env="CACHE_L1_MAX_ENTRIES")
+    cache_l1_max_ttl: float = Field(30.0, env="CACHE_L1_MAX_TTL")
+    cache_l1_prefixes: str = Field("user:,org:,analytics:", env="CACHE_L1_PREFIXES")
+    cache_invalidation_channel: str = Field("cache:invalidate", env="CACHE_INVALIDATION_CHANNEL")
+    
+    # Invalidação por tags: sets "tag:{tag}" com as chaves de cada tag
+    cache_tag_ttl: int = Field(86400, env="CACHE_TAG_TTL")
+    
+    # Codec dos valores do cache: "json" (orjson) ou "msgpack"; compressão "zstd", "lz4" ou "none"
+    cache_codec: str = Field("json", env="CACHE_CODEC")
+    cache_compression: str = Field("zstd", env="CACHE_COMPRESSION")
+    cache_compression_threshold: int = Field(1024, env="CACHE_COMPRESSION_THRESHOLD")
+    
     def get_redis_url(self) -> str:
         """Retorna URL de conexão do Redis"""
         # Ignorar senha se for None ou string vazia
@@ -52,6 +92,43 @@ class Settings(BaseSettings):
     # Storage
     temp_video_path: str = Field("/tmp/videos", env="TEMP_VIDEO_PATH")
     
+    # Cache local de mídia (downloads dos vídeos originais em temp_video_path/media)
+    media_cache_max_gb: float = Field(10.0, env="MEDIA_CACHE_MAX_GB")
+    media_download_chunk_size: int = Field(1024 * 1024, env="MEDIA_DOWNLOAD_CHUNK_SIZE")
+    media_download_retries: int = Field(3, env="MEDIA_DOWNLOAD_RETRIES")
+    media_download_timeout: float = Field(60.0, env="MEDIA_DOWNLOAD_TIMEOUT")
+    
+    # Agendador do FFmpeg: slots = (núcleos - 1) // threads por job, se não fixado
+    # (núcleos = afinidade de CPU do processo, ou FFMPEG_CPU_CORES p/ cota de cgroup)
+    ffmpeg_threads_per_job: int = Field(2, env="FFMPEG_THREADS_PER_JOB")
+    ffmpeg_cpu_cores: int = Field(0, env="FFMPEG_CPU_CORES")
+    ffmpeg_max_concurrent_jobs: int = Field(0, env="FFMPEG_MAX_CONCURRENT_JOBS")
+    ffmpeg_max_queue: int = Field(100, env="FFMPEG_MAX_QUEUE")
+    ffmpeg_timeout: float = Field(3600.0, env="FFMPEG_TIMEOUT")
+    ffprobe_timeout: float = Field(60.0, env="FFPROBE_TIMEOUT")
+    
+    # Smart-cut (só as bordas dos GOPs são re-encodadas); desligado = corte sempre re-encodado
+    smart_cut_enabled: bool = Field(True, env="SMART_CUT_ENABLED")
+    
+    # Proxies gerados no upload (vídeo em baixa resolução + áudio 16 kHz mono para análise)
+    # Rodam nos slots do agendador do FFmpeg, com prioridade abaixo dos jobs dos usuários;
+    # PROXY_MAX_CONCURRENT limita quantos slots os proxies ocupam ao mesmo tempo
+    proxy_enabled: bool = Field(True, env="PROXY_ENABLED")
+    proxy_height: int = Field(360, env="PROXY_HEIGHT")
+    proxy_video_bitrate_kbps: int = Field(600, env="PROXY_VIDEO_BITRATE_KBPS")
+    proxy_max_concurrent: int = Field(2, env="PROXY_MAX_CONCURRENT")
+    proxy_cache_max_gb: float = Field(5.0, env="PROXY_CACHE_MAX_GB")
+    
+    # Cache de artefatos intermediários (corte reaproveitado quando só a legenda muda); 0 desativa
+    artifact_cache_max_gb: float = Field(10.0, env="ARTIFACT_CACHE_MAX_GB")
+    
+    # Workspaces por job (temp_video_path/jobs); tmpfs opcional para intermediários pequenos
+    workspace_scratch_path: str = Field("", env="WORKSPACE_SCRATCH_PATH")
+    workspace_scratch_min_free_mb: int = Field(256, env="WORKSPACE_SCRATCH_MIN_FREE_MB")
+    workspace_min_free_gb: float = Field(2.0, env="WORKSPACE_MIN_FREE_GB")
+    workspace_sweep_interval: float = Field(600.0, env="WORKSPACE_SWEEP_INTERVAL")
+    workspace_orphan_max_age_hours: float = Field(24.0, env="WORKSPACE_ORPHAN_MAX_AGE_HOURS")
+    
     # Server
     host: str = Field("0.0.0.0", env="HOST")
     port: int = Field(8000, env="PORT")
@@ -1,15 +1,203 @@
 """
 Sistema de cache distribuído usando Redis
+
+- AsyncCacheManager (async_cache): redis.asyncio com pool compartilhado, usado no
+  event loop da API e pelo @cached em funções assíncronas
+- CacheManager (cache): cliente síncrono, mantido para Celery e scripts
+- Invalidação por tags: cada entrada se registra nos sets "tag:{tag}" (por
+  padrão "user:{id}" / "org:{id}" conforme a chave) e invalidar uma tag remove
+  só os membros, em pipeline; delete_pattern usa SCAN para padrões avulsos
+- Valores serializados pelo cache_codec (cabeçalho de versão, JSON/msgpack e
+  compressão opcional), por isso os clientes Redis trabalham com bytes
+- LocalCache: tier L1 em memória por processo na frente do async_cache, para as
+  chaves quentes (user:, org:, analytics:); escritas e invalidações são
+  publicadas no canal Redis de invalidação e cada worker remove as entradas
+  correspondentes do seu L1
 """
+import asyncio
+import fnmatch
 import json
 import logging
-from typing import Optional, Any, Callable
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Any, Callable, Dict, Iterable, List, Tuple
 from functools import wraps
 import redis
+import redis.asyncio as aioredis
 from app.config import settings
+from app.core.cache_codec import cache_codec
 
 logger = logging.getLogger(__name__)
 
+L1_PREFIXES = tuple(p.strip() for p in settings.cache_l1_prefixes.split(",") if p.strip())
+
+# Namespaces com tag implícita "{namespace}:{id}" (ex: "org:1:principal" → "org:1")
+TAG_NAMESPACES = ("user", "org")
+
+# Tamanho dos lotes de SCAN e de DELETE em pipeline
+SCAN_COUNT = 500
+DELETE_BATCH_SIZE = 500
+
+
+def tag_key(tag: str) -> str:
+    """Chave do set Redis com os membros da tag"""
+    return f"tag:{tag}"
+
+
+def resolve_tags(key: str, tags: Optional[Iterable[str]] = None) -> List[str]:
+    """Tags explícitas mais a tag implícita do namespace da chave"""
+    resolved = list(tags or [])
+    namespace, _, rest = key.partition(":")
+    entity_id = rest.split(":", 1)[0]
+    if namespace in TAG_NAMESPACES and entity_id:
+        implicit = f"{namespace}:{entity_id}"
+        if implicit not in resolved:
+            resolved.append(implicit)
+    return resolved
+
+
+def _register_tags(pipe, key: str, tags: List[str], ttl: int) -> None:
+    # O set da tag vive pelo menos cache_tag_ttl: membros já expirados viram
+    # DELETEs sem efeito, mas nenhum membro vivo perde o registro
+    for tag in tags:
+        pipe.sadd(tag_key(tag), key)
+        pipe.expire(tag_key(tag), max(ttl, settings.cache_tag_ttl))
+
+
+# Libera o lock só se ainda for o dono (o lock pode ter expirado e sido retomado)
+LOCK_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def lock_key(name: str) -> str:
+    """Chave Redis do lock distribuído"""
+    return f"lock:{name}"
+
+
+def _decode_keys(keys: Iterable[Any]) -> List[str]:
+    """Chaves retornadas pelo Redis (bytes) como str"""
+    return [key.decode() if isinstance(key, bytes) else key for key in keys]
+
+
+def _batches(keys: List[str], size: int = DELETE_BATCH_SIZE) -> Iterable[List[str]]:
+    for i in range(0, len(keys), size):
+        yield keys[i:i + size]
+
+
+def is_l1_key(key: str) -> bool:
+    """True se a chave é elegível para o cache L1 em memória"""
+    return key.startswith(L1_PREFIXES)
+
+
+def _invalidation_message(
+    keys: Optional[List[str]] = None,
+    pattern: Optional[str] = None,
+    origin: Optional[str] = None,
+) -> str:
+    payload: Dict[str, Any] = {"origin": origin}
+    if keys:
+        payload["keys"] = list(keys)
+    if pattern:
+        payload["pattern"] = pattern
+    return json.dumps(payload)
+
+
+def _pattern_may_touch_l1(pattern: str) -> bool:
+    """True se o padrão pode casar com chaves do L1 (ex: "org:1:*", "*")"""
+    literal = pattern.split("*", 1)[0].split("?", 1)[0].split("[", 1)[0]
+    return any(p.startswith(literal) or literal.startswith(p) for p in L1_PREFIXES)
+
+
+class LocalCache:
+    """
+    LRU em memória, limitado em número de entradas e com TTL por entrada
+    
+    Guarda o valor serializado (bytes do cache_codec) para que chamadores não
+    compartilhem objetos mutáveis. O TTL de cada entrada nunca excede o TTL restante no
+    Redis (L2), e `generation` muda a cada invalidação para descartar valores
+    lidos do Redis antes de uma invalidação concorrente.
+    """
+    
+    def __init__(self, max_entries: int = 2048, max_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._data: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Valor serializado ou None (ausente/expirado)"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        raw, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return raw
+    
+    def set(self, key: str, raw: bytes, ttl: float, generation: Optional[int] = None) -> bool:
+        """
+        Armazena valor serializado por até min(ttl, max_ttl) segundos
+        
+        Args:
+            generation: geração observada antes da leitura no L2; se houve
+                invalidação desde então o valor não é armazenado
+        """
+        if generation is not None and generation != self.generation:
+            return False
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return False
+        self._data[key] = (raw, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return True
+    
+    def delete(self, *keys: str) -> int:
+        self.generation += 1
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+    
+    def delete_pattern(self, pattern: str) -> int:
+        self.generation += 1
+        matched = [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]
+        for key in matched:
+            del self._data[key]
+        return len(matched)
+    
+    def clear(self) -> None:
+        self.generation += 1
+        self._data.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
 
 class CacheManager:
     """Gerenciador de cache com Redis"""
@@ -22,7 +210,7 @@ class CacheManager:
                 port=settings.redis_port,
                 db=settings.redis_db,
                 password=settings.redis_password,
-                decode_responses=True,
+                decode_responses=False,
                 socket_connect_timeout=5,
                 socket_timeout=5,
             )
@@ -51,7 +239,7 @@ class CacheManager:
         try:
             value = self.redis_client.get(key)
             if value:
-                return json.loads(value)
+                return cache_codec.decode(value, key)
             return None
         except Exception as e:
             logger.error(f"Erro ao buscar cache {key}: {e}")
@@ -61,7 +249,8 @@ class CacheManager:
         self,
         key: str,
         value: Any,
-        ttl: int = 300
+        ttl: int = 300,
+        tags: Optional[Iterable[str]] = None
     ) -> bool:
         """
         Salva valor no cache
@@ -70,6 +259,7 @@ class CacheManager:
             key: Chave do cache
             value: Valor a ser cacheado
             ttl: Tempo de vida em segundos (default: 5 minutos)
+            tags: Tags adicionais para invalidate_tags (além da implícita)
         
         Returns:
             True se salvou com sucesso
@@ -78,8 +268,17 @@ class CacheManager:
             return False
         
         try:
-            serialized = json.dumps(value)
-            self.redis_client.setex(key, ttl, serialized)
+            serialized = cache_codec.encode(value, key)
+            tag_list = resolve_tags(key, tags)
+            if tag_list:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, ttl, serialized)
+                _register_tags(pipe, key, tag_list, ttl)
+                pipe.execute()
+            else:
+                self.redis_client.setex(key, ttl, serialized)
+            if is_l1_key(key):
+                self._publish_invalidation(keys=[key])
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar cache {key}: {e}")
@@ -100,14 +299,108 @@ class CacheManager:
         
         try:
             self.redis_client.delete(key)
+            if is_l1_key(key):
+                self._publish_invalidation(keys=[key])
             return True
         except Exception as e:
             logger.error(f"Erro ao deletar cache {key}: {e}")
             return False
     
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Busca vários valores do cache em um único round trip
+        
+        Args:
+            keys: Chaves do cache
+        
+        Returns:
+            Lista de valores (None para chaves ausentes), na ordem das chaves
+        """
+        if not self.enabled or not keys:
+            return [None] * len(keys)
+        
+        try:
+            values = self.redis_client.mget(keys)
+            return [cache_codec.decode(v, k) if v else None for k, v in zip(keys, values)]
+        except Exception as e:
+            logger.error(f"Erro ao buscar cache (mget) {len(keys)} chaves: {e}")
+            return [None] * len(keys)
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Busca várias chaves com um único MGET
+        
+        Args:
+            keys: Chaves do cache
+        
+        Returns:
+            Dicionário apenas com as chaves encontradas
+        """
+        keys = list(dict.fromkeys(keys))
+        values = self.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+    
+    def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: int = 300,
+        tags: Optional[Dict[str, Iterable[str]]] = None
+    ) -> bool:
+        """
+        Salva várias chaves em um único pipeline
+        
+        Args:
+            mapping: Chave → valor
+            ttl: Tempo de vida em segundos (o mesmo para todas)
+            tags: Tags adicionais por chave (além da implícita)
+        
+        Returns:
+            True se salvou com sucesso
+        """
+        if not self.enabled or not mapping:
+            return False
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.setex(key, ttl, cache_codec.encode(value, key))
+                _register_tags(pipe, key, resolve_tags(key, (tags or {}).get(key)), ttl)
+            l1_keys = [key for key in mapping if is_l1_key(key)]
+            if l1_keys:
+                pipe.publish(settings.cache_invalidation_channel, _invalidation_message(keys=l1_keys))
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache (set_many) {len(mapping)} chaves: {e}")
+            return False
+    
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """
+        Remove várias chaves em lotes pipelined
+        
+        Returns:
+            Número de chaves removidas
+        """
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled or not keys:
+            return 0
+        
+        try:
+            deleted = self._delete_batched(keys)
+            l1_keys = [key for key in keys if is_l1_key(key)]
+            if l1_keys:
+                self._publish_invalidation(keys=l1_keys)
+            return deleted
+        except Exception as e:
+            logger.error(f"Erro ao deletar cache (delete_many) {len(keys)} chaves: {e}")
+            return 0
+    
     def delete_pattern(self, pattern: str) -> int:
         """
-        Remove múltiplas chaves por padrão
+        Remove múltiplas chaves por padrão (SCAN incremental, sem bloquear o Redis)
+        
+        Para invalidações frequentes prefira invalidate_tags: o custo do SCAN
+        cresce com o tamanho do keyspace.
         
         Args:
             pattern: Padrão de chaves (ex: "user:*")
@@ -119,14 +412,65 @@ class CacheManager:
             return 0
         
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-            return 0
+            keys = _decode_keys(self.redis_client.scan_iter(match=pattern, count=SCAN_COUNT))
+            deleted = self._delete_batched(keys)
+            if _pattern_may_touch_l1(pattern):
+                self._publish_invalidation(pattern=pattern)
+            return deleted
         except Exception as e:
             logger.error(f"Erro ao deletar padrão {pattern}: {e}")
             return 0
     
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        Remove todas as chaves registradas nas tags
+        
+        O custo é proporcional ao número de chaves afetadas, não ao keyspace.
+        
+        Args:
+            tags: Tags a invalidar (ex: "user:123", "org:1")
+        
+        Returns:
+            Número de chaves removidas
+        """
+        if not self.enabled or not tags:
+            return 0
+        
+        try:
+            # SMEMBERS + DEL atômicos: membros adicionados depois vão para um set novo
+            pipe = self.redis_client.pipeline(transaction=True)
+            for tag in tags:
+                pipe.smembers(tag_key(tag))
+            pipe.delete(*[tag_key(tag) for tag in tags])
+            results = pipe.execute()
+            keys = sorted(_decode_keys(set().union(*results[:-1])))
+            deleted = self._delete_batched(keys)
+            l1_keys = [key for key in keys if is_l1_key(key)]
+            if l1_keys:
+                self._publish_invalidation(keys=l1_keys)
+            return deleted
+        except Exception as e:
+            logger.error(f"Erro ao invalidar tags {', '.join(tags)}: {e}")
+            return 0
+    
+    def _delete_batched(self, keys: List[str]) -> int:
+        if not keys:
+            return 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        for batch in _batches(keys):
+            pipe.delete(*batch)
+        return sum(pipe.execute())
+    
+    def _publish_invalidation(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None) -> None:
+        """Avisa os workers da API para removerem as chaves dos seus L1"""
+        try:
+            self.redis_client.publish(
+                settings.cache_invalidation_channel,
+                _invalidation_message(keys=keys, pattern=pattern),
+            )
+        except Exception as e:
+            logger.error(f"Erro ao publicar invalidação de cache: {e}")
+    
     def exists(self, key: str) -> bool:
         """
         Verifica se chave existe no cache
@@ -186,83 +530,852 @@ class CacheManager:
             logger.error(f"Erro ao buscar TTL {key}: {e}")
             return None
 
+    
+    def acquire_lock(self, name: str, timeout: float) -> Optional[str]:
+        """
+        Tenta obter um lock distribuído (SET NX PX), sem esperar
+        
+        Args:
+            name: Nome do lock
+            timeout: Expiração do lock em segundos
+        
+        Returns:
+            Token do lock, ou None se outro processo o detém. Com o Redis
+            indisponível retorna um token local (degrada para lock por processo).
+        """
+        token = uuid.uuid4().hex
+        if not self.enabled:
+            return token
+        
+        try:
+            if self.redis_client.set(lock_key(name), token, nx=True, px=int(timeout * 1000)):
+                return token
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao obter lock {name}: {e}")
+            return token
+    
+    def release_lock(self, name: str, token: str) -> None:
+        """Libera o lock se o token ainda for o dono"""
+        if not self.enabled:
+            return
+        
+        try:
+            self.redis_client.eval(LOCK_RELEASE_SCRIPT, 1, lock_key(name), token)
+        except Exception as e:
+            logger.error(f"Erro ao liberar lock {name}: {e}")
+
 
-# Instância global do cache
+class AsyncCacheManager:
+    """
+    Gerenciador de cache assíncrono (redis.asyncio) com pool de conexões compartilhado
+    
+    Timeouts curtos e um circuit breaker simples: após erro de conexão, o cache
+    fica desativado por cache_retry_after segundos em vez de fazer cada
+    requisição esperar o timeout do Redis.
+    
+    Com cache_l1_enabled, chaves quentes (cache_l1_prefixes) também ficam em um
+    LocalCache por processo. O L1 só é consultado enquanto a inscrição no canal
+    de invalidação está ativa; sem ela, escritas de outros workers não seriam
+    vistas e toda leitura vai ao Redis.
+    """
+    
+    def __init__(self, l1: Optional[LocalCache] = None):
+        """Cria pool de conexões (conecta sob demanda)"""
+        self._create_client()
+        self.enabled = True
+        self._retry_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.l1 = l1
+        # Identifica este gerenciador nas mensagens de invalidação (ignora as próprias)
+        self.instance_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self._listening = False
+        self.l2_hits = 0
+        self.l2_misses = 0
+    
+    def _create_client(self) -> None:
+        self.pool = aioredis.ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            password=settings.redis_password,
+            decode_responses=False,
+            socket_connect_timeout=settings.cache_socket_timeout,
+            socket_timeout=settings.cache_socket_timeout,
+            max_connections=settings.cache_max_connections,
+        )
+        self.redis_client = aioredis.Redis(connection_pool=self.pool)
+    
+    @property
+    def available(self) -> bool:
+        """True se o cache está habilitado e fora da janela de backoff"""
+        if not self.enabled or time.monotonic() < self._retry_at:
+            return False
+        # Conexões do pool pertencem a um event loop; recriar se o loop mudou
+        loop = asyncio.get_running_loop()
+        if self._loop is not None and self._loop is not loop:
+            self._close_client(self._loop)
+            self._create_client()
+        self._loop = loop
+        return True
+    
+    def _close_client(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Fecha as conexões do pool criado no event loop anterior
+        
+        Com o loop ainda rodando (outra thread), o disconnect é agendado nele.
+        Com o loop encerrado os transports não fecham mais (RuntimeError:
+        Event loop is closed), então os sockets recebem shutdown direto e o
+        Redis libera as conexões na hora.
+        """
+        pool = self.pool
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(pool.disconnect(), loop)
+            return
+        connections = list(getattr(pool, "_available_connections", [])) + list(getattr(pool, "_in_use_connections", []))
+        for connection in connections:
+            writer = getattr(connection, "_writer", None)
+            sock = writer.get_extra_info("socket") if writer is not None else None
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        pool.reset()
+    
+    def _use_l1(self, key: str) -> bool:
+        return self.l1 is not None and self._listening and is_l1_key(key)
+    
+    def _handle_error(self, operation: str, key: str, error: Exception) -> None:
+        logger.error(f"Erro ao {operation} cache {key}: {error}")
+        if isinstance(error, (redis.ConnectionError, redis.TimeoutError, OSError)):
+            self._retry_at = time.monotonic() + settings.cache_retry_after
+            logger.warning(f"Redis indisponível, cache assíncrono suspenso por {settings.cache_retry_after}s")
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Busca valor do cache: L1 em memória, depois Redis (None se ausente ou indisponível)"""
+        use_l1 = self._use_l1(key)
+        if use_l1:
+            raw = self.l1.get(key)
+            if raw is not None:
+                return cache_codec.decode(raw, key)
+        
+        if not self.available:
+            return None
+        
+        try:
+            if use_l1:
+                generation = self.l1.generation
+                # GET + PTTL no mesmo round trip: o L1 não pode viver mais que o L2
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(key)
+                pipe.pttl(key)
+                value, pttl = await pipe.execute()
+                if value:
+                    l2_ttl = pttl / 1000 if pttl > 0 else self.l1.max_ttl
+                    self.l1.set(key, value, l2_ttl, generation=generation)
+            else:
+                value = await self.redis_client.get(key)
+            if value:
+                self.l2_hits += 1
+                return cache_codec.decode(value, key)
+            self.l2_misses += 1
+            return None
+        except Exception as e:
+            self._handle_error("buscar", key, e)
+            return None
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Busca vários valores em um único round trip (None para ausentes)"""
+        results: List[Optional[Any]] = [None] * len(keys)
+        pending = list(range(len(keys)))
+        if self.l1 is not None and self._listening:
+            pending = []
+            for i, key in enumerate(keys):
+                raw = self.l1.get(key) if is_l1_key(key) else None
+                if raw is not None:
+                    results[i] = cache_codec.decode(raw, key)
+                else:
+                    pending.append(i)
+        
+        if not self.available or not pending:
+            return results
+        
+        try:
+            values = await self.redis_client.mget([keys[i] for i in pending])
+            for i, value in zip(pending, values):
+                if value:
+                    self.l2_hits += 1
+                    results[i] = cache_codec.decode(value, keys[i])
+                else:
+                    self.l2_misses += 1
+            return results
+        except Exception as e:
+            self._handle_error("buscar (mget)", f"{len(keys)} chaves", e)
+            return results
+    
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int = 300,
+        tags: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """Salva valor no cache com TTL em segundos, registrando-o nas tags"""
+        if not self.available:
+            return False
+        
+        try:
+            serialized = cache_codec.encode(value, key)
+            tag_list = resolve_tags(key, tags)
+            # Outros workers podem ter o valor antigo no L1
+            publish = self.l1 is not None and is_l1_key(key)
+            if tag_list or publish:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, ttl, serialized)
+                _register_tags(pipe, key, tag_list, ttl)
+                if publish:
+                    pipe.publish(
+                        settings.cache_invalidation_channel,
+                        _invalidation_message(keys=[key], origin=self.instance_id),
+                    )
+                await pipe.execute()
+                if publish:
+                    self.l1.delete(key)
+                    if self._listening:
+                        self.l1.set(key, serialized, ttl)
+            else:
+                await self.redis_client.setex(key, ttl, serialized)
+            return True
+        except Exception as e:
+            self._handle_error("salvar", key, e)
+            return False
+    
+    async def delete(self, *keys: str) -> int:
+        """Remove chaves do cache; retorna quantas foram removidas"""
+        l1_keys = [key for key in keys if is_l1_key(key)]
+        if self.l1 is not None and l1_keys:
+            self.l1.delete(*l1_keys)
+        
+        if not self.available or not keys:
+            return 0
+        
+        try:
+            if self.l1 is not None and l1_keys:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.delete(*keys)
+                pipe.publish(
+                    settings.cache_invalidation_channel,
+                    _invalidation_message(keys=l1_keys, origin=self.instance_id),
+                )
+                deleted, _ = await pipe.execute()
+                return deleted
+            return await self.redis_client.delete(*keys)
+        except Exception as e:
+            self._handle_error("deletar", ",".join(keys), e)
+            return 0
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Busca várias chaves (L1 + um único MGET); dicionário só com as encontradas"""
+        keys = list(dict.fromkeys(keys))
+        values = await self.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+    
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: int = 300,
+        tags: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> bool:
+        """Salva várias chaves em um único pipeline (ver CacheManager.set_many)"""
+        if not self.available or not mapping:
+            return False
+        
+        try:
+            encoded = {key: cache_codec.encode(value, key) for key, value in mapping.items()}
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, serialized in encoded.items():
+                pipe.setex(key, ttl, serialized)
+                _register_tags(pipe, key, resolve_tags(key, (tags or {}).get(key)), ttl)
+            l1_keys = [key for key in encoded if is_l1_key(key)] if self.l1 is not None else []
+            if l1_keys:
+                pipe.publish(
+                    settings.cache_invalidation_channel,
+                    _invalidation_message(keys=l1_keys, origin=self.instance_id),
+                )
+            await pipe.execute()
+            if l1_keys:
+                self.l1.delete(*l1_keys)
+                if self._listening:
+                    for key in l1_keys:
+                        self.l1.set(key, encoded[key], ttl)
+            return True
+        except Exception as e:
+            self._handle_error("salvar (set_many)", f"{len(mapping)} chaves", e)
+            return False
+    
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """Remove várias chaves em lotes pipelined; retorna quantas foram removidas"""
+        keys = list(dict.fromkeys(keys))
+        l1_keys = [key for key in keys if is_l1_key(key)] if self.l1 is not None else []
+        if l1_keys:
+            self.l1.delete(*l1_keys)
+        
+        if not self.available or not keys:
+            return 0
+        
+        try:
+            deleted = await self._delete_batched(keys)
+            if l1_keys:
+                await self.redis_client.publish(
+                    settings.cache_invalidation_channel,
+                    _invalidation_message(keys=l1_keys, origin=self.instance_id),
+                )
+            return deleted
+        except Exception as e:
+            self._handle_error("deletar (delete_many)", f"{len(keys)} chaves", e)
+            return 0
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """
+        Remove múltiplas chaves por padrão via SCAN (também dos L1 de todos os workers)
+        
+        Fallback para padrões avulsos; invalidações frequentes devem usar invalidate_tags.
+        """
+        touches_l1 = self.l1 is not None and _pattern_may_touch_l1(pattern)
+        if touches_l1:
+            self.l1.delete_pattern(pattern)
+        
+        if not self.available:
+            return 0
+        
+        try:
+            keys = _decode_keys([key async for key in self.redis_client.scan_iter(match=pattern, count=SCAN_COUNT)])
+            deleted = await self._delete_batched(keys)
+            if touches_l1:
+                await self.redis_client.publish(
+                    settings.cache_invalidation_channel,
+                    _invalidation_message(pattern=pattern, origin=self.instance_id),
+                )
+            return deleted
+        except Exception as e:
+            self._handle_error("deletar padrão", pattern, e)
+            return 0
+    
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Remove as chaves registradas nas tags (custo proporcional às chaves afetadas)"""
+        if not self.available or not tags:
+            return 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            for tag in tags:
+                pipe.smembers(tag_key(tag))
+            pipe.delete(*[tag_key(tag) for tag in tags])
+            results = await pipe.execute()
+            keys = sorted(_decode_keys(set().union(*results[:-1])))
+            l1_keys = [key for key in keys if is_l1_key(key)]
+            if self.l1 is not None and l1_keys:
+                self.l1.delete(*l1_keys)
+            deleted = await self._delete_batched(keys)
+            if self.l1 is not None and l1_keys:
+                await self.redis_client.publish(
+                    settings.cache_invalidation_channel,
+                    _invalidation_message(keys=l1_keys, origin=self.instance_id),
+                )
+            return deleted
+        except Exception as e:
+            self._handle_error("invalidar tags", ",".join(tags), e)
+            return 0
+    
+    async def _delete_batched(self, keys: List[str]) -> int:
+        if not keys:
+            return 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        for batch in _batches(keys):
+            pipe.delete(*batch)
+        return sum(await pipe.execute())
+    
+    async def exists(self, key: str) -> bool:
+        """Verifica se chave existe no cache"""
+        if not self.available:
+            return False
+        
+        try:
+            return bool(await self.redis_client.exists(key))
+        except Exception as e:
+            self._handle_error("verificar", key, e)
+            return False
+    
+    async def acquire_lock(self, name: str, timeout: float) -> Optional[str]:
+        """Tenta obter um lock distribuído; None se outro processo o detém (ver CacheManager.acquire_lock)"""
+        token = uuid.uuid4().hex
+        if not self.available:
+            return token
+        
+        try:
+            if await self.redis_client.set(lock_key(name), token, nx=True, px=int(timeout * 1000)):
+                return token
+            return None
+        except Exception as e:
+            self._handle_error("obter lock", name, e)
+            return token
+    
+    async def release_lock(self, name: str, token: str) -> None:
+        """Libera o lock se o token ainda for o dono"""
+        if not self.available:
+            return
+        
+        try:
+            await self.redis_client.eval(LOCK_RELEASE_SCRIPT, 1, lock_key(name), token)
+        except Exception as e:
+            self._handle_error("liberar lock", name, e)
+    
+    def apply_invalidation(self, data: bytes) -> None:
+        """Aplica no L1 uma mensagem recebida do canal de invalidação"""
+        if self.l1 is None:
+            return
+        try:
+            payload = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Mensagem de invalidação inválida: {data!r}")
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+        if payload.get("keys"):
+            self.l1.delete(*payload["keys"])
+        if payload.get("pattern"):
+            self.l1.delete_pattern(payload["pattern"])
+    
+    async def start_invalidation_listener(self) -> None:
+        """Inicia a inscrição no canal de invalidação (startup da aplicação)"""
+        if self.l1 is None:
+            return
+        if self._listener is not None and not self._listener.done():
+            return
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+    
+    async def _listen(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(settings.cache_invalidation_channel)
+                # Invalidações perdidas enquanto desconectado: recomeçar do zero
+                self.l1.clear()
+                self._listening = True
+                logger.info("Cache L1 ativo (inscrito no canal de invalidação)")
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self.apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Canal de invalidação indisponível, L1 suspenso: {e}")
+            finally:
+                self._listening = False
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(settings.cache_retry_after)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hits/misses e hit ratio por tier (para monitoramento)"""
+        lookups = self.l2_hits + self.l2_misses
+        return {
+            "l1": {
+                "enabled": self.l1 is not None,
+                "active": self._listening,
+                **(self.l1.get_stats() if self.l1 is not None else {}),
+            },
+            "l2": {
+                "available": self.enabled and time.monotonic() >= self._retry_at,
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "hit_ratio": round(self.l2_hits / lookups, 4) if lookups else 0.0,
+            },
+            "codec": cache_codec.get_stats(),
+        }
+    
+    async def close(self) -> None:
+        """Para o listener de invalidação e fecha o pool de conexões (shutdown da aplicação)"""
+        if self._listener is not None:
+            self._listener.cancel()
+            if self._listener.get_loop() is asyncio.get_running_loop():
+                try:
+                    await self._listener
+                except asyncio.CancelledError:
+                    pass
+            self._listener = None
+        try:
+            await self.redis_client.aclose()
+            await self.pool.disconnect()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar pool do cache: {e}")
+
+
+# Instância global do cache (síncrono: Celery/scripts)
 cache = CacheManager()
 
+# Instância global do cache assíncrono (event loop da API), com L1 opcional
+async_cache = AsyncCacheManager(
+    l1=LocalCache(
+        max_entries=settings.cache_l1_max_entries,
+        max_ttl=settings.cache_l1_max_ttl,
+    ) if settings.cache_l1_enabled else None
+)
+
+
+# Envelope das entradas do @cached com stale_ttl/early_refresh: expiração
+# lógica (epoch) e custo do último cálculo, para servir stale e refresh antecipado
+ENVELOPE_MARKER = "__cached__"
+
+# Espera por valor calculado por outro worker (lock ocupado): backoff entre leituras
+LOCK_POLL_INITIAL = 0.05
+LOCK_POLL_MAX = 0.5
+
+_MISSING = object()
+
+# Cálculos em andamento por (event loop, chave) e locks por chave (threads),
+# cada lock com contagem de uso: sai do dict quando nenhuma thread o usa
+_inflight: Dict[Tuple[int, str], asyncio.Task] = {}
+_thread_locks: Dict[str, List[Any]] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _wrap_entry(value: Any, ttl: int, delta: float) -> dict:
+    return {ENVELOPE_MARKER: 1, "value": value, "expires_at": time.time() + ttl, "delta": delta}
+
+
+def _unwrap_entry(entry: Any) -> Tuple[Any, Optional[float], float]:
+    """(valor, expiração lógica, custo); entradas sem envelope não expiram logicamente"""
+    if isinstance(entry, dict) and entry.get(ENVELOPE_MARKER) == 1:
+        return entry["value"], entry["expires_at"], entry.get("delta", 0.0)
+    return entry, None, 0.0
+
+
+def _needs_refresh(expires_at: Optional[float], delta: float, beta: float) -> bool:
+    """
+    True se a entrada expirou logicamente ou foi sorteada para refresh antecipado
+    
+    Refresh antecipado probabilístico (XFetch): a chance cresce conforme a
+    expiração se aproxima e com o custo (delta) do último cálculo.
+    """
+    if expires_at is None:
+        return False
+    now = time.time()
+    if now >= expires_at:
+        return True
+    if beta <= 0 or delta <= 0:
+        return False
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _build_cache_key(func: Callable, key_prefix: str, key_builder: Optional[Callable], args, kwargs) -> str:
+    if key_builder:
+        return key_builder(*args, **kwargs)
+    # Chave padrão: prefix:func_name:args:kwargs
+    args_str = ":".join(str(arg) for arg in args)
+    kwargs_str = ":".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
+    return f"{key_prefix}:{func.__name__}:{args_str}:{kwargs_str}"
+
+
+async def _await_value(cache_key: str, timeout: float) -> Any:
+    """Espera outro worker gravar a chave; _MISSING se o lock expirar antes"""
+    deadline = time.monotonic() + timeout
+    delay = LOCK_POLL_INITIAL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(delay)
+        entry = await async_cache.get(cache_key)
+        if entry is not None:
+            return _unwrap_entry(entry)[0]
+        delay = min(delay * 2, LOCK_POLL_MAX)
+    return _MISSING
+
+
+def _wait_value(cache_key: str, timeout: float) -> Any:
+    deadline = time.monotonic() + timeout
+    delay = LOCK_POLL_INITIAL
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return _unwrap_entry(entry)[0]
+        delay = min(delay * 2, LOCK_POLL_MAX)
+    return _MISSING
+
+
+@contextmanager
+def _thread_lock(cache_key: str, blocking: bool = True):
+    """
+    Lock da chave entre threads; produz True se foi adquirido
+
+    O registro [lock, usos] é removido quando a última thread o libera,
+    então o dict só guarda chaves em uso.
+    """
+    with _thread_locks_guard:
+        entry = _thread_locks.setdefault(cache_key, [threading.Lock(), 0])
+        entry[1] += 1
+    acquired = entry[0].acquire(blocking)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            entry[0].release()
+        with _thread_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _thread_locks[cache_key]
+
+
+def _log_refresh_error(cache_key: str, task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Refresh em background falhou, mantendo valor stale: {cache_key}: {task.exception()}")
+
 
 def cached(
     ttl: int = 300,
     key_prefix: str = "",
-    key_builder: Optional[Callable] = None
+    key_builder: Optional[Callable] = None,
+    tags: Optional[Callable] = None,
+    stale_ttl: int = 0,
+    early_refresh: float = 0.0,
+    lock_timeout: float = 10.0
 ):
     """
     Decorator para cachear resultado de função
     
+    Proteção contra stampede: em um miss, apenas uma chamada por chave executa
+    a função (lock local + lock Redis entre workers); as demais aguardam o
+    valor gravado.
+    
     Args:
         ttl: Tempo de vida em segundos (default: 5 minutos)
         key_prefix: Prefixo da chave de cache
         key_builder: Função customizada para gerar chave
+        tags: Função (mesmos argumentos) que retorna as tags da entrada
+        stale_ttl: Janela (s) após o ttl em que o último valor continua sendo
+            servido enquanto um único refresh roda em background; se o refresh
+            falhar, o valor stale segue servido até o fim da janela
+        early_refresh: Beta do refresh antecipado probabilístico (0 desativa,
+            1.0 é o valor usual; maior antecipa mais)
+        lock_timeout: Expiração do lock de cálculo e tempo máximo de espera
     
     Example:
         @cached(ttl=600, key_prefix="user")
         def get_user(user_id: str):
             return db.query(User).filter(User.id == user_id).first()
+        
+        @cached(ttl=1200, key_prefix="analytics", stale_ttl=3600, early_refresh=1.0,
+                tags=lambda org_id, period: [f"org:{org_id}"])
+        async def get_analytics(org_id: str, period: str):
+            ...
     """
+    use_envelope = stale_ttl > 0 or early_refresh > 0
+    
     def decorator(func: Callable):
+        def entry_for(result: Any, delta: float) -> Any:
+            return _wrap_entry(result, ttl, delta) if use_envelope else result
+        
+        async def compute(cache_key: str, args, kwargs) -> Any:
+            started = time.monotonic()
+            result = await func(*args, **kwargs)
+            entry_tags = tags(*args, **kwargs) if tags else None
+            await async_cache.set(
+                cache_key, entry_for(result, time.monotonic() - started), ttl + stale_ttl, tags=entry_tags
+            )
+            return result
+        
+        async def compute_locked(cache_key: str, args, kwargs, wait: bool) -> Any:
+            token = await async_cache.acquire_lock(cache_key, lock_timeout)
+            if token is None:
+                # Outro worker está calculando
+                if not wait:
+                    return _MISSING
+                value = await _await_value(cache_key, lock_timeout)
+                if value is not _MISSING:
+                    return value
+                logger.warning(f"Lock de cache expirou sem valor, calculando: {cache_key}")
+            try:
+                return await compute(cache_key, args, kwargs)
+            finally:
+                if token is not None:
+                    await async_cache.release_lock(cache_key, token)
+        
+        def start_flight(cache_key: str, args, kwargs, wait: bool) -> asyncio.Task:
+            loop = asyncio.get_running_loop()
+            flight_key = (id(loop), cache_key)
+            task = _inflight.get(flight_key)
+            if task is None or task.done():
+                task = loop.create_task(compute_locked(cache_key, args, kwargs, wait))
+                _inflight[flight_key] = task
+                task.add_done_callback(lambda t: _inflight.pop(flight_key, None) if _inflight.get(flight_key) is t else None)
+                if not wait:
+                    task.add_done_callback(lambda t: _log_refresh_error(cache_key, t))
+            return task
+        
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            # Gerar chave de cache
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                # Chave padrão: prefix:func_name:args:kwargs
-                args_str = ":".join(str(arg) for arg in args)
-                kwargs_str = ":".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
-                cache_key = f"{key_prefix}:{func.__name__}:{args_str}:{kwargs_str}"
+            cache_key = _build_cache_key(func, key_prefix, key_builder, args, kwargs)
             
             # Tentar buscar do cache
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {cache_key}")
-                return cached_value
+            entry = await async_cache.get(cache_key)
+            if entry is not None:
+                value, expires_at, delta = _unwrap_entry(entry)
+                if _needs_refresh(expires_at, delta, early_refresh):
+                    # Stale (ou sorteado): serve o valor atual e atualiza em background
+                    logger.debug(f"Cache stale, refresh em background: {cache_key}")
+                    start_flight(cache_key, args, kwargs, wait=False)
+                else:
+                    logger.debug(f"Cache hit: {cache_key}")
+                return value
             
-            # Executar função
+            # Miss: uma única execução por chave; as demais chamadas aguardam
             logger.debug(f"Cache miss: {cache_key}")
-            result = await func(*args, **kwargs)
-            
-            # Salvar no cache
-            cache.set(cache_key, result, ttl)
-            
+            result = await asyncio.shield(start_flight(cache_key, args, kwargs, wait=True))
+            if result is _MISSING:
+                # Flight em background (wait=False) perdeu o lock para outro worker
+                return await async_wrapper(*args, **kwargs)
+            return result
+        
+        def compute_sync(cache_key: str, args, kwargs) -> Any:
+            started = time.monotonic()
+            result = func(*args, **kwargs)
+            entry_tags = tags(*args, **kwargs) if tags else None
+            cache.set(cache_key, entry_for(result, time.monotonic() - started), ttl + stale_ttl, tags=entry_tags)
             return result
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            # Gerar chave de cache
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                args_str = ":".join(str(arg) for arg in args)
-                kwargs_str = ":".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
-                cache_key = f"{key_prefix}:{func.__name__}:{args_str}:{kwargs_str}"
+            cache_key = _build_cache_key(func, key_prefix, key_builder, args, kwargs)
             
             # Tentar buscar do cache
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {cache_key}")
-                return cached_value
+            entry = cache.get(cache_key)
+            if entry is not None:
+                value, expires_at, delta = _unwrap_entry(entry)
+                if not _needs_refresh(expires_at, delta, early_refresh):
+                    logger.debug(f"Cache hit: {cache_key}")
+                    return value
+                # Sem event loop: quem obtém o lock atualiza inline, os demais servem stale
+                with _thread_lock(cache_key, blocking=False) as acquired:
+                    if not acquired:
+                        return value
+                    token = cache.acquire_lock(cache_key, lock_timeout)
+                    if token is None:
+                        return value
+                    try:
+                        return compute_sync(cache_key, args, kwargs)
+                    except Exception as e:
+                        logger.warning(f"Refresh falhou, servindo valor stale: {cache_key}: {e}")
+                        return value
+                    finally:
+                        cache.release_lock(cache_key, token)
             
-            # Executar função
+            # Miss: uma única execução por chave
             logger.debug(f"Cache miss: {cache_key}")
-            result = func(*args, **kwargs)
+            with _thread_lock(cache_key):
+                # Outra thread pode ter calculado enquanto esperávamos o lock
+                entry = cache.get(cache_key)
+                if entry is not None:
+                    return _unwrap_entry(entry)[0]
+                token = cache.acquire_lock(cache_key, lock_timeout)
+                if token is None:
+                    value = _wait_value(cache_key, lock_timeout)
+                    if value is not _MISSING:
+                        return value
+                try:
+                    return compute_sync(cache_key, args, kwargs)
+                finally:
+                    if token is not None:
+                        cache.release_lock(cache_key, token)
+        
+        # Retornar wrapper apropriado
+        if asyncio.iscoroutinefunction(func):
+            return async_wrapper
+        return sync_wrapper
+    
+    return decorator
+
+
+def cached_batch(
+    ttl: int = 300,
+    key_prefix: str = "",
+    key_builder: Optional[Callable] = None,
+    tags: Optional[Callable] = None
+):
+    """
+    Decorator para funções em lote: func(items, *args, **kwargs) -> {item: valor}
+    
+    Busca todos os itens com um MGET, chama a função apenas com os itens
+    ausentes e grava os resultados em um único pipeline. Itens que a função não
+    retornar (ou retornar None) não são cacheados nem incluídos no resultado.
+    
+    Args:
+        ttl: Tempo de vida em segundos (default: 5 minutos)
+        key_prefix: Prefixo da chave de cache
+        key_builder: Função (item, *args, **kwargs) que gera a chave de um item
+        tags: Função (item, *args, **kwargs) que retorna as tags de um item
+    
+    Example:
+        @cached_batch(ttl=600, key_prefix="orgdata",
+                      tags=lambda org_id: [f"org:{org_id}"])
+        async def get_organizations(org_ids: List[str]) -> Dict[str, dict]:
+            ...
+    """
+    def decorator(func: Callable):
+        def keys_for(items, args, kwargs) -> Dict[Any, str]:
+            if key_builder:
+                return {item: key_builder(item, *args, **kwargs) for item in items}
+            args_str = ":".join(str(arg) for arg in args)
+            kwargs_str = ":".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
+            return {item: f"{key_prefix}:{func.__name__}:{item}:{args_str}:{kwargs_str}" for item in items}
+        
+        def to_store(fetched: Dict[Any, Any], keys: Dict[Any, str], args, kwargs):
+            mapping = {keys[item]: value for item, value in fetched.items() if item in keys and value is not None}
+            entry_tags = {keys[item]: tags(item, *args, **kwargs) for item in fetched if item in keys} if tags else None
+            return mapping, entry_tags
+        
+        @wraps(func)
+        async def async_wrapper(items, *args, **kwargs):
+            items = list(dict.fromkeys(items))
+            keys = keys_for(items, args, kwargs)
+            hits = await async_cache.get_many(keys.values())
+            results = {item: hits[keys[item]] for item in items if keys[item] in hits}
             
-            # Salvar no cache
-            cache.set(cache_key, result, ttl)
+            misses = [item for item in items if item not in results]
+            logger.debug(f"Cache batch {func.__name__}: {len(results)} hits, {len(misses)} misses")
+            if misses:
+                fetched = await func(misses, *args, **kwargs) or {}
+                mapping, entry_tags = to_store(fetched, keys, args, kwargs)
+                if mapping:
+                    await async_cache.set_many(mapping, ttl, tags=entry_tags)
+                results.update({item: value for item, value in fetched.items() if value is not None})
             
-            return result
+            return {item: results[item] for item in items if item in results}
+        
+        @wraps(func)
+        def sync_wrapper(items, *args, **kwargs):
+            items = list(dict.fromkeys(items))
+            keys = keys_for(items, args, kwargs)
+            hits = cache.get_many(keys.values())
+            results = {item: hits[keys[item]] for item in items if keys[item] in hits}
+            
+            misses = [item for item in items if item not in results]
+            logger.debug(f"Cache batch {func.__name__}: {len(results)} hits, {len(misses)} misses")
+            if misses:
+                fetched = func(misses, *args, **kwargs) or {}
+                mapping, entry_tags = to_store(fetched, keys, args, kwargs)
+                if mapping:
+                    cache.set_many(mapping, ttl, tags=entry_tags)
+                results.update({item: value for item, value in fetched.items() if value is not None})
+            
+            return {item: results[item] for item in items if item in results}
         
-        # Retornar wrapper apropriado
-        import asyncio
         if asyncio.iscoroutinefunction(func):
             return async_wrapper
         return sync_wrapper
@@ -272,7 +1385,7 @@ def cached(
 
 def invalidate_cache(pattern: str) -> int:
     """
-    Invalida cache por padrão
+    Invalida cache por padrão (SCAN; para invalidações frequentes use invalidate_tags)
     
     Args:
         pattern: Padrão de chaves (ex: "user:*")
@@ -290,6 +1403,21 @@ def invalidate_cache(pattern: str) -> int:
     return cache.delete_pattern(pattern)
 
 
+def invalidate_tags(*tags: str) -> int:
+    """
+    Invalida todas as entradas registradas nas tags
+    
+    Example:
+        invalidate_tags("org:1", "user:123")
+    """
+    return cache.invalidate_tags(*tags)
+
+
+async def ainvalidate_tags(*tags: str) -> int:
+    """Invalida todas as entradas registradas nas tags (versão assíncrona)"""
+    return await async_cache.invalidate_tags(*tags)
+
+
 # Funções de conveniência para casos comuns
 def cache_user_data(user_id: str, data: dict, ttl: int = 600) -> bool:
     """Cachear dados de usuário"""
@@ -302,8 +1430,13 @@ def get_cached_user_data(user_id: str) -> Optional[dict]:
 
 
 def invalidate_user_cache(user_id: str) -> int:
-    """Invalidar todo cache de usuário"""
-    return cache.delete_pattern(f"user:{user_id}:*")
+    """Invalidar todo cache de usuário (tag "user:{id}")"""
+    return cache.invalidate_tags(f"user:{user_id}")
+
+
+async def ainvalidate_user_cache(user_id: str) -> int:
+    """Invalidar todo cache de usuário (versão assíncrona, para rotas)"""
+    return await async_cache.invalidate_tags(f"user:{user_id}")
 
 
 def cache_organization_data(org_id: str, data: dict, ttl: int = 600) -> bool:
@@ -317,8 +1450,39 @@ def get_cached_organization_data(org_id: str) -> Optional[dict]:
 
 
 def invalidate_organization_cache(org_id: str) -> int:
-    """Invalidar todo cache de organização"""
-    return cache.delete_pattern(f"org:{org_id}:*")
+    """Invalidar todo cache de organização (tag "org:{id}")"""
+    return cache.invalidate_tags(f"org:{org_id}")
+
+
+async def ainvalidate_organization_cache(org_id: str) -> int:
+    """Invalidar todo cache de organização (versão assíncrona, para rotas)"""
+    return await async_cache.invalidate_tags(f"org:{org_id}")
+
+
+async def cache_principal(user_id: str, principal: dict, ttl: int = 300) -> bool:
+    """
+    Cachear resolução usuário → organização → plano/flags
+    
+    Armazenado em duas chaves para que invalidate_user_cache e
+    invalidate_organization_cache removam a entrada correspondente.
+    """
+    org_id = principal["organization_id"]
+    org_data = {k: v for k, v in principal.items() if k != "organization_id"}
+    return await async_cache.set_many(
+        {f"org:{org_id}:principal": org_data, f"user:{user_id}:org": org_id},
+        ttl,
+    )
+
+
+async def get_cached_principal(user_id: str) -> Optional[dict]:
+    """Buscar resolução usuário → organização → plano/flags do cache"""
+    org_id = await async_cache.get(f"user:{user_id}:org")
+    if not org_id:
+        return None
+    org_data = await async_cache.get(f"org:{org_id}:principal")
+    if org_data is None:
+        return None
+    return {"organization_id": org_id, **org_data}
 
 
 def cache_analytics(org_id: str, period: str, data: dict, ttl: int = 3600) -> bool:
@@ -0,0 +1,227 @@
+"""
+Codec versionado para os valores do cache Redis
+
+Cada valor gravado começa com um byte de cabeçalho (0x80 | formato << 4 |
+compressão), o que permite trocar de formato/compressão sem esvaziar o cache:
+valores antigos continuam legíveis pelo cabeçalho, e valores sem cabeçalho
+(JSON texto gravado antes do codec) são lidos como JSON. O cabeçalho fica na
+faixa 0x80-0xBF, que nunca inicia texto UTF-8 válido, então não colide com
+valores legados.
+
+- Formatos: JSON (orjson quando instalado, senão json da stdlib) ou msgpack
+- Compressão opcional (zstd ou lz4) acima de um limite de tamanho
+- Tamanho e tempo de encode/decode acumulados por prefixo de chave
+"""
+import json
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Union
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("cache_codec")
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+FORMATS = {"json": FORMAT_JSON, "msgpack": FORMAT_MSGPACK}
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+COMPRESSION_LZ4 = 2
+COMPRESSIONS = {"none": COMPRESSION_NONE, "zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4}
+
+HEADER_MARK = 0x80
+
+
+class CacheCodecError(Exception):
+    """Valor do cache ilegível (formato/compressão indisponível ou dados corrompidos)"""
+
+
+def _default(obj: Any) -> Any:
+    # Mesmo comportamento do orjson para datas em json/msgpack
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo não serializável no cache: {type(obj).__name__}")
+
+
+def key_prefix(key: str) -> str:
+    """Prefixo usado nas estatísticas (ex: "analytics:1:7d" → "analytics")"""
+    return key.split(":", 1)[0] or "-"
+
+
+class CacheCodec:
+    """Serialização + compressão com cabeçalho de versão e métricas por prefixo"""
+
+    def __init__(
+        self,
+        format: str = "json",
+        compression: str = "zstd",
+        compression_threshold: int = 1024,
+        compression_level: int = 3,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Formato de cache inválido: {format}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compressão de cache inválida: {compression}")
+
+        if format == "msgpack" and msgpack is None:
+            logger.warning("msgpack não instalado, cache usando JSON")
+            format = "json"
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard não instalado, cache sem compressão")
+            compression = "none"
+        if compression == "lz4" and lz4_frame is None:
+            logger.warning("lz4 não instalado, cache sem compressão")
+            compression = "none"
+
+        self.format = FORMATS[format]
+        self.compression = COMPRESSIONS[compression]
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # ---- serialização ----
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.format == FORMAT_MSGPACK:
+            return msgpack.packb(value, default=_default, use_bin_type=True)
+        if orjson is not None:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+    @staticmethod
+    def _deserialize(fmt: int, data: bytes) -> Any:
+        if fmt == FORMAT_JSON:
+            return orjson.loads(data) if orjson is not None else json.loads(data)
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise CacheCodecError("valor em msgpack, mas msgpack não está instalado")
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        raise CacheCodecError(f"formato desconhecido: {fmt}")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == COMPRESSION_ZSTD:
+            return zstandard.ZstdCompressor(level=self.compression_level).compress(data)
+        return lz4_frame.compress(data)
+
+    @staticmethod
+    def _decompress(compression: int, data: bytes) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return data
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise CacheCodecError("valor comprimido com zstd, mas zstandard não está instalado")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if compression == COMPRESSION_LZ4:
+            if lz4_frame is None:
+                raise CacheCodecError("valor comprimido com lz4, mas lz4 não está instalado")
+            return lz4_frame.decompress(data)
+        raise CacheCodecError(f"compressão desconhecida: {compression}")
+
+    # ---- API ----
+
+    def encode(self, value: Any, key: str = "") -> bytes:
+        """
+        Serializa o valor com cabeçalho de versão
+
+        Args:
+            value: Valor a ser cacheado
+            key: Chave do cache (apenas para métricas)
+
+        Returns:
+            Bytes prontos para o Redis
+        """
+        started = time.perf_counter()
+        payload = self._serialize(value)
+        raw_size = len(payload)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and raw_size >= self.compression_threshold:
+            compressed = self._compress(payload)
+            # Só vale a pena se de fato reduzir
+            if len(compressed) < raw_size:
+                payload = compressed
+                compression = self.compression
+        data = bytes((HEADER_MARK | (self.format << 4) | compression,)) + payload
+        self._record(key, "encode", time.perf_counter() - started, raw_size, len(data))
+        return data
+
+    def decode(self, data: Union[bytes, str], key: str = "") -> Any:
+        """
+        Desserializa um valor gravado por encode (ou JSON legado sem cabeçalho)
+
+        Raises:
+            CacheCodecError: se o valor não puder ser lido neste processo
+        """
+        started = time.perf_counter()
+        if isinstance(data, str):
+            data = data.encode()
+        header = data[0] if data else 0
+        if header & 0xC0 == HEADER_MARK:
+            fmt, compression = (header >> 4) & 0x03, header & 0x0F
+            value = self._deserialize(fmt, self._decompress(compression, data[1:]))
+        else:
+            # Valor legado: JSON texto gravado antes do codec
+            value = json.loads(data)
+        self._record(key, "decode", time.perf_counter() - started, None, len(data))
+        return value
+
+    # ---- métricas ----
+
+    def _record(self, key: str, operation: str, elapsed: float, raw_size: Optional[int], stored_size: int) -> None:
+        stats = self._stats.setdefault(key_prefix(key), {
+            "encodes": 0, "decodes": 0, "encode_ms": 0.0, "decode_ms": 0.0,
+            "raw_bytes": 0, "stored_bytes": 0,
+        })
+        if operation == "encode":
+            stats["encodes"] += 1
+            stats["encode_ms"] += elapsed * 1000
+            stats["raw_bytes"] += raw_size
+            stats["stored_bytes"] += stored_size
+        else:
+            stats["decodes"] += 1
+            stats["decode_ms"] += elapsed * 1000
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Tamanho médio, razão de compressão e tempo médio por prefixo de chave"""
+        report = {}
+        for prefix, stats in self._stats.items():
+            encodes, decodes = stats["encodes"], stats["decodes"]
+            report[prefix] = {
+                "encodes": encodes,
+                "decodes": decodes,
+                "avg_raw_bytes": round(stats["raw_bytes"] / encodes) if encodes else 0,
+                "avg_stored_bytes": round(stats["stored_bytes"] / encodes) if encodes else 0,
+                "compression_ratio": round(stats["stored_bytes"] / stats["raw_bytes"], 3) if stats["raw_bytes"] else 1.0,
+                "avg_encode_ms": round(stats["encode_ms"] / encodes, 4) if encodes else 0.0,
+                "avg_decode_ms": round(stats["decode_ms"] / decodes, 4) if decodes else 0.0,
+            }
+        return report
+
+
+# Instância global do codec (usada por cache e async_cache)
+cache_codec = CacheCodec(
+    format=settings.cache_codec,
+    compression=settings.cache_compression,
+    compression_threshold=settings.cache_compression_threshold,
+)
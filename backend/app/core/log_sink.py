@@ -0,0 +1,180 @@
+"""
+Writer assíncrono e em lote para a tabela api_logs
+
+As rotas apenas enfileiram o registro (sem round trip ao banco); uma task em
+background faz inserts em lote por tamanho ou intervalo, e o restante da fila
+é gravado no shutdown da aplicação.
+"""
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("log_sink")
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+
+class ApiLogSink:
+    """Fila limitada de registros de log com flush em lote"""
+
+    def __init__(
+        self,
+        table: str = "api_logs",
+        max_queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+        drop_policy: str = DROP_OLDEST,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy inválida: {drop_policy}")
+        self.table = table
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        """
+        Enfileira um registro sem bloquear
+
+        Returns:
+            False se o registro foi descartado pela política de fila cheia
+        """
+        row.setdefault("created_at", datetime.utcnow().isoformat())
+
+        if len(self._queue) >= self.max_queue_size:
+            self.dropped += 1
+            if self.drop_policy == DROP_NEWEST:
+                return False
+            self._queue.popleft()
+
+        self._queue.append(row)
+        self.enqueued += 1
+        self._ensure_started()
+
+        # Backpressure: lote cheio acorda o writer sem esperar o intervalo
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _ensure_started(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fora do event loop (ex: scripts/Celery): o flush ocorre no stop()
+            return
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def start(self) -> None:
+        """Inicia a task de flush (startup da aplicação)"""
+        self._ensure_started()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Erro no flush de api_logs: {e}", exc_info=True)
+
+    async def flush(self) -> int:
+        """
+        Grava todos os registros enfileirados em inserts de até batch_size
+
+        Returns:
+            Número de registros gravados
+        """
+        lock = self._flush_lock or asyncio.Lock()
+        written = 0
+        async with lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                try:
+                    written += await self._write_batch(batch)
+                except asyncio.CancelledError:
+                    # Lote em andamento volta para o início da fila (gravado no próximo flush)
+                    self._queue.extendleft(reversed(batch))
+                    raise
+        return written
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        from app.database import get_async_supabase
+
+        # Bulk insert do PostgREST exige o mesmo conjunto de colunas por request
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in batch:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        written = 0
+        for rows in groups.values():
+            try:
+                await get_async_supabase().table(self.table).insert(rows).execute()
+                written += len(rows)
+            except Exception as e:
+                # Logs são best-effort: nunca falhar a requisição por eles
+                self.failed += len(rows)
+                logger.error(f"Erro ao gravar {len(rows)} registro(s) em {self.table}: {e}")
+        self.written += written
+        return written
+
+    async def stop(self) -> None:
+        """Para a task de flush e grava o que restou na fila (shutdown)"""
+        if self._task is not None:
+            if self._task.get_loop() is asyncio.get_running_loop():
+                # A task termina o lote em andamento e sai do loop (sem cancelamento)
+                self._stopping = True
+                self._wakeup.set()
+                try:
+                    await self._task
+                finally:
+                    self._stopping = False
+            else:
+                self._task.cancel()
+            self._task = None
+            self._flush_lock = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas da fila (para monitoramento)"""
+        return {
+            "queue_size": len(self._queue),
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# Instância global do writer de api_logs
+api_log_sink = ApiLogSink(
+    max_queue_size=settings.api_log_queue_size,
+    batch_size=settings.api_log_batch_size,
+    flush_interval=settings.api_log_flush_interval,
+    drop_policy=settings.api_log_drop_policy,
+)
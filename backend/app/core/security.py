@@ -4,7 +4,13 @@ Security middleware for authentication and authorization
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Tuple
-from app.database import supabase
+from app.database import supabase, get_async_supabase
+from app.config import settings
+from app.core.token_verifier import (
+    token_verifier,
+    TokenVerificationError,
+    LocalVerificationUnavailable,
+)
 from app.utils.logger import setup_logger
 import asyncio
 
@@ -26,12 +32,27 @@ async def get_current_user(
     token = credentials.credentials
     
     try:
-        # Validate token with Supabase Auth
-        def _sync_get_user():
-            return supabase.auth.get_user(token)
-        
-        response = await asyncio.to_thread(_sync_get_user)
-        user = response.user if hasattr(response, 'user') else response.get('user')
+        user = None
+        
+        # Validate token locally (JWT secret / JWKS), without Supabase round trip
+        if settings.auth_local_verification:
+            try:
+                user = await token_verifier.verify(token)
+            except TokenVerificationError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid authentication token"
+                )
+            except LocalVerificationUnavailable:
+                user = None
+        
+        # Fallback: validate token with Supabase Auth
+        if user is None:
+            def _sync_get_user():
+                return supabase.auth.get_user(token)
+            
+            response = await asyncio.to_thread(_sync_get_user)
+            user = response.user if hasattr(response, 'user') else response.get('user')
         
         if not user:
             raise HTTPException(
@@ -42,10 +63,7 @@ async def get_current_user(
         user_id = user.id
         
         # Get organization_id from users table
-        def _sync_get_org():
-            return supabase.table("users").select("organization_id").eq("id", user_id).single().execute()
-        
-        org_response = await asyncio.to_thread(_sync_get_org)
+        org_response = await get_async_supabase().table("users").select("organization_id").eq("id", user_id).single().execute()
         org_data = org_response.data if hasattr(org_response, 'data') else org_response.get('data')
         
         if not org_data or not org_data.get('organization_id'):
@@ -95,10 +113,7 @@ async def verify_plan(
     
     try:
         # Get organization plan
-        def _sync_get_plan():
-            return supabase.table("organizations").select("plan").eq("id", organization_id).single().execute()
-        
-        response = await asyncio.to_thread(_sync_get_plan)
+        response = await get_async_supabase().table("organizations").select("plan").eq("id", organization_id).single().execute()
         org_data = response.data if hasattr(response, 'data') else response.get('data')
         
         if not org_data:
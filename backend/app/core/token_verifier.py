@@ -0,0 +1,204 @@
+"""
+Verificação local de JWTs do Supabase
+
+Valida assinatura, exp, aud e iss sem round trip ao Supabase Auth, usando o
+JWT secret do projeto (HS256) ou as chaves públicas do JWKS (RS256/ES256).
+Tokens já verificados ficam em um LRU limitado até expirarem.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from jose import jwt, JWTError
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("token_verifier")
+
+SUPABASE_AUDIENCE = "authenticated"
+HMAC_ALGORITHMS = ["HS256"]
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+# Intervalo mínimo entre refreshes forçados do JWKS (kid desconhecido)
+JWKS_MIN_REFRESH_INTERVAL = 30
+
+
+class TokenVerificationError(Exception):
+    """Token inválido, expirado ou com claims incorretas"""
+
+
+class LocalVerificationUnavailable(Exception):
+    """Não há chave local para verificar o token (usar verificação remota)"""
+
+
+@dataclass(frozen=True)
+class VerifiedUser:
+    """Usuário extraído das claims de um JWT verificado"""
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    session_id: Optional[str] = None
+    expires_at: int = 0
+    claims: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def user_metadata(self) -> Dict[str, Any]:
+        return self.claims.get("user_metadata") or {}
+
+    @property
+    def app_metadata(self) -> Dict[str, Any]:
+        return self.claims.get("app_metadata") or {}
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "VerifiedUser":
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            session_id=claims.get("session_id"),
+            expires_at=int(claims.get("exp", 0)),
+            claims=claims,
+        )
+
+
+class TokenVerifier:
+    """Verificador de JWT com cache de chaves (JWKS) e LRU de tokens verificados"""
+
+    def __init__(
+        self,
+        supabase_url: str,
+        jwt_secret: Optional[str] = None,
+        cache_size: int = 1024,
+        jwks_ttl: int = 3600,
+    ):
+        base_url = supabase_url.rstrip("/")
+        self.issuer = f"{base_url}/auth/v1"
+        self.jwks_url = f"{self.issuer}/.well-known/jwks.json"
+        self.jwt_secret = jwt_secret
+        self.cache_size = cache_size
+        self.jwks_ttl = jwks_ttl
+
+        self._tokens: "OrderedDict[str, VerifiedUser]" = OrderedDict()
+        self._jwks: Dict[str, Dict[str, Any]] = {}
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = asyncio.Lock()
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _get_cached(self, key: str) -> Optional[VerifiedUser]:
+        user = self._tokens.get(key)
+        if user is None:
+            return None
+        if user.expires_at <= time.time():
+            self._tokens.pop(key, None)
+            return None
+        self._tokens.move_to_end(key)
+        return user
+
+    def _store(self, key: str, user: VerifiedUser) -> None:
+        if self.cache_size <= 0:
+            return
+        self._tokens[key] = user
+        self._tokens.move_to_end(key)
+        while len(self._tokens) > self.cache_size:
+            self._tokens.popitem(last=False)
+
+    def forget(self, token: str) -> None:
+        """Remove um token do LRU (ex: após detectar sessão revogada)"""
+        self._tokens.pop(self._token_key(token), None)
+
+    async def _fetch_jwks(self) -> None:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+            keys = response.json().get("keys", [])
+        self._jwks = {k["kid"]: k for k in keys if k.get("kid")}
+        self._jwks_fetched_at = time.monotonic()
+        logger.info(f"JWKS carregado com {len(self._jwks)} chave(s)")
+
+    async def _get_signing_key(self, kid: Optional[str]) -> Dict[str, Any]:
+        age = time.monotonic() - self._jwks_fetched_at
+        if kid in self._jwks and age < self.jwks_ttl:
+            return self._jwks[kid]
+
+        async with self._jwks_lock:
+            age = time.monotonic() - self._jwks_fetched_at
+            stale = age >= self.jwks_ttl
+            unknown_kid = kid not in self._jwks and age >= JWKS_MIN_REFRESH_INTERVAL
+            if stale or unknown_kid:
+                try:
+                    await self._fetch_jwks()
+                except Exception as e:
+                    logger.warning(f"Falha ao buscar JWKS: {e}")
+                    if not self._jwks:
+                        raise LocalVerificationUnavailable("JWKS indisponível") from e
+
+        if kid not in self._jwks:
+            raise TokenVerificationError("Chave de assinatura desconhecida")
+        return self._jwks[kid]
+
+    async def _resolve_key(self, token: str) -> Tuple[Any, list]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise TokenVerificationError("Token malformado") from e
+
+        alg = header.get("alg")
+        if alg in HMAC_ALGORITHMS:
+            if not self.jwt_secret:
+                raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET não configurado")
+            return self.jwt_secret, HMAC_ALGORITHMS
+        if alg in ASYMMETRIC_ALGORITHMS:
+            return await self._get_signing_key(header.get("kid")), [alg]
+        raise TokenVerificationError(f"Algoritmo não suportado: {alg}")
+
+    async def verify(self, token: str) -> VerifiedUser:
+        """
+        Verifica o token localmente
+
+        Returns:
+            VerifiedUser com as claims do token
+
+        Raises:
+            TokenVerificationError: token inválido ou expirado
+            LocalVerificationUnavailable: sem chave local para este token
+        """
+        key = self._token_key(token)
+        cached_user = self._get_cached(key)
+        if cached_user is not None:
+            return cached_user
+
+        signing_key, algorithms = await self._resolve_key(token)
+        try:
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=algorithms,
+                audience=SUPABASE_AUDIENCE,
+                issuer=self.issuer,
+            )
+        except JWTError as e:
+            raise TokenVerificationError(str(e)) from e
+
+        if not claims.get("sub") or "exp" not in claims:
+            raise TokenVerificationError("Token sem sub/exp")
+
+        user = VerifiedUser.from_claims(claims)
+        self._store(key, user)
+        return user
+
+
+# Instância global do verificador
+token_verifier = TokenVerifier(
+    supabase_url=settings.supabase_url,
+    jwt_secret=settings.supabase_jwt_secret,
+    cache_size=settings.auth_token_cache_size,
+    jwks_ttl=settings.auth_jwks_ttl,
+)
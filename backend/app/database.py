@@ -2,9 +2,11 @@
 Database connection and session management
 """
 from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
 from app.config import settings
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional, Dict, Any
 from contextlib import asynccontextmanager
+import httpx
 
 # Cliente Supabase global
 supabase: Client = create_client(
@@ -13,6 +15,132 @@ supabase: Client = create_client(
 )
 
 
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """
+    Cliente PostgREST assíncrono sobre um httpx.AsyncClient com pool configurável
+    
+    Mantém a mesma API fluente do cliente síncrono (table/select/eq/...),
+    mas com execute() aguardável, sem ocupar o thread pool:
+    
+        res = await get_async_supabase().table("videos").select("*").eq("id", video_id).single().execute()
+    """
+    def __init__(self, base_url: str, *, limits: httpx.Limits, http2: bool = True, **kwargs):
+        self.limits = limits
+        self.http2 = http2
+        super().__init__(base_url, **kwargs)
+    
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=self.http2,
+            limits=self.limits,
+        )
+
+
+# Cliente assíncrono global (criado sob demanda, compartilhado por todas as rotas)
+_async_supabase: Optional[PooledAsyncPostgrestClient] = None
+
+
+def get_async_supabase() -> PooledAsyncPostgrestClient:
+    """
+    Retorna o cliente PostgREST assíncrono compartilhado (pool HTTP com keep-alive)
+    """
+    global _async_supabase
+    if _async_supabase is None:
+        key = settings.supabase_service_role_key
+        _async_supabase = PooledAsyncPostgrestClient(
+            f"{settings.supabase_url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(settings.db_timeout, connect=settings.db_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.db_pool_max_connections,
+                max_keepalive_connections=settings.db_pool_max_keepalive,
+                keepalive_expiry=settings.db_pool_keepalive_expiry,
+            ),
+            http2=settings.db_http2,
+        )
+    return _async_supabase
+
+
+async def close_async_supabase() -> None:
+    """Fecha o pool HTTP do cliente assíncrono (shutdown da aplicação)"""
+    global _async_supabase
+    if _async_supabase is not None:
+        await _async_supabase.aclose()
+        _async_supabase = None
+
+
+def get_db_pool_stats() -> Dict[str, Any]:
+    """
+    Utilização do pool HTTP do cliente assíncrono (para monitoramento)
+    
+    Returns:
+        Dict com conexões abertas/ativas/ociosas, requisições aguardando e utilização;
+        os contadores ficam zerados (introspected=False) se os internos do
+        httpx mudarem de forma
+    """
+    stats: Dict[str, Any] = {
+        "initialized": _async_supabase is not None,
+        "http2": settings.db_http2,
+        "max_connections": settings.db_pool_max_connections,
+        "max_keepalive_connections": settings.db_pool_max_keepalive,
+        "open_connections": 0,
+        "active_connections": 0,
+        "idle_connections": 0,
+        "pending_requests": 0,
+        "utilization": 0.0,
+        # False: só os limites configurados (internos do pool indisponíveis)
+        "introspected": False,
+    }
+    if _async_supabase is None:
+        return stats
+    
+    usage = _pool_usage(_async_supabase.session)
+    if usage is None:
+        return stats
+    
+    stats.update(usage)
+    stats["introspected"] = True
+    stats["utilization"] = (
+        round(usage["active_connections"] / settings.db_pool_max_connections, 3)
+        if settings.db_pool_max_connections else 0.0
+    )
+    return stats
+
+
+def _pool_usage(session: httpx.AsyncClient) -> Optional[Dict[str, int]]:
+    """
+    Conexões do pool lidas dos internos do httpx/httpcore (API privada)
+    
+    Returns:
+        Dict com conexões abertas/ativas/ociosas e requisições aguardando,
+        ou None se a versão instalada não expuser esses internos
+    """
+    try:
+        pool = session._transport._pool
+        connections = list(pool.connections)
+        idle = sum(1 for conn in connections if conn.is_idle())
+        pending = sum(1 for req in pool._requests if req.connection is None)
+    except Exception:
+        return None
+    return {
+        "open_connections": len(connections),
+        "active_connections": len(connections) - idle,
+        "idle_connections": idle,
+        "pending_requests": pending,
+    }
+
+
 class AsyncSupabaseSession:
     """
     Wrapper assíncrono para operações do Supabase
@@ -94,17 +222,12 @@ async def get_organization_by_user_id(user_id: str) -> str | None:
     Returns:
         ID da organização ou None se não encontrado
     """
-    import asyncio
     from app.utils.logger import get_logger
     
     logger = get_logger("database")
     
-    def _sync_query():
-        result = supabase.table("users").select("organization_id").eq("id", user_id).single().execute()
-        return result
-    
     try:
-        result = await asyncio.to_thread(_sync_query)
+        result = await get_async_supabase().table("users").select("organization_id").eq("id", user_id).single().execute()
         data = result.data if hasattr(result, "data") else result.get("data")
         
         if not data:
@@ -124,7 +247,46 @@ async def get_organization_by_user_id(user_id: str) -> str | None:
         return None
 
 
-async def log_api_call(
+async def get_principal_by_user_id(user_id: str) -> dict | None:
+    """
+    Resolve usuário → organização → plano e flags de integração em uma única query
+    
+    Args:
+        user_id: ID do usuário no Supabase Auth
+    
+    Returns:
+        Dict com organization_id, plan, heygen_configured e metricool_configured,
+        ou None se o usuário não tiver organização
+    """
+    from app.utils.logger import get_logger
+    
+    logger = get_logger("database")
+    
+    try:
+        result = await get_async_supabase().table("users").select(
+            "organization_id, organizations(plan, heygen_api_key, metricool_user_token)"
+        ).eq("id", user_id).single().execute()
+        data = result.data if hasattr(result, "data") else result.get("data")
+        
+        if not data or not data.get("organization_id"):
+            logger.warning(f"User {user_id} has no organization_id")
+            return None
+        
+        org = data.get("organizations") or {}
+        # Nunca expor/cachear as credenciais em si, apenas se estão configuradas
+        return {
+            "organization_id": data["organization_id"],
+            "plan": org.get("plan") or "free",
+            "heygen_configured": bool(org.get("heygen_api_key")),
+            "metricool_configured": bool(org.get("metricool_user_token")),
+        }
+        
+    except Exception as e:
+        logger.error(f"Error resolving principal for user {user_id}: {e}", exc_info=True)
+        return None
+
+
+def log_api_call(
     org_id: str,
     module: str,
     endpoint: str,
@@ -137,6 +299,9 @@ async def log_api_call(
     """
     Registra chamada de API na tabela api_logs
     
+    Apenas enfileira o registro no writer em lote (app.core.log_sink);
+    a requisição não aguarda o insert no banco.
+    
     Args:
         org_id: ID da organização
         module: Nome do módulo (ex: "module2")
@@ -147,24 +312,15 @@ async def log_api_call(
         status_code: Código de status HTTP
         duration_ms: Duração da chamada em milissegundos
     """
-    import asyncio
-    from datetime import datetime
-    
-    def _sync_log():
-        try:
-            supabase.table("api_logs").insert({
-                "org_id": org_id,
-                "module": module,
-                "endpoint": endpoint,
-                "method": method,
-                "request_data": request_data,
-                "response_data": response_data,
-                "status_code": status_code,
-                "duration_ms": duration_ms,
-                "created_at": datetime.utcnow().isoformat()
-            }).execute()
-        except Exception as e:
-            # Log error but don't fail the request
-            print(f"Error logging API call: {e}")
-    
-    await asyncio.to_thread(_sync_log)
+    from app.core.log_sink import api_log_sink
+    
+    api_log_sink.enqueue({
+        "org_id": org_id,
+        "module": module,
+        "endpoint": endpoint,
+        "method": method,
+        "request_data": request_data,
+        "response_data": response_data,
+        "status_code": status_code,
+        "duration_ms": duration_ms
+    })
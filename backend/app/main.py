@@ -7,6 +7,11 @@ from slowapi.errors import RateLimitExceeded
 from app.config import settings
 from app.utils.logger import setup_logger, register_logging_middlewares
 from app.api.error_handlers import register_error_handlers
+from app.database import close_async_supabase
+from app.core.log_sink import api_log_sink
+from app.core.cache import async_cache
+from app.services.ffmpeg_scheduler import ffmpeg_scheduler
+from app.services.job_workspace import workspace_manager
 from app.api.routes import (
     health, 
     integrations, 
@@ -106,7 +111,17 @@ async def startup_event():
     logger.info(f"Starting RENUM API in {settings.environment} mode")
     logger.info(f"Rate limiting configurado: {settings.get_redis_url()}")
     logger.info(f"Limite padrão: 100 requests/minuto")
+    await api_log_sink.start()
+    await async_cache.start_invalidation_listener()
+    # Remove workspaces left by crashed workers, then keep sweeping
+    workspace_manager.start_sweeper(settings.workspace_sweep_interval)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down RENUM API")
+    await ffmpeg_scheduler.shutdown()
+    await workspace_manager.stop_sweeper()
+    # Gravar api_logs pendentes antes de fechar o pool HTTP
+    await api_log_sink.stop()
+    await close_async_supabase()
+    await async_cache.close()
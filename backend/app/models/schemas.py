@@ -45,6 +45,13 @@ class TranscriptionResponse(BaseModel):
     language: str
     duration: float
 
+class WaveformResponse(BaseModel):
+    start: float
+    end: float
+    sampleDuration: float
+    min: List[float]
+    max: List[float]
+
 # Silence Detection
 class SilenceItem(BaseModel):
     start: float
@@ -87,11 +94,26 @@ class SilenceRemovalConfig(BaseModel):
     enabled: bool
     silences: List[SilenceItem]
 
+class RenditionConfig(BaseModel):
+    name: str  # tiktok, reels, youtube...
+    aspectRatio: str = "9:16"  # 9:16, 1:1, 4:5, 16:9
+    fit: str = "crop"  # crop, pad
+    maxResolution: int = 1920  # longest side, in pixels
+    maxBitrateKbps: Optional[int] = None
+
 class VideoProcessRequest(BaseModel):
     videoId: str
     subtitles: Optional[SubtitleConfig] = None
     trim: Optional[TrimConfig] = None
     silenceRemoval: Optional[SilenceRemovalConfig] = None
+    renditions: Optional[List[RenditionConfig]] = None
+
+class RenditionOutput(BaseModel):
+    name: str
+    url: str
+    width: int
+    height: int
+    sizeMb: float
 
 class VideoProcessResponse(BaseModel):
     jobId: str
@@ -107,6 +129,8 @@ class VideoProcessStatus(BaseModel):
     processedDuration: Optional[float] = None
     processedSizeMb: Optional[float] = None
     error: Optional[str] = None
+    queuePosition: Optional[int] = None
+    renditions: Optional[List[RenditionOutput]] = None
 
 # Description Generation
 class PlatformDescription(BaseModel):
@@ -0,0 +1,187 @@
+"""
+Content-addressed cache of intermediate pipeline artifacts
+A stage's output is stored under hash(input artifact + stage parameters), so
+re-running a job that only changes a later stage (e.g. the subtitle style)
+reuses the earlier stage's file (e.g. the trimmed/silence-removed cut)
+instead of recomputing it. Builds are single-flight per key and the store is
+bounded by a disk quota (LRU eviction, leased entries are kept)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("artifact_cache")
+
+TMP_MARKER = ".tmp"
+
+# Writes the artifact to the given path
+Builder = Callable[[Path], Awaitable[Any]]
+
+
+def file_identity(path: str) -> str:
+    """
+    Identity of an input file for cache keys
+
+    Media cache entries are already content-addressed (video_id + ETag), so
+    name and size identify them; mtime is not used (it is the LRU clock).
+    """
+    return f"{Path(path).name}:{os.path.getsize(path)}"
+
+
+def artifact_key(stage: str, input_id: str, params: Dict[str, Any]) -> str:
+    """Cache key of a stage's output: hash of its input and parameters"""
+    payload = json.dumps({"stage": stage, "input": input_id, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class ArtifactCache:
+    """Disk-bounded store of stage outputs (max_bytes=0 disables it)"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+        # Builds in flight (one per key) and artifacts in use by jobs
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._leases: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+        self.evictions = 0
+        # Current size of the store (measured on each eviction pass)
+        self.bytes_stored = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path(self, key: str, suffix: str = ".mp4") -> Path:
+        return self.root / f"{key}{suffix}"
+
+    async def get_or_build(self, key: str, build: Builder, suffix: str = ".mp4") -> Path:
+        """
+        The artifact for key, building it if it is not cached
+
+        Args:
+            key: Artifact key (see artifact_key)
+            build: Coroutine function writing the artifact to a given path
+            suffix: File suffix (FFmpeg infers the container from it)
+        """
+        path = self.path(key, suffix)
+        if path.exists():
+            self.hits += 1
+            self._touch(path)
+            return path
+
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            self.misses += 1
+            task = asyncio.create_task(self._build(path, build))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._inflight.pop(k, None) if self._inflight.get(k) is t else None)
+        else:
+            self.hits += 1
+        # shield: a cancelled job must not abort the build shared with others
+        return await asyncio.shield(task)
+
+    @asynccontextmanager
+    async def open(self, key: str, build: Builder, suffix: str = ".mp4"):
+        """
+        Get or build an artifact and hold it while the block runs (it cannot be evicted)
+
+        Usage:
+            async with artifact_cache.open(key, build) as path:
+                ...
+        """
+        path = await self.get_or_build(key, build, suffix)
+        name = path.name
+        self._leases[name] = self._leases.get(name, 0) + 1
+        try:
+            yield path
+        finally:
+            self._leases[name] -= 1
+            if self._leases[name] <= 0:
+                del self._leases[name]
+
+    async def _build(self, path: Path, build: Builder) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.stem}{TMP_MARKER}{path.suffix}")
+        started = time.monotonic()
+        try:
+            await build(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        size = path.stat().st_size
+        logger.info(f"Artifact cached: {path.name} ({size} bytes, {time.monotonic() - started:.1f}s)")
+        await asyncio.to_thread(self._evict, path.name)
+        return path
+
+    # ---- quota ----
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # mtime is the LRU clock
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Delete least recently used artifacts until the store fits the quota"""
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            total += stat.st_size
+            if TMP_MARKER not in entry.name:
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep or entry.name in self._leases:
+                continue
+            entry.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Artifact cache evicted {entry.name} ({size} bytes)")
+        self.bytes_stored = total
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics (for monitoring)"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "failed": self.failed,
+            "inflight": len(self._inflight),
+            "leased": len(self._leases),
+            "evictions": self.evictions,
+            "bytes_stored": self.bytes_stored,
+        }
+
+
+# Singleton instance
+artifact_cache = ArtifactCache(
+    root=str(Path(settings.temp_video_path) / "artifacts"),
+    max_bytes=int(settings.artifact_cache_max_gb * 1024 ** 3),
+)
@@ -0,0 +1,185 @@
+"""
+ASS subtitle generator for burned-in captions
+Groups word timestamps into lines and sentences (punctuation + pauses) and
+writes one event per line with karaoke \\k tags for the word highlight, so a
+long video has a few hundred libass events instead of one per word. Style is
+written as an ASS [V4+ Styles] block (no force_style escaping) and events are
+streamed to the file as they are grouped
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+Word = Dict[str, Any]
+
+# Script resolution: libass' default for SRT, so fontSize keeps its old scale
+PLAY_RES_X = 384
+PLAY_RES_Y = 288
+
+# Line grouping (word-by-word preset)
+LINE_MAX_CHARS = 32
+LINE_MAX_WORDS = 6
+LINE_PAUSE = 0.6
+
+# Sentence grouping (sentence preset)
+SENTENCE_MAX_CHARS = 90
+SENTENCE_PAUSE = 1.0
+
+SENTENCE_END = (".", "!", "?", "…")
+CLAUSE_END = SENTENCE_END + (",", ";", ":")
+
+# ASS numpad alignment
+ALIGNMENT = {"bottom": 2, "center": 5, "top": 8}
+
+
+def ass_color(hex_color: str, opacity: float = 1.0) -> str:
+    """"#RRGGBB" + opacity to ASS &HAABBGGRR (alpha 00 is opaque)"""
+    value = (hex_color or "#FFFFFF").lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    value = value.upper().ljust(6, "F")[:6]
+    alpha = round((1 - max(0.0, min(1.0, opacity))) * 255)
+    return f"&H{alpha:02X}{value[4:6]}{value[2:4]}{value[0:2]}"
+
+
+def ass_time(seconds: float) -> str:
+    """Seconds to ASS time (H:MM:SS.cc)"""
+    centiseconds = max(0, round(seconds * 100))
+    hours, rest = divmod(centiseconds, 360000)
+    minutes, rest = divmod(rest, 6000)
+    secs, cs = divmod(rest, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{cs:02d}"
+
+
+def escape_text(text: str) -> str:
+    """Neutralize ASS override blocks and escapes in transcript text"""
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")").replace("\n", " ").strip()
+
+
+def _clean(words: Iterable[Word]) -> Iterator[Word]:
+    for word in words:
+        text = escape_text(str(word.get("text", "")))
+        if text:
+            yield {"start": float(word["start"]), "end": float(word["end"]), "text": text}
+
+
+def group_words(
+    words: Iterable[Word],
+    max_chars: int,
+    max_words: int,
+    pause: float,
+    break_on: tuple
+) -> Iterator[List[Word]]:
+    """
+    Split a word stream into groups
+
+    A group ends after a word ending with one of `break_on`, before a pause
+    longer than `pause` seconds, or when it would exceed max_chars/max_words.
+    """
+    group: List[Word] = []
+    length = 0
+    for word in _clean(words):
+        if group:
+            gap = word["start"] - group[-1]["end"]
+            too_long = length + 1 + len(word["text"]) > max_chars or len(group) >= max_words
+            if gap > pause or too_long:
+                yield group
+                group, length = [], 0
+        group.append(word)
+        length += len(word["text"]) + (1 if length else 0)
+        if word["text"].endswith(break_on):
+            yield group
+            group, length = [], 0
+    if group:
+        yield group
+
+
+def group_lines(words: Iterable[Word]) -> Iterator[List[Word]]:
+    """Short caption lines: clauses, pauses and a few words at most"""
+    return group_words(words, LINE_MAX_CHARS, LINE_MAX_WORDS, LINE_PAUSE, CLAUSE_END)
+
+
+def group_sentences(words: Iterable[Word]) -> Iterator[List[Word]]:
+    """Sentences: end punctuation or a long pause (wrapped by libass)"""
+    return group_words(words, SENTENCE_MAX_CHARS, 10 ** 6, SENTENCE_PAUSE, SENTENCE_END)
+
+
+def karaoke_text(line: List[Word]) -> str:
+    """Line text with a \\k tag per word (durations in centiseconds, no drift)"""
+    parts = []
+    for index, word in enumerate(line):
+        start = round(word["start"] * 100)
+        end = round((line[index + 1]["start"] if index + 1 < len(line) else word["end"]) * 100)
+        parts.append(f"{{\\k{max(0, end - start)}}}{word['text']}")
+    return " ".join(parts)
+
+
+def style_block(style: Dict[str, Any]) -> str:
+    """[V4+ Styles] section for a subtitle style"""
+    # Karaoke: words start in SecondaryColour and switch to PrimaryColour when spoken
+    text_color = style.get("textColor") or style.get("fontColor") or "#FFFFFF"
+    highlight_color = style.get("highlightColor") or text_color
+    back_color = ass_color(style.get("backgroundColor") or "#000000", style.get("backgroundOpacity", 0.7))
+    alignment = ALIGNMENT.get(style.get("position"), ALIGNMENT["bottom"])
+    margin_v = int(style.get("marginBottom") or 10)
+    return (
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,{style.get('fontFamily') or 'Arial'},{int(style.get('fontSize') or 32)},"
+        f"{ass_color(highlight_color)},{ass_color(text_color)},{back_color},{back_color},"
+        f"-1,0,0,0,100,100,0,0,4,1,0,{alignment},10,10,{margin_v},1\n"
+    )
+
+
+def _dialogue(f: TextIO, start: float, end: float, text: str) -> None:
+    f.write(f"Dialogue: 0,{ass_time(start)},{ass_time(end)},Default,,0,0,0,,{text}\n")
+
+
+def write_ass(f: TextIO, segments: Iterable[Word], style: Dict[str, Any]) -> int:
+    """
+    Stream an ASS script for word-level segments
+
+    Args:
+        f: Text file to write to
+        segments: Words with start, end, text (any iterable; read once)
+        style: Subtitle style (preset, colors, font, position)
+
+    Returns:
+        Number of dialogue events written
+    """
+    f.write(
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {PLAY_RES_X}\n"
+        f"PlayResY: {PLAY_RES_Y}\n"
+        "WrapStyle: 0\n"
+        "ScaledBorderAndShadow: yes\n\n"
+    )
+    f.write(style_block(style))
+    f.write("\n[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
+
+    preset = style.get("preset", "word-by-word")
+    events = 0
+    if preset == "full":
+        # All text at once
+        words = list(_clean(segments))
+        if words:
+            _dialogue(f, words[0]["start"], words[-1]["end"], " ".join(w["text"] for w in words))
+            events = 1
+    elif preset == "sentence":
+        for sentence in group_sentences(segments):
+            _dialogue(f, sentence[0]["start"], sentence[-1]["end"], " ".join(w["text"] for w in sentence))
+            events += 1
+    else:
+        # word-by-word: one karaoke line per group, the spoken word is highlighted
+        for line in group_lines(segments):
+            _dialogue(f, line[0]["start"], line[-1]["end"], karaoke_text(line))
+            events += 1
+    return events
+
+
+def create_ass_file(path: Path, segments: Iterable[Word], style: Dict[str, Any]) -> int:
+    """Write an ASS subtitle file (see write_ass)"""
+    with open(path, "w", encoding="utf-8") as f:
+        return write_ass(f, segments, style)
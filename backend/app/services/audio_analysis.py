@@ -0,0 +1,403 @@
+"""
+Single-decode audio analysis per video
+The audio is decoded once to 16 kHz mono PCM (the upload proxy's WAV, or one
+extraction from the original) and everything the editor needs is derived from
+that buffer: the transcription WAV, an RMS envelope, silence intervals and a
+min/max waveform pyramid. The WAV is memory-mapped and reduced with NumPy
+strided views; envelopes are persisted next to the WAV as int8 arrays and
+cached per video, so the endpoints are lookups
+"""
+import asyncio
+import math
+import os
+import struct
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.ffmpeg_runner import run_ffmpeg
+from app.services.media_cache import media_cache
+from app.services.media_proxy import AUDIO_SAMPLE_RATE, media_proxy
+from app.utils.logger import get_logger
+
+logger = get_logger("audio_analysis")
+
+# Envelope resolution (10 ms frames)
+FRAME_SECONDS = 0.01
+
+# dB value for digital silence (log10(0) is -inf); fits the int8 envelope
+SILENCE_FLOOR_DB = -100
+
+# Envelope frames reduced per NumPy block (~60 s), bounds the float32 working set
+BLOCK_FRAMES = 6000
+
+# Each pyramid level merges this many frames of the level below...
+PYRAMID_FACTOR = 4
+# ...until a level is at most this long
+PYRAMID_MIN_LENGTH = 256
+
+# Bumped when the persisted layout changes (older files are recomputed)
+ENVELOPE_VERSION = 1
+ENVELOPE_SUFFIX = ".envelope.npz"
+
+Level = Tuple[np.ndarray, np.ndarray]
+
+
+@dataclass
+class WavLayout:
+    """Where the PCM samples of a WAV file are"""
+    offset: int
+    frames: int
+    rate: int
+    channels: int
+
+
+def wav_layout(wav_path: str) -> WavLayout:
+    """Locate the data chunk of a 16-bit PCM RIFF/WAVE file"""
+    with open(wav_path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"Not a WAV file: {wav_path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV data chunk not found: {wav_path}")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV fmt chunk missing: {wav_path}")
+                audio_format, channels, rate, _, _, bits = fmt
+                if audio_format not in (1, 0xFFFE) or bits != 16:
+                    raise ValueError(f"Unsupported WAV encoding (format {audio_format}, {bits} bits)")
+                offset = f.tell()
+                # Streamed WAVs can carry a 0/placeholder size: trust the file length
+                available = os.path.getsize(wav_path) - offset
+                size = available if size in (0, 0xFFFFFFFF) else min(size, available)
+                return WavLayout(offset, size // (2 * channels), rate, channels)
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def compute_envelopes(wav_path: str, frame_seconds: float = FRAME_SECONDS) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    """
+    Per-frame RMS level and min/max peaks of a 16-bit PCM WAV
+
+    The file is memory-mapped and viewed as (frames, samples per frame,
+    channels) without copying; only one block at a time is converted to float.
+
+    Returns:
+        (rms dBFS as int8, min peak as int8, max peak as int8, duration in seconds)
+    """
+    layout = wav_layout(wav_path)
+    frame = max(1, int(layout.rate * frame_seconds))
+    full = layout.frames // frame
+    count = full + (1 if layout.frames % frame else 0)
+
+    rms = np.zeros(count, dtype=np.float32)
+    low = np.zeros(count, dtype=np.int8)
+    high = np.zeros(count, dtype=np.int8)
+    if count:
+        pcm = np.memmap(wav_path, dtype="<i2", mode="r", offset=layout.offset, shape=(layout.frames, layout.channels))
+        windows = pcm[:full * frame].reshape(full, frame, layout.channels)
+
+        def reduce(block: np.ndarray, at: int) -> None:
+            mono = block.mean(axis=-1, dtype=np.float32)
+            rms[at:at + len(mono)] = np.sqrt(np.mean(np.square(mono), axis=1))
+            # int16 -> int8: keep the top 8 bits
+            low[at:at + len(mono)] = np.floor(mono.min(axis=1) / 256).astype(np.int8)
+            high[at:at + len(mono)] = np.floor(mono.max(axis=1) / 256).astype(np.int8)
+
+        for start in range(0, full, BLOCK_FRAMES):
+            reduce(windows[start:start + BLOCK_FRAMES], start)
+        if count > full:
+            reduce(pcm[full * frame:][np.newaxis], full)
+        del windows, pcm
+
+    with np.errstate(divide="ignore"):
+        levels = np.round(20 * np.log10(rms / 32768.0))
+    envelope = np.clip(levels, SILENCE_FLOOR_DB, 0).astype(np.int8)
+    return envelope, low, high, layout.frames / layout.rate if layout.rate else 0.0
+
+
+def build_pyramid(
+    low: np.ndarray,
+    high: np.ndarray,
+    factor: int = PYRAMID_FACTOR,
+    min_length: int = PYRAMID_MIN_LENGTH
+) -> List[Level]:
+    """Min/max levels, each merging `factor` frames of the previous one"""
+    levels = [(low, high)]
+    while len(levels[-1][0]) > min_length:
+        low, high = levels[-1]
+        pad = (-len(low)) % factor
+        if pad:
+            # Edge padding never changes a min or a max
+            low = np.pad(low, (0, pad), mode="edge")
+            high = np.pad(high, (0, pad), mode="edge")
+        levels.append((low.reshape(-1, factor).min(axis=1), high.reshape(-1, factor).max(axis=1)))
+    return levels
+
+
+def find_silences(
+    envelope: np.ndarray,
+    silence_threshold: float,
+    min_silence_duration: float,
+    frame_seconds: float = FRAME_SECONDS
+) -> List[Dict[str, float]]:
+    """
+    Runs of frames below the threshold lasting at least min_silence_duration
+
+    Vectorized run-length detection: the quiet mask is padded with False on
+    both sides, so its transitions alternate start/end of each quiet run.
+    An hour of envelope (360k frames) takes a few milliseconds.
+    """
+    quiet = np.concatenate(([False], envelope < silence_threshold, [False]))
+    edges = np.flatnonzero(quiet[1:] != quiet[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    # Epsilon: 150 frames * 0.01 is 1.4999...
+    long_enough = (ends - starts) * frame_seconds >= min_silence_duration - 1e-9
+    starts = np.round(starts[long_enough] * frame_seconds, 3)
+    ends = np.round(ends[long_enough] * frame_seconds, 3)
+    return [
+        {"start": start, "end": end, "duration": round(end - start, 3)}
+        for start, end in zip(starts.tolist(), ends.tolist())
+    ]
+
+
+@dataclass
+class AudioAnalysis:
+    """Decoded-once audio of a video and what is derived from it"""
+    wav_path: Path
+    duration: float
+    envelope: np.ndarray
+    levels: List[Level]
+    frame_seconds: float = FRAME_SECONDS
+
+    def silences(self, min_silence_duration: float = 1.0, silence_threshold: float = -30) -> Dict[str, Any]:
+        """Silence intervals in the /detect-silences response format"""
+        silences = find_silences(self.envelope, silence_threshold, min_silence_duration, self.frame_seconds)
+        total_silence = round(sum(s["duration"] for s in silences), 3)
+        silence_percentage = (total_silence / self.duration * 100) if self.duration > 0 else 0
+        return {
+            "silences": silences,
+            "totalSilenceDuration": total_silence,
+            "videoDuration": self.duration,
+            "silencePercentage": round(silence_percentage, 2)
+        }
+
+    def peaks(self, samples: int = 100, start: float = 0.0, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Min/max waveform of a time window at any resolution
+
+        Reads the coarsest pyramid level that still has a frame per output
+        sample, so the cost depends on `samples`, not on the video length.
+
+        Returns:
+            {"start", "end", "sampleDuration", "min", "max"} with peaks in -1..1
+        """
+        end = self.duration if end is None else min(end, self.duration)
+        start = max(0.0, min(start, end))
+        span = end - start
+
+        level = 0
+        while (
+            level + 1 < len(self.levels)
+            and span / (self.frame_seconds * PYRAMID_FACTOR ** (level + 1)) >= samples
+        ):
+            level += 1
+        low, high = self.levels[level]
+        resolution = self.frame_seconds * PYRAMID_FACTOR ** level
+
+        # Epsilon: 2.0 / 0.04 is 49.999...
+        first = min(int(start / resolution + 1e-9), len(low))
+        last = min(max(first + 1, math.ceil(end / resolution - 1e-9)), len(low))
+        low, high = low[first:last], high[first:last]
+
+        if not len(low) or span <= 0:
+            mins = maxs = np.zeros(samples, dtype=np.float32)
+        elif len(low) >= samples:
+            edges = np.linspace(0, len(low), samples + 1).astype(np.int64)[:-1]
+            mins = np.minimum.reduceat(low, edges) / 128.0
+            maxs = np.maximum.reduceat(high, edges) / 128.0
+        else:
+            # Zoomed in past the finest level: repeat frames
+            index = (np.arange(samples) * len(low) // samples)
+            mins, maxs = low[index] / 128.0, high[index] / 128.0
+
+        return {
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "sampleDuration": round(span / samples, 6),
+            "min": np.round(mins, 4).tolist(),
+            "max": np.round(maxs, 4).tolist(),
+        }
+
+    def waveform(self, samples: int = 100) -> List[float]:
+        """Whole-video peak amplitude per sample (0..1)"""
+        peaks = self.peaks(samples)
+        return [max(-low, high) for low, high in zip(peaks["min"], peaks["max"])]
+
+
+def analyze_wav(wav_path: Path, duration: Optional[float] = None, persist: bool = True) -> AudioAnalysis:
+    """
+    Analysis of a WAV, reusing its persisted envelopes when still valid
+
+    The .envelope.npz next to the WAV holds the int8 RMS envelope and the
+    finest min/max level (the pyramid is rebuilt from it in milliseconds).
+
+    Args:
+        wav_path: 16-bit PCM WAV
+        duration: Container duration, if known
+        persist: Read/write the .envelope.npz (off for throwaway WAVs)
+    """
+    if not persist:
+        data = compute_envelopes(str(wav_path))
+    else:
+        stat = wav_path.stat()
+        stamp = np.array([ENVELOPE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        cache_path = wav_path.with_name(wav_path.stem + ENVELOPE_SUFFIX)
+
+        data = None
+        try:
+            with np.load(cache_path) as stored:
+                if np.array_equal(stored["stamp"], stamp):
+                    data = (stored["envelope"], stored["low"], stored["high"], float(stored["duration"]))
+        except (OSError, KeyError, ValueError):
+            pass
+
+        if data is None:
+            data = compute_envelopes(str(wav_path))
+            envelope, low, high, audio_duration = data
+            tmp_path = cache_path.with_name(f"tmp_{cache_path.name}")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, stamp=stamp, envelope=envelope, low=low, high=high, duration=audio_duration)
+            os.replace(tmp_path, cache_path)
+
+    envelope, low, high, audio_duration = data
+    return AudioAnalysis(
+        wav_path=wav_path,
+        # Container duration when known (the audio track can be a few ms shorter)
+        duration=duration or round(audio_duration, 3),
+        envelope=envelope,
+        levels=build_pyramid(low, high),
+    )
+
+
+class AudioAnalyzer:
+    """Per-video analysis cache (in memory, LRU)"""
+
+    def __init__(self, root: str, max_entries: int = 64):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, AudioAnalysis]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+
+    @asynccontextmanager
+    async def open(self, video_id: str, video_url: str):
+        """
+        Analysis of a video's audio, held while the block runs
+
+        Uses the upload proxy's WAV when proxies are enabled (it stays leased,
+        so it cannot be evicted mid-transcription).
+
+        Usage:
+            async with audio_analyzer.open(video_id, url) as analysis:
+                analysis.silences(...)
+        """
+        if settings.proxy_enabled:
+            async with media_proxy.open(video_id, video_url) as proxy:
+                if proxy.audio is None:
+                    raise ValueError("Video has no audio stream")
+                yield await self._analysis(video_id, proxy.audio, duration=proxy.duration)
+        else:
+            yield await self._analysis(video_id, self.root / f"{video_id}.wav", video_url)
+
+    async def _analysis(
+        self,
+        video_id: str,
+        wav_path: Path,
+        video_url: Optional[str] = None,
+        duration: Optional[float] = None
+    ) -> AudioAnalysis:
+        analysis = self._entries.get(video_id)
+        if analysis is not None and analysis.wav_path == wav_path and wav_path.exists():
+            self._entries.move_to_end(video_id)
+            self.hits += 1
+            return analysis
+
+        self.misses += 1
+        task = self._inflight.get(video_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._analyze(video_id, wav_path, video_url, duration))
+            self._inflight[video_id] = task
+            task.add_done_callback(
+                lambda t, v=video_id: self._inflight.pop(v, None) if self._inflight.get(v) is t else None
+            )
+        return await asyncio.shield(task)
+
+    async def _analyze(
+        self,
+        video_id: str,
+        wav_path: Path,
+        video_url: Optional[str],
+        duration: Optional[float]
+    ) -> AudioAnalysis:
+        if not wav_path.exists():
+            await self._extract(video_id, video_url, wav_path)
+        analysis = await asyncio.to_thread(analyze_wav, wav_path, duration)
+        self._entries[video_id] = analysis
+        self._entries.move_to_end(video_id)
+        while len(self._entries) > self.max_entries:
+            _, dropped = self._entries.popitem(last=False)
+            if dropped.wav_path.parent == self.root:
+                # Our own extraction (proxy WAVs belong to the proxy store)
+                dropped.wav_path.unlink(missing_ok=True)
+                dropped.wav_path.with_name(dropped.wav_path.stem + ENVELOPE_SUFFIX).unlink(missing_ok=True)
+        return analysis
+
+    async def _extract(self, video_id: str, video_url: str, wav_path: Path) -> None:
+        """Decode the original's audio once to 16 kHz mono PCM"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = wav_path.with_name(f"tmp_{wav_path.name}")
+        async with media_cache.open(video_url, video_id) as source:
+            self.decodes += 1
+            await run_ffmpeg(
+                [
+                    "ffmpeg",
+                    "-i", str(source),
+                    "-vn",
+                    "-acodec", "pcm_s16le",
+                    "-ar", str(AUDIO_SAMPLE_RATE),
+                    "-ac", "1",
+                    "-y",
+                    str(tmp_path)
+                ],
+                outputs=[str(tmp_path)]
+            )
+        os.replace(tmp_path, wav_path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Analysis cache statistics (for monitoring)"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "decodes": self.decodes,
+        }
+
+
+# Singleton instance
+audio_analyzer = AudioAnalyzer(root=str(Path(settings.temp_video_path) / "audio"))
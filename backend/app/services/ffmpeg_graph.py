@@ -0,0 +1,296 @@
+"""
+FFmpeg filter graph compiler for the video pipeline
+Turns trim, silence removal and subtitle operations into a single filter graph
+(trim/atrim + concat + subtitles) so a job is decoded and encoded only once;
+output renditions (other aspect ratios/sizes) branch off the same decode
+"""
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple
+
+Segment = Tuple[float, float]
+OutputMap = Tuple[str, Optional[str]]
+
+# Segments shorter than this are dropped (a few frames are not worth a cut)
+MIN_SEGMENT_DURATION = 0.05
+
+# How a rendition fills a frame of another aspect ratio
+RENDITION_FITS = ("crop", "pad")
+
+
+@dataclass
+class FilterGraph:
+    """Compiled graph plus the stream specifiers to pass to -map"""
+    filter_complex: str
+    video_map: str
+    audio_map: Optional[str]
+    # One (video, audio) pair per rendition, in request order
+    outputs: List[OutputMap] = field(default_factory=list)
+
+
+def parse_aspect_ratio(value: str) -> Tuple[int, int]:
+    """ "9:16" -> (9, 16) """
+    width, sep, height = value.partition(":")
+    if not sep or not width.isdigit() or not height.isdigit() or not int(width) or not int(height):
+        raise ValueError(f"Invalid aspect ratio: {value}")
+    return int(width), int(height)
+
+
+def _even(value: float) -> int:
+    # x264 with yuv420p needs even dimensions
+    return max(2, int(round(value / 2)) * 2)
+
+
+def rendition_size(
+    aspect_ratio: str,
+    max_resolution: int,
+    source_size: Optional[Tuple[int, int]] = None
+) -> Tuple[int, int]:
+    """
+    Output frame size for a rendition
+
+    The longest side is max_resolution, capped at the source's longest side
+    (no upscaling).
+    """
+    ratio_w, ratio_h = parse_aspect_ratio(aspect_ratio)
+    longest = max_resolution
+    if source_size:
+        longest = min(longest, max(source_size))
+    if ratio_w >= ratio_h:
+        return _even(longest), _even(longest * ratio_h / ratio_w)
+    return _even(longest * ratio_w / ratio_h), _even(longest)
+
+
+def rendition_filter(rendition: Dict[str, Any], source_size: Optional[Tuple[int, int]] = None) -> str:
+    """
+    scale + crop/pad chain producing a rendition's frame
+
+    Args:
+        rendition: {"aspectRatio", "fit" ("crop" or "pad"), "maxResolution"}
+        source_size: Source (width, height), to avoid upscaling
+    """
+    width, height = rendition_size(
+        rendition.get("aspectRatio", "9:16"), rendition.get("maxResolution", 1920), source_size
+    )
+    fit = rendition.get("fit", "crop")
+    if fit == "crop":
+        # Fill the frame, cut the excess (centered)
+        return f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1"
+    if fit == "pad":
+        # Fit inside the frame, letterbox the rest
+        return (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1"
+        )
+    raise ValueError(f"Invalid rendition fit: {fit}")
+
+
+def compute_keep_segments(
+    duration: float,
+    trim: Optional[Dict[str, Any]] = None,
+    silences: Optional[List[Dict[str, Any]]] = None,
+    min_duration: float = MIN_SEGMENT_DURATION
+) -> List[Segment]:
+    """
+    Compute the source ranges that survive trim and silence removal
+
+    Args:
+        duration: Source duration in seconds
+        trim: Optional {"start", "end"} range to keep
+        silences: Optional list of {"start", "end"} ranges to remove
+
+    Returns:
+        Sorted, non-overlapping (start, end) ranges in source time
+    """
+    start, end = 0.0, duration
+    if trim:
+        start = max(0.0, float(trim.get("start") or 0.0))
+        end = min(duration, float(trim.get("end") or duration))
+
+    keep_segments: List[Segment] = []
+    cursor = start
+    for silence in sorted(silences or [], key=lambda s: s["start"]):
+        silence_start = max(float(silence["start"]), start)
+        silence_end = min(float(silence["end"]), end)
+        if silence_end <= cursor:
+            continue
+        if silence_start > cursor:
+            keep_segments.append((cursor, silence_start))
+        cursor = max(cursor, silence_end)
+
+    if cursor < end:
+        keep_segments.append((cursor, end))
+
+    return [(s, e) for s, e in keep_segments if e - s >= min_duration]
+
+
+def covers_whole_source(keep_segments: List[Segment], duration: float, tolerance: float = 0.01) -> bool:
+    """True when the keep list is a single range spanning the whole source"""
+    return (
+        len(keep_segments) == 1
+        and keep_segments[0][0] <= tolerance
+        and keep_segments[0][1] >= duration - tolerance
+    )
+
+
+def remap_time(t: float, keep_segments: List[Segment]) -> Optional[float]:
+    """
+    Map a source timestamp onto the cut timeline
+
+    Returns:
+        Output timestamp, or None if t falls inside a removed range
+    """
+    offset = 0.0
+    for start, end in keep_segments:
+        if start <= t <= end:
+            return offset + (t - start)
+        offset += end - start
+    return None
+
+
+def remap_subtitle_segments(
+    segments: List[Dict[str, Any]],
+    keep_segments: List[Segment]
+) -> List[Dict[str, Any]]:
+    """
+    Shift subtitle segments onto the cut timeline
+
+    Segments entirely inside removed ranges are dropped; segments crossing a
+    cut are clipped to the parts that were kept.
+
+    Args:
+        segments: Subtitle segments with start, end, text (source time)
+        keep_segments: Output of compute_keep_segments
+
+    Returns:
+        New segment dicts with start/end in output time
+    """
+    remapped = []
+    for segment in segments:
+        seg_start, seg_end = float(segment["start"]), float(segment["end"])
+        new_start = new_end = None
+        offset = 0.0
+        for start, end in keep_segments:
+            overlap_start, overlap_end = max(seg_start, start), min(seg_end, end)
+            if overlap_start < overlap_end or (seg_start == seg_end and start <= seg_start <= end):
+                if new_start is None:
+                    new_start = offset + (overlap_start - start)
+                new_end = offset + (overlap_end - start)
+            offset += end - start
+        if new_start is None:
+            continue
+        remapped.append({**segment, "start": round(new_start, 3), "end": round(new_end, 3)})
+    return remapped
+
+
+def build_filter_graph(
+    keep_segments: List[Segment],
+    duration: float,
+    subtitle_filter: Optional[str] = None,
+    has_audio: bool = True,
+    renditions: Optional[List[Dict[str, Any]]] = None,
+    source_size: Optional[Tuple[int, int]] = None
+) -> FilterGraph:
+    """
+    Compile cut + subtitle (+ rendition) operations into one -filter_complex graph
+
+    Each kept range gets a trim/atrim branch (fed by split/asplit), the branches
+    are joined with concat and the subtitles filter runs on the joined video, so
+    subtitle timestamps must already be in output time (remap_subtitle_segments).
+    With renditions, the joined video is split once more and each branch is
+    scaled/cropped/padded (and subtitled) for its own output, so all outputs
+    come from a single decode.
+
+    Args:
+        keep_segments: Source ranges to keep (compute_keep_segments)
+        duration: Source duration, used to skip trimming when nothing is cut
+        subtitle_filter: Optional filter string, e.g. "ass=..."
+        has_audio: Whether the source has an audio stream
+        renditions: Optional output renditions (see rendition_filter)
+        source_size: Source (width, height), to avoid upscaling renditions
+
+    Returns:
+        FilterGraph with the graph and -map specifiers
+    """
+    if not keep_segments:
+        raise ValueError("No segments left to render")
+
+    filters: List[str] = []
+
+    if covers_whole_source(keep_segments, duration):
+        # Nothing cut: read the source streams directly (audio passes through)
+        if not subtitle_filter and not renditions:
+            raise ValueError("Empty filter graph: no cuts and no subtitles")
+        video_label, audio_label = "[0:v]", ("0:a?" if has_audio else None)
+    else:
+        video_label, audio_label = _cut_filters(filters, keep_segments, has_audio)
+
+    if renditions:
+        outputs = _rendition_filters(filters, video_label, audio_label, renditions, subtitle_filter, source_size)
+        return FilterGraph(";".join(filters), outputs[0][0], outputs[0][1], outputs)
+
+    if subtitle_filter:
+        filters.append(f"{video_label}{subtitle_filter}[vout]")
+        video_label = "[vout]"
+
+    return FilterGraph(";".join(filters), video_label, audio_label, [(video_label, audio_label)])
+
+
+def _cut_filters(filters: List[str], keep_segments: List[Segment], has_audio: bool) -> OutputMap:
+    count = len(keep_segments)
+    video_inputs = [f"[vs{i}]" for i in range(count)] if count > 1 else ["[0:v]"]
+    audio_inputs = [f"[as{i}]" for i in range(count)] if count > 1 else ["[0:a]"]
+    if count > 1:
+        filters.append(f"[0:v]split={count}{''.join(video_inputs)}")
+        if has_audio:
+            filters.append(f"[0:a]asplit={count}{''.join(audio_inputs)}")
+
+    concat_inputs = []
+    for i, (start, end) in enumerate(keep_segments):
+        filters.append(
+            f"{video_inputs[i]}trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS[v{i}]"
+        )
+        concat_inputs.append(f"[v{i}]")
+        if has_audio:
+            filters.append(
+                f"{audio_inputs[i]}atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS[a{i}]"
+            )
+            concat_inputs.append(f"[a{i}]")
+
+    if count == 1:
+        return "[v0]", ("[a0]" if has_audio else None)
+
+    audio_label = "[acut]" if has_audio else None
+    filters.append(
+        f"{''.join(concat_inputs)}concat=n={count}:v=1:a={1 if has_audio else 0}[vcut]{audio_label or ''}"
+    )
+    return "[vcut]", audio_label
+
+
+def _rendition_filters(
+    filters: List[str],
+    video_label: str,
+    audio_label: Optional[str],
+    renditions: List[Dict[str, Any]],
+    subtitle_filter: Optional[str],
+    source_size: Optional[Tuple[int, int]]
+) -> List[OutputMap]:
+    count = len(renditions)
+    video_inputs = [f"[rv{i}]" for i in range(count)] if count > 1 else [video_label]
+    if count > 1:
+        filters.append(f"{video_label}split={count}{''.join(video_inputs)}")
+
+    # Filter labels can feed only one consumer; stream specifiers (0:a?) can be mapped again
+    audio_maps: List[Optional[str]] = [audio_label] * count
+    if audio_label and audio_label.startswith("[") and count > 1:
+        audio_maps = [f"[ra{i}]" for i in range(count)]
+        filters.append(f"{audio_label}asplit={count}{''.join(audio_maps)}")
+
+    outputs = []
+    for i, rendition in enumerate(renditions):
+        chain = rendition_filter(rendition, source_size)
+        if subtitle_filter:
+            # Subtitles after scaling, so they are laid out for each frame
+            chain += f",{subtitle_filter}"
+        filters.append(f"{video_inputs[i]}{chain}[rout{i}]")
+        outputs.append((f"[rout{i}]", audio_maps[i]))
+    return outputs
@@ -0,0 +1,267 @@
+"""
+Async FFmpeg/ffprobe runner
+Runs the process with asyncio.create_subprocess_exec (no thread pinned per
+encode), reports live progress parsed from -progress pipe:1, keeps only a
+bounded tail of stderr, and on timeout/cancellation kills the whole process
+group and removes partial outputs
+"""
+import asyncio
+import os
+import signal
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, List, Optional, Sequence
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("ffmpeg_runner")
+
+# stderr lines kept for error messages
+STDERR_TAIL_LINES = 200
+
+# Grace period between SIGTERM and SIGKILL
+KILL_GRACE_SECONDS = 2.0
+
+# asyncio StreamReader line limit (ffprobe JSON and filter logs can be long)
+STREAM_LIMIT = 1024 * 1024
+
+
+class FFmpegError(Exception):
+    """FFmpeg/ffprobe exited with an error"""
+
+    def __init__(self, message: str, returncode: Optional[int] = None, stderr: str = ""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class FFmpegTimeout(FFmpegError):
+    """FFmpeg/ffprobe exceeded its timeout and was killed"""
+
+
+@dataclass
+class FFmpegProgress:
+    """One -progress report"""
+    out_time: float
+    fps: float
+    speed: float
+    percent: Optional[int]
+    done: bool = False
+
+
+@dataclass
+class ProcessResult:
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+ProgressCallback = Callable[[FFmpegProgress], None]
+LineCallback = Callable[[str], None]
+
+
+class ProgressParser:
+    """Accumulates key=value lines from -progress until each "progress=" marker"""
+
+    def __init__(self, duration: Optional[float], callback: Optional[ProgressCallback]):
+        self.duration = duration
+        self.callback = callback
+        self._values = {}
+        self.last: Optional[FFmpegProgress] = None
+
+    @staticmethod
+    def _float(value: Optional[str]) -> float:
+        try:
+            return float((value or "0").rstrip("x"))
+        except ValueError:
+            return 0.0
+
+    def feed(self, line: str) -> None:
+        key, sep, value = line.partition("=")
+        if not sep:
+            return
+        key, value = key.strip(), value.strip()
+        if key != "progress":
+            self._values[key] = value
+            return
+
+        # out_time_us (out_time_ms is also microseconds, kept for older builds)
+        out_time = self._float(self._values.get("out_time_us") or self._values.get("out_time_ms")) / 1_000_000
+        percent = None
+        if self.duration:
+            percent = max(0, min(100, int(out_time / self.duration * 100)))
+        done = value == "end"
+        if done and self.duration:
+            percent = 100
+        self.last = FFmpegProgress(
+            out_time=round(max(out_time, 0.0), 3),
+            fps=self._float(self._values.get("fps")),
+            speed=self._float(self._values.get("speed")),
+            percent=percent,
+            done=done,
+        )
+        self._values = {}
+        if self.callback:
+            try:
+                self.callback(self.last)
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {e}")
+
+
+async def _kill_process_group(proc: asyncio.subprocess.Process) -> None:
+    """SIGTERM the process group, then SIGKILL if it does not exit"""
+    if proc.returncode is not None:
+        return
+    for sig, wait in ((signal.SIGTERM, KILL_GRACE_SECONDS), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        except PermissionError:
+            proc.kill()
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=wait)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+def _remove_outputs(outputs: Sequence[str]) -> None:
+    for output in outputs:
+        Path(output).unlink(missing_ok=True)
+
+
+async def _pump(stream: asyncio.StreamReader, handler: LineCallback) -> None:
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        handler(line.decode(errors="replace").rstrip("\r\n"))
+
+
+async def run_process(
+    cmd: List[str],
+    *,
+    on_stdout_line: Optional[LineCallback] = None,
+    on_stderr_line: Optional[LineCallback] = None,
+    capture_stdout: bool = False,
+    timeout: Optional[float] = None,
+    outputs: Sequence[str] = (),
+    check: bool = True
+) -> ProcessResult:
+    """
+    Run a process in its own process group
+
+    Args:
+        cmd: Command and arguments
+        on_stdout_line / on_stderr_line: Called for each output line
+        capture_stdout: Keep the full stdout (ffprobe); otherwise it is discarded
+        timeout: Seconds before the process tree is killed
+        outputs: Files removed if the process fails, times out or is cancelled
+        check: Raise FFmpegError on a non-zero exit code
+
+    Returns:
+        ProcessResult with the exit code, stdout (if captured) and stderr tail
+    """
+    stdout_lines: List[str] = []
+    stderr_tail: Deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+
+    def handle_stdout(line: str) -> None:
+        if capture_stdout:
+            stdout_lines.append(line)
+        if on_stdout_line:
+            on_stdout_line(line)
+
+    def handle_stderr(line: str) -> None:
+        stderr_tail.append(line)
+        if on_stderr_line:
+            on_stderr_line(line)
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+        limit=STREAM_LIMIT
+    )
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                _pump(proc.stdout, handle_stdout),
+                _pump(proc.stderr, handle_stderr),
+                proc.wait()
+            ),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        await _kill_process_group(proc)
+        _remove_outputs(outputs)
+        raise FFmpegTimeout(f"{cmd[0]} timed out after {timeout}s", proc.returncode, "\n".join(stderr_tail))
+    except BaseException:
+        # Cancellation (job cancelled, shutdown) or a failing callback
+        await _kill_process_group(proc)
+        _remove_outputs(outputs)
+        raise
+
+    stderr = "\n".join(stderr_tail)
+    if proc.returncode != 0 and check:
+        _remove_outputs(outputs)
+        raise FFmpegError(f"{cmd[0]} exited with code {proc.returncode}", proc.returncode, stderr)
+
+    return ProcessResult(proc.returncode, "\n".join(stdout_lines), stderr)
+
+
+async def run_ffmpeg(
+    args: List[str],
+    *,
+    duration: Optional[float] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    on_stderr_line: Optional[LineCallback] = None,
+    timeout: Optional[float] = None,
+    outputs: Sequence[str] = (),
+    check: bool = True
+) -> ProcessResult:
+    """
+    Run an ffmpeg command with live progress
+
+    Args:
+        args: Command starting with "ffmpeg"
+        duration: Expected output duration, used to compute the percentage
+        on_progress: Called on every -progress report
+        on_stderr_line: Called for each stderr line (e.g. filter log parsing)
+        timeout: Seconds (defaults to FFMPEG_TIMEOUT)
+        outputs: Output files to remove on failure
+
+    Returns:
+        ProcessResult
+    """
+    parser = ProgressParser(duration, on_progress)
+    cmd = [args[0], "-hide_banner", "-nostats", "-progress", "pipe:1", *args[1:]]
+    return await run_process(
+        cmd,
+        on_stdout_line=parser.feed,
+        on_stderr_line=on_stderr_line,
+        timeout=timeout or settings.ffmpeg_timeout,
+        outputs=outputs,
+        check=check
+    )
+
+
+async def run_ffprobe(args: List[str], timeout: Optional[float] = None) -> str:
+    """
+    Run ffprobe and return its stdout
+
+    Args:
+        args: ffprobe arguments (without the "ffprobe" program name)
+        timeout: Seconds (defaults to FFPROBE_TIMEOUT)
+    """
+    result = await run_process(
+        ["ffprobe", *args],
+        capture_stdout=True,
+        timeout=timeout or settings.ffprobe_timeout
+    )
+    return result.stdout
@@ -0,0 +1,261 @@
+"""
+Bounded FFmpeg job scheduler
+Runs at most `slots` encodes at a time (derived from CPU cores and the
+per-job -threads budget), orders waiting jobs by plan priority, round-robins
+between organizations of the same plan and records queue-wait/run-time metrics
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("ffmpeg_scheduler")
+
+# Lower value runs first
+PLAN_PRIORITY = {"pro": 0, "starter": 1, "free": 2}
+
+# Upload-time work (editing proxies): runs after every queued user job
+BACKGROUND_PLAN = "background"
+PLAN_PRIORITY[BACKGROUND_PLAN] = 3
+
+JobFactory = Callable[[], Awaitable[Any]]
+
+# Samples kept for the wait/run-time percentiles
+METRIC_WINDOW = 500
+
+
+class SchedulerQueueFull(Exception):
+    """Admission refused: the wait queue is at capacity"""
+
+
+def available_cores() -> int:
+    """Cores this process may run on (CPU affinity / cpuset, not the host total)"""
+    if settings.ffmpeg_cpu_cores > 0:
+        return settings.ffmpeg_cpu_cores
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except (AttributeError, OSError):
+        # No sched_getaffinity (macOS/Windows)
+        return os.cpu_count() or 1
+
+
+def default_slots(threads_per_job: int, reserved_cores: int = 1) -> int:
+    """Concurrent encodes that fit the available cores (one core left for the API)"""
+    return max(1, (available_cores() - reserved_cores) // max(1, threads_per_job))
+
+
+class _Job:
+    __slots__ = ("job_id", "org_id", "priority", "factory", "enqueued_at", "started_at")
+
+    def __init__(self, job_id: str, org_id: str, priority: int, factory: JobFactory):
+        self.job_id = job_id
+        self.org_id = org_id
+        self.priority = priority
+        self.factory = factory
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+
+class FFmpegScheduler:
+    """Priority + fair-share admission for CPU-heavy FFmpeg jobs"""
+
+    def __init__(self, slots: int, max_queue: int = 100):
+        self.slots = slots
+        self.max_queue = max_queue
+
+        # priority -> org_id -> FIFO of that org's jobs (org order = round-robin turn)
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Job]]"] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_times: Deque[float] = deque(maxlen=METRIC_WINDOW)
+        self._run_times: Deque[float] = deque(maxlen=METRIC_WINDOW)
+
+    # ---- admission ----
+
+    @property
+    def queued(self) -> int:
+        return sum(len(jobs) for orgs in self._queues.values() for jobs in orgs.values())
+
+    def submit(self, job_id: str, org_id: str, plan: str, factory: JobFactory) -> Dict[str, Any]:
+        """
+        Admit a job: start it if a slot is free, otherwise queue it
+
+        Args:
+            job_id: Job identifier
+            org_id: Organization (fair-share unit)
+            plan: Organization plan (priority)
+            factory: Zero-argument callable returning the job coroutine
+
+        Returns:
+            {"status": "processing"} or {"status": "queued", "position": n}
+
+        Raises:
+            SchedulerQueueFull: if the job cannot even be queued
+        """
+        if len(self._running) >= self.slots and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerQueueFull(f"FFmpeg queue full ({self.max_queue} jobs waiting)")
+
+        job = _Job(job_id, org_id, PLAN_PRIORITY.get(plan, PLAN_PRIORITY["free"]), factory)
+        orgs = self._queues.setdefault(job.priority, OrderedDict())
+        orgs.setdefault(org_id, deque()).append(job)
+        self._dispatch()
+
+        if job_id in self._running:
+            return {"status": "processing"}
+        return {"status": "queued", "position": self.position(job_id)}
+
+    async def run(self, job_id: str, org_id: str, plan: str, factory: JobFactory) -> Any:
+        """
+        Submit a job and wait for it to finish
+
+        Returns:
+            The job's result (its exception is raised here)
+
+        Raises:
+            SchedulerQueueFull: if the job cannot even be queued
+        """
+        outcome = asyncio.get_running_loop().create_future()
+
+        async def job():
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                outcome.cancel()
+                raise
+            except Exception as e:
+                outcome.set_exception(e)
+                raise
+            outcome.set_result(result)
+
+        self.submit(job_id, org_id, plan, job)
+        try:
+            return await outcome
+        except asyncio.CancelledError:
+            self.cancel(job_id)
+            raise
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job in dispatch order (None if not queued)"""
+        for index, job in enumerate(self._dispatch_order(), 1):
+            if job.job_id == job_id:
+                return index
+        return None
+
+    def _dispatch_order(self):
+        """Queued jobs in the order _next_job would take them (without popping)"""
+        for priority in sorted(self._queues):
+            queues = [list(jobs) for jobs in self._queues[priority].values()]
+            depth = max((len(q) for q in queues), default=0)
+            for level in range(depth):
+                for q in queues:
+                    if level < len(q):
+                        yield q[level]
+
+    def _next_job(self) -> Optional[_Job]:
+        for priority in sorted(self._queues):
+            orgs = self._queues[priority]
+            if not orgs:
+                continue
+            org_id, jobs = next(iter(orgs.items()))
+            job = jobs.popleft()
+            # Org goes to the back of the line (or leaves if it has nothing else)
+            del orgs[org_id]
+            if jobs:
+                orgs[org_id] = jobs
+            if not orgs:
+                del self._queues[priority]
+            return job
+        return None
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self.slots:
+            job = self._next_job()
+            if job is None:
+                return
+            job.started_at = time.monotonic()
+            self._wait_times.append(job.started_at - job.enqueued_at)
+            task = asyncio.create_task(self._run(job))
+            self._running[job.job_id] = task
+
+    async def _run(self, job: _Job) -> None:
+        try:
+            await job.factory()
+            self.completed += 1
+        except asyncio.CancelledError:
+            self.failed += 1
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"FFmpeg job {job.job_id} failed: {e}", exc_info=True)
+        finally:
+            self._run_times.append(time.monotonic() - job.started_at)
+            self._running.pop(job.job_id, None)
+            self._dispatch()
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a queued job or cancel a running one"""
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            return True
+        for priority, orgs in list(self._queues.items()):
+            for org_id, jobs in list(orgs.items()):
+                for job in jobs:
+                    if job.job_id == job_id:
+                        jobs.remove(job)
+                        if not jobs:
+                            del orgs[org_id]
+                        if not orgs:
+                            del self._queues[priority]
+                        return True
+        return False
+
+    async def shutdown(self) -> None:
+        """Drop queued jobs and cancel running ones (application shutdown)"""
+        self._queues.clear()
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---- metrics ----
+
+    @staticmethod
+    def _summary(samples: Deque[float]) -> Dict[str, float]:
+        if not samples:
+            return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Scheduler statistics (for monitoring)"""
+        return {
+            "slots": self.slots,
+            "threads_per_job": settings.ffmpeg_threads_per_job,
+            "running": len(self._running),
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_seconds": self._summary(self._wait_times),
+            "run_seconds": self._summary(self._run_times),
+        }
+
+
+# Singleton instance
+ffmpeg_scheduler = FFmpegScheduler(
+    slots=settings.ffmpeg_max_concurrent_jobs or default_slots(settings.ffmpeg_threads_per_job),
+    max_queue=settings.ffmpeg_max_queue,
+)
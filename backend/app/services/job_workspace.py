@@ -0,0 +1,240 @@
+"""
+Per-job scratch workspaces
+Every render/analysis job gets its own directory under temp_video_path/jobs
+(no shared fixed file names between concurrent jobs), an optional RAM-backed
+tier (tmpfs) for small intermediates such as subtitle scripts and concat
+lists, a free-disk reservation checked before the job starts and cleanup on
+success, failure and cancellation. A periodic sweeper removes workspaces left
+behind by crashed workers
+"""
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("job_workspace")
+
+OWNER_FILE = ".owner"
+
+
+class InsufficientDiskSpace(Exception):
+    """Admission refused: the job's disk reservation does not fit"""
+
+
+@dataclass
+class Workspace:
+    """A job's private directories (scratch is path itself without tmpfs)"""
+    job_id: str
+    path: Path
+    scratch: Path
+    reserved: int = 0
+
+    def file(self, name: str) -> Path:
+        """Path for a large intermediate or output (disk)"""
+        return self.path / name
+
+    def scratch_file(self, name: str) -> Path:
+        """Path for a small intermediate (RAM-backed when configured)"""
+        return self.scratch / name
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkspaceManager:
+    """Creates, accounts and cleans job workspaces"""
+
+    def __init__(
+        self,
+        root: str,
+        scratch_root: Optional[str] = None,
+        scratch_min_free_bytes: int = 256 * 1024 ** 2,
+        min_free_bytes: int = 2 * 1024 ** 3,
+        orphan_max_age: float = 24 * 3600
+    ):
+        self.root = Path(root)
+        self.scratch_root = Path(scratch_root) if scratch_root else None
+        self.scratch_min_free_bytes = scratch_min_free_bytes
+        self.min_free_bytes = min_free_bytes
+        self.orphan_max_age = orphan_max_age
+
+        # Open workspaces of this process (directory name -> reservation)
+        self._active: Dict[str, int] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.opened = 0
+        self.rejected = 0
+        self.scratch_in_ram = 0
+        self.swept = 0
+
+    @property
+    def reserved(self) -> int:
+        return sum(self._active.values())
+
+    # ---- admission ----
+
+    def _free_bytes(self, path: Path) -> int:
+        return shutil.disk_usage(path).free
+
+    def _check_reservation(self, reserve_bytes: int) -> None:
+        """Refuse a job whose reservation would eat into the free-space floor"""
+        free = self._free_bytes(self.root) - self.reserved
+        if free - reserve_bytes < self.min_free_bytes:
+            self.rejected += 1
+            raise InsufficientDiskSpace(
+                f"Job needs {reserve_bytes / 1024 ** 2:.0f} MB of scratch space, "
+                f"{max(0, free - self.min_free_bytes) / 1024 ** 2:.0f} MB available"
+            )
+
+    def _scratch_dir(self, name: str, path: Path) -> Path:
+        """RAM-backed directory when the tmpfs tier is configured and has room"""
+        if self.scratch_root is None:
+            return path
+        try:
+            self.scratch_root.mkdir(parents=True, exist_ok=True)
+            if self._free_bytes(self.scratch_root) < self.scratch_min_free_bytes:
+                return path
+            scratch = self.scratch_root / name
+            scratch.mkdir()
+            self._write_owner(scratch)
+        except OSError as e:
+            logger.warning(f"tmpfs scratch unavailable, using disk: {e}")
+            return path
+        self.scratch_in_ram += 1
+        return scratch
+
+    @staticmethod
+    def _write_owner(directory: Path) -> None:
+        (directory / OWNER_FILE).write_text(json.dumps({"pid": os.getpid(), "created": time.time()}))
+
+    @asynccontextmanager
+    async def open(self, job_id: str, reserve_bytes: int = 0):
+        """
+        Create a job's workspace and remove it when the block exits
+
+        Cleanup runs on success, exceptions and task cancellation.
+
+        Usage:
+            async with workspace_manager.open(job_id, reserve_bytes) as workspace:
+                output = workspace.file("final.mp4")
+
+        Raises:
+            InsufficientDiskSpace: The reservation does not fit the free disk space
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._check_reservation(reserve_bytes)
+
+        safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", job_id)[:64] or "job"
+        name = f"{safe_id}-{uuid.uuid4().hex[:8]}"
+        path = self.root / name
+        self._active[name] = reserve_bytes
+        try:
+            path.mkdir()
+            self._write_owner(path)
+            workspace = Workspace(job_id, path, self._scratch_dir(name, path), reserve_bytes)
+            self.opened += 1
+            yield workspace
+        finally:
+            self._remove(name)
+            del self._active[name]
+
+    def _remove(self, name: str) -> None:
+        shutil.rmtree(self.root / name, ignore_errors=True)
+        if self.scratch_root is not None:
+            shutil.rmtree(self.scratch_root / name, ignore_errors=True)
+
+    # ---- sweeper ----
+
+    def _is_orphan(self, directory: Path, now: float) -> bool:
+        if directory.name in self._active:
+            return False
+        try:
+            owner = json.loads((directory / OWNER_FILE).read_text())
+            pid, created = int(owner["pid"]), float(owner["created"])
+        except (OSError, ValueError, KeyError, TypeError):
+            # No owner file: half-created or foreign; judge by age
+            try:
+                created = directory.stat().st_mtime
+            except OSError:
+                return False
+            return now - created > self.orphan_max_age
+        if pid == os.getpid() or not _pid_alive(pid):
+            # Ours but not open (lost cleanup), or its worker is gone
+            return True
+        return now - created > self.orphan_max_age
+
+    def sweep(self) -> int:
+        """Remove orphaned workspaces (disk and tmpfs); returns how many"""
+        now = time.time()
+        removed = 0
+        for base in filter(None, (self.root, self.scratch_root)):
+            if not base.is_dir():
+                continue
+            for directory in base.iterdir():
+                if directory.is_dir() and self._is_orphan(directory, now):
+                    shutil.rmtree(directory, ignore_errors=True)
+                    removed += 1
+        if removed:
+            self.swept += removed
+            logger.info(f"Workspace sweeper removed {removed} orphaned workspace(s)")
+        return removed
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Workspace sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start_sweeper(self, interval: float) -> None:
+        """Sweep now and then every `interval` seconds"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Workspace statistics (for monitoring)"""
+        return {
+            "active": len(self._active),
+            "reserved_bytes": self.reserved,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "scratch_in_ram": self.scratch_in_ram,
+            "swept": self.swept,
+        }
+
+
+# Singleton instance
+workspace_manager = WorkspaceManager(
+    root=str(Path(settings.temp_video_path) / "jobs"),
+    scratch_root=settings.workspace_scratch_path or None,
+    scratch_min_free_bytes=settings.workspace_scratch_min_free_mb * 1024 ** 2,
+    min_free_bytes=int(settings.workspace_min_free_gb * 1024 ** 3),
+    orphan_max_age=settings.workspace_orphan_max_age_hours * 3600,
+)
@@ -0,0 +1,258 @@
+"""
+Local media cache for source videos
+Async, chunked and resumable downloads (HTTP range requests) into a
+content-addressed directory under temp_video_path, keyed by video_id + ETag,
+with a disk quota (LRU eviction) and one shared fetch per file
+"""
+import asyncio
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+import httpx
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("media_cache")
+
+PART_SUFFIX = ".part"
+
+
+class MediaDownloadError(Exception):
+    """Source media could not be downloaded"""
+
+
+class MediaCache:
+    """Content-addressed cache of downloaded source media"""
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        chunk_size: int = 1024 * 1024,
+        retries: int = 3,
+        timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self._transport = transport
+
+        # Downloads in flight (one per cache entry) and files in use by jobs
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._leases: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.resumed = 0
+        self.evictions = 0
+        self.bytes_downloaded = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+            follow_redirects=True,
+            transport=self._transport
+        )
+
+    @staticmethod
+    def entry_name(source: str, etag: Optional[str], suffix: str = ".mp4") -> str:
+        """Cache file name for a (video_id or URL, ETag) pair"""
+        digest = hashlib.sha256(f"{source}\0{etag or ''}".encode()).hexdigest()
+        return f"{digest[:32]}{suffix}"
+
+    async def _head(self, client: httpx.AsyncClient, url: str) -> Tuple[Optional[str], Optional[int]]:
+        """ETag and size of the remote object (best effort)"""
+        try:
+            response = await client.head(url)
+            if response.status_code >= 400:
+                return None, None
+            length = response.headers.get("content-length")
+            return response.headers.get("etag"), int(length) if length else None
+        except httpx.HTTPError as e:
+            logger.warning(f"HEAD failed for media download, caching without ETag: {e}")
+            return None, None
+
+    # ---- public API ----
+
+    async def fetch(self, url: str, video_id: Optional[str] = None) -> Path:
+        """
+        Return a local path for the media at url, downloading it if needed
+
+        Args:
+            url: Source URL (a local file path is returned as-is)
+            video_id: Video id used as cache key (defaults to the URL)
+
+        Returns:
+            Path inside the media cache
+        """
+        if os.path.exists(url):
+            return Path(url)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        async with self._client() as client:
+            etag, size = await self._head(client, url)
+        suffix = Path(url.split("?", 1)[0]).suffix or ".mp4"
+        name = self.entry_name(video_id or url, etag, suffix)
+        path = self.root / name
+
+        if path.exists():
+            self.hits += 1
+            self._touch(path)
+            return path
+
+        self.misses += 1
+        task = self._inflight.get(name)
+        if task is None or task.done():
+            task = asyncio.create_task(self._download(url, path, etag, size))
+            self._inflight[name] = task
+            task.add_done_callback(lambda t, n=name: self._inflight.pop(n, None) if self._inflight.get(n) is t else None)
+        # shield: a cancelled caller must not abort the fetch shared with others
+        return await asyncio.shield(task)
+
+    @asynccontextmanager
+    async def open(self, url: str, video_id: Optional[str] = None):
+        """
+        Fetch media and hold it while the block runs (it cannot be evicted)
+
+        Usage:
+            async with media_cache.open(url, video_id) as path:
+                ...
+        """
+        path = await self.fetch(url, video_id)
+        key = str(path)
+        self._leases[key] = self._leases.get(key, 0) + 1
+        try:
+            if not path.exists():
+                # Evicted between the end of the download and the lease: fetch
+                # again, now held so the new copy cannot be evicted
+                path = await self.fetch(url, video_id)
+            yield path
+        finally:
+            self._leases[key] -= 1
+            if self._leases[key] <= 0:
+                del self._leases[key]
+
+    # ---- download ----
+
+    async def _download(self, url: str, path: Path, etag: Optional[str], size: Optional[int]) -> Path:
+        part = path.with_name(path.name + PART_SUFFIX)
+        if size:
+            await asyncio.to_thread(self._evict, size)
+
+        last_error: Optional[Exception] = None
+        async with self._client() as client:
+            for attempt in range(1, self.retries + 1):
+                try:
+                    await self._download_once(client, url, part, etag, size)
+                    os.replace(part, path)
+                    logger.info(f"Media cached: {path.name} ({path.stat().st_size} bytes)")
+                    await asyncio.to_thread(self._evict, 0)
+                    return path
+                except (httpx.HTTPError, MediaDownloadError) as e:
+                    last_error = e
+                    logger.warning(f"Media download attempt {attempt}/{self.retries} failed: {e}")
+                    if attempt < self.retries:
+                        await asyncio.sleep(min(2 ** (attempt - 1), 10))
+
+        raise MediaDownloadError(f"Download failed after {self.retries} attempts: {last_error}")
+
+    async def _download_once(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        part: Path,
+        etag: Optional[str],
+        size: Optional[int]
+    ) -> None:
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {}
+        if offset and etag:
+            # Resume only if the object did not change (If-Range)
+            headers = {"Range": f"bytes={offset}-", "If-Range": etag}
+
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 206:
+                self.resumed += 1
+                mode = "ab"
+            elif response.status_code == 200:
+                offset, mode = 0, "wb"
+            else:
+                raise MediaDownloadError(f"HTTP {response.status_code} for {url}")
+
+            with open(part, mode) as f:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await asyncio.to_thread(f.write, chunk)
+                    offset += len(chunk)
+                    self.bytes_downloaded += len(chunk)
+
+        if size is not None and offset != size:
+            raise MediaDownloadError(f"Incomplete download: {offset} of {size} bytes")
+
+    # ---- quota ----
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # mtime doubles as the LRU clock (survives restarts, unlike atime with noatime)
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def _evict(self, incoming: int) -> None:
+        """
+        Delete least recently used entries until incoming bytes fit the quota
+
+        Partial downloads (.part) count toward the quota and are evicted like
+        entries (mtime = last write) unless their download is in flight.
+        """
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            total += stat.st_size
+            if entry.name.endswith(PART_SUFFIX) and entry.name[:-len(PART_SUFFIX)] in self._inflight:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        for _, entry_size, entry in sorted(entries):
+            if total + incoming <= self.max_bytes:
+                break
+            if str(entry) in self._leases:
+                continue
+            entry.unlink(missing_ok=True)
+            total -= entry_size
+            self.evictions += 1
+            logger.info(f"Media cache evicted {entry.name} ({entry_size} bytes)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics (for monitoring)"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight": len(self._inflight),
+            "leased": len(self._leases),
+            "resumed": self.resumed,
+            "evictions": self.evictions,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
+
+
+# Singleton instance
+media_cache = MediaCache(
+    root=str(Path(settings.temp_video_path) / "media"),
+    max_bytes=int(settings.media_cache_max_gb * 1024 ** 3),
+    chunk_size=settings.media_download_chunk_size,
+    retries=settings.media_download_retries,
+    timeout=settings.media_download_timeout,
+)
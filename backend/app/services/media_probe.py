@@ -0,0 +1,307 @@
+"""
+Memoized ffprobe layer and persistent media-info index
+Probe results are cached in memory by (path, size, mtime) and persisted per
+video in videos.metadata["media_info"], so pipeline stages read stream info,
+container details and the keyframe index (timestamps, byte offsets and GOP
+sizes from one packet scan, stored as a packed array) without spawning
+ffprobe again
+"""
+import base64
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from app.services.ffmpeg_runner import run_ffprobe
+from app.utils.logger import get_logger
+
+logger = get_logger("media_probe")
+
+FileKey = Tuple[str, int, int]
+
+# Bumped when the stored media_info layout changes (older records are re-probed)
+MEDIA_INFO_VERSION = 3
+
+# One packed record per keyframe: pts in seconds as probed (may be negative, e.g.
+# after an edit list), byte offset (-1 unknown), GOP packets and bytes
+KEYFRAME_DTYPE = np.dtype([("time", "<f8"), ("offset", "<i8"), ("packets", "<u4"), ("bytes", "<u8")])
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """ffprobe rational ("30000/1001") to float"""
+    try:
+        return round(float(Fraction(rate)), 3) if rate and rate != "0/0" else 0.0
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_probe_output(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize ffprobe -show_format -show_streams JSON
+
+    Keeps the flat keys used across the service (duration, size, width, height,
+    fps, video_codec, audio_codec, bitrate) plus container and per-stream details.
+    """
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video_stream = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if not video_stream:
+        raise ValueError("No video stream found")
+    audio_stream = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    video = {
+        "codec": video_stream.get("codec_name"),
+        "profile": video_stream.get("profile"),
+        "pix_fmt": video_stream.get("pix_fmt"),
+        "width": int(video_stream["width"]),
+        "height": int(video_stream["height"]),
+        "fps": _parse_rate(video_stream.get("avg_frame_rate")) or _parse_rate(video_stream.get("r_frame_rate")),
+        "time_base": video_stream.get("time_base"),
+        "bit_rate": _int(video_stream.get("bit_rate")),
+    }
+    audio = None
+    if audio_stream:
+        audio = {
+            "codec": audio_stream.get("codec_name"),
+            "sample_rate": _int(audio_stream.get("sample_rate")),
+            "channels": _int(audio_stream.get("channels")),
+            "bit_rate": _int(audio_stream.get("bit_rate")),
+        }
+
+    return {
+        "version": MEDIA_INFO_VERSION,
+        "duration": float(fmt.get("duration") or video_stream.get("duration") or 0.0),
+        "size": _int(fmt.get("size")) or 0,
+        "bitrate": _int(fmt.get("bit_rate")) or 0,
+        "container": fmt.get("format_name"),
+        "width": video["width"],
+        "height": video["height"],
+        "fps": video["fps"],
+        "video_codec": video["codec"],
+        "audio_codec": audio["codec"] if audio else None,
+        "video": video,
+        "audio": audio,
+    }
+
+
+@dataclass
+class KeyframeIndex:
+    """Keyframes of the first video stream (KEYFRAME_DTYPE records, by time)"""
+    records: np.ndarray
+
+    @property
+    def times(self) -> List[float]:
+        return self.records["time"].tolist()
+
+    def seek(self, t: float) -> Optional[Tuple[float, int]]:
+        """(timestamp, byte offset) of the keyframe at or before t, for fast seeking"""
+        i = int(np.searchsorted(self.records["time"], t, side="right")) - 1
+        if i < 0:
+            return None
+        record = self.records[i]
+        return float(record["time"]), int(record["offset"])
+
+    def pack(self) -> Dict[str, Any]:
+        """JSON-safe packed form stored in media_info"""
+        return {
+            "count": len(self.records),
+            "data": base64.b64encode(self.records.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def unpack(cls, packed: Dict[str, Any]) -> "KeyframeIndex":
+        records = np.frombuffer(base64.b64decode(packed["data"]), dtype=KEYFRAME_DTYPE)
+        return cls(records[:packed["count"]])
+
+
+def parse_packet_index(output: str) -> KeyframeIndex:
+    """
+    Keyframe index from a "pts_time,size,pos,flags" packet listing (demux order)
+
+    Each packet's size is added to the GOP of the last keyframe seen; packets
+    before the first keyframe are ignored.
+    """
+    rows: List[list] = []
+    for line in output.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 4:
+            continue
+        pts, size, pos, flags = fields[:4]
+        if flags.startswith("K") and pts not in ("", "N/A"):
+            rows.append([float(pts), _int(pos) if _int(pos) is not None else -1, 0, 0])
+        if rows:
+            rows[-1][2] += 1
+            rows[-1][3] += _int(size) or 0
+    records = np.array([tuple(row) for row in rows], dtype=KEYFRAME_DTYPE)
+    return KeyframeIndex(np.sort(records, order="time", kind="stable"))
+
+
+def info_keyframes(info: Dict[str, Any]) -> Optional[List[float]]:
+    """Keyframe timestamps recorded in a media info dict (None if not scanned)"""
+    if info.get("keyframe_index") is not None:
+        return KeyframeIndex.unpack(info["keyframe_index"]).times
+    return info.get("keyframes")
+
+
+class MediaProbe:
+    """ffprobe results memoized per file version"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[FileKey, Dict[str, Any]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+
+    @staticmethod
+    def file_key(path: str) -> FileKey:
+        stat = os.stat(path)
+        return (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+
+    def _get(self, key: FileKey) -> Optional[Dict[str, Any]]:
+        info = self._entries.get(key)
+        if info is not None:
+            self._entries.move_to_end(key)
+        return info
+
+    def _put(self, key: FileKey, info: Dict[str, Any]) -> None:
+        self._entries[key] = info
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _run_ffprobe(self, args: List[str]) -> str:
+        self.probes += 1
+        return await run_ffprobe(args)
+
+    # ---- probing ----
+
+    async def probe(self, path: str) -> Dict[str, Any]:
+        """
+        Stream and container info for a file (ffprobe at most once per version)
+
+        Returns:
+            Normalized info (see parse_probe_output)
+        """
+        key = self.file_key(path)
+        info = self._get(key)
+        if info is not None:
+            self.hits += 1
+            return info
+
+        self.misses += 1
+        output = await self._run_ffprobe([
+            "-v", "quiet",
+            "-print_format", "json",
+            "-show_format",
+            "-show_streams",
+            path
+        ])
+        info = parse_probe_output(json.loads(output))
+        self._put(key, info)
+        return info
+
+    async def keyframe_index(self, path: str) -> KeyframeIndex:
+        """
+        Keyframe index (timestamps, byte offsets, GOP sizes) of the first video stream
+
+        Uses one packet scan (demux only, no decode); memoized with the probe.
+        """
+        info = await self.probe(path)
+        if info.get("keyframe_index") is None:
+            output = await self._run_ffprobe([
+                "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "packet=pts_time,size,pos,flags",
+                "-of", "csv=p=0",
+                path
+            ])
+            info = {**info, "keyframe_index": parse_packet_index(output).pack()}
+            self._put(self.file_key(path), info)
+        return KeyframeIndex.unpack(info["keyframe_index"])
+
+    async def keyframes(self, path: str) -> List[float]:
+        """Keyframe timestamps of the first video stream (see keyframe_index)"""
+        return (await self.keyframe_index(path)).times
+
+    async def media_info(self, path: str) -> Dict[str, Any]:
+        """Full record persisted in videos.metadata (probe + keyframe index)"""
+        await self.keyframe_index(path)
+        return self._get(self.file_key(path))
+
+    def remember(self, path: str, info: Dict[str, Any]) -> bool:
+        """
+        Seed the memo with previously persisted info for path
+
+        Returns:
+            False if the info does not match the file (stale or other version)
+        """
+        if not info or info.get("version") != MEDIA_INFO_VERSION:
+            return False
+        key = self.file_key(path)
+        if info.get("size") != key[1]:
+            return False
+        self._put(key, info)
+        return True
+
+    # ---- videos.metadata ----
+
+    async def for_video(self, path: str, video_id: str) -> Dict[str, Any]:
+        """
+        Media info for a video's source file, backed by videos.metadata
+
+        Order: in-memory memo → videos.metadata["media_info"] → ffprobe (the
+        result is written back so other workers and later jobs skip it).
+        """
+        key = self.file_key(path)
+        info = self._get(key)
+        if info is not None and info.get("keyframe_index") is not None:
+            self.hits += 1
+            return info
+
+        from app.database import get_async_supabase
+
+        metadata: Dict[str, Any] = {}
+        try:
+            res = await get_async_supabase().table("videos").select("metadata").eq("id", video_id).limit(1).execute()
+            rows = res.data if hasattr(res, "data") else []
+            metadata = (rows[0].get("metadata") if rows else None) or {}
+            if self.remember(path, metadata.get("media_info")):
+                self.hits += 1
+                return self._get(key)
+        except Exception as e:
+            logger.warning(f"Could not load media_info for video {video_id}: {e}")
+
+        info = await self.media_info(path)
+        try:
+            await get_async_supabase().table("videos").update({
+                "metadata": {**metadata, "media_info": info}
+            }).eq("id", video_id).execute()
+        except Exception as e:
+            logger.warning(f"Could not persist media_info for video {video_id}: {e}")
+        return info
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Probe statistics (for monitoring)"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "ffprobe_runs": self.probes,
+        }
+
+
+# Singleton instance
+media_probe = MediaProbe()
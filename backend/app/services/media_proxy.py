@@ -0,0 +1,313 @@
+"""
+Editing proxies generated at upload time
+One background FFmpeg pass per video writes a low-resolution, low-bitrate
+proxy (previews) and a 16 kHz mono WAV (transcription, silences, waveform),
+so interactive endpoints never decode the full-resolution original; only the
+final render reads the source
+"""
+import asyncio
+import json
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from app.config import settings
+from app.services.ffmpeg_runner import run_ffmpeg
+from app.services.ffmpeg_scheduler import ffmpeg_scheduler, BACKGROUND_PLAN
+from app.services.media_cache import media_cache
+from app.services.media_probe import media_probe
+from app.utils.logger import get_logger
+
+logger = get_logger("media_proxy")
+
+# Bumped when the proxy layout changes (older proxies are regenerated)
+PROXY_VERSION = 1
+
+AUDIO_SAMPLE_RATE = 16000
+MANIFEST = "proxy.json"
+VIDEO_FILE = "proxy.mp4"
+AUDIO_FILE = "audio.wav"
+
+# Fair-share unit of proxy jobs in the FFmpeg scheduler
+PROXY_ORG = "proxies"
+
+
+@dataclass
+class Proxy:
+    """Paths and source facts of a video's proxy"""
+    video: Path
+    audio: Optional[Path]
+    duration: float
+    width: int
+    height: int
+
+
+class MediaProxy:
+    """Per-video proxy store under temp_video_path/proxies"""
+
+    def __init__(
+        self,
+        root: str,
+        height: int = 360,
+        video_bitrate_kbps: int = 600,
+        max_concurrent: int = 2,
+        max_bytes: int = 5 * 1024 ** 3
+    ):
+        self.root = Path(root)
+        self.height = height
+        self.video_bitrate_kbps = video_bitrate_kbps
+        self.max_bytes = max_bytes
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        # Generations in flight (one per video) and proxies in use by requests
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._leases: Dict[str, int] = {}
+
+        self.generated = 0
+        self.failed = 0
+        self.on_demand = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def proxy_dir(self, video_id: str) -> Path:
+        return self.root / video_id
+
+    def build_command(self, source: str, directory: Path, has_audio: bool) -> List[str]:
+        """One decode, two outputs: the preview proxy and the analysis WAV"""
+        bitrate = self.video_bitrate_kbps
+        cmd = [
+            "ffmpeg",
+            "-i", source,
+            "-map", "0:v:0",
+            "-map", "0:a:0?",
+            # Downscale only; -2 keeps the width even
+            "-vf", f"scale=-2:min({self.height}\\,ih)",
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-b:v", f"{bitrate}k",
+            "-maxrate", f"{bitrate}k",
+            "-bufsize", f"{bitrate * 2}k",
+            "-g", "30",  # Short GOPs: previews seek fast
+            "-c:a", "aac",
+            "-b:a", "64k",
+            "-movflags", "+faststart",
+            "-threads", "1",
+            "-y",
+            str(directory / f"tmp_{VIDEO_FILE}")
+        ]
+        if has_audio:
+            cmd += [
+                "-map", "0:a:0",
+                "-vn",
+                "-acodec", "pcm_s16le",
+                "-ar", str(AUDIO_SAMPLE_RATE),
+                "-ac", "1",
+                "-y",
+                str(directory / f"tmp_{AUDIO_FILE}")
+            ]
+        return cmd
+
+    # ---- lookup ----
+
+    def get(self, video_id: str) -> Optional[Proxy]:
+        """The video's proxy if it is ready on this host"""
+        directory = self.proxy_dir(video_id)
+        try:
+            manifest = json.loads((directory / MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != PROXY_VERSION or not (directory / VIDEO_FILE).exists():
+            return None
+        audio = directory / AUDIO_FILE if manifest.get("has_audio") else None
+        if audio is not None and not audio.exists():
+            return None
+        return Proxy(
+            video=directory / VIDEO_FILE,
+            audio=audio,
+            duration=manifest["duration"],
+            width=manifest["width"],
+            height=manifest["height"],
+        )
+
+    def schedule(self, video_id: str, source: str, remove_source: bool = False) -> asyncio.Task:
+        """
+        Start generating a video's proxy in the background (once per video)
+
+        Args:
+            video_id: Video id
+            source: Local source file
+            remove_source: Delete source when done (upload temp files)
+        """
+        task = self._inflight.get(video_id)
+        if task is None or task.done():
+            task = self._track(video_id, self._generate(video_id, source, remove_source))
+        elif remove_source:
+            # Another generation already owns this video: drop the extra copy
+            Path(source).unlink(missing_ok=True)
+        return task
+
+    def _track(self, video_id: str, generation) -> asyncio.Task:
+        """Run a generation as the video's single in-flight task"""
+        task = asyncio.create_task(generation)
+        self._inflight[video_id] = task
+        task.add_done_callback(
+            lambda t, v=video_id: self._inflight.pop(v, None) if self._inflight.get(v) is t else None
+        )
+        return task
+
+    async def ensure(self, video_id: str, source_url: str) -> Proxy:
+        """
+        The video's proxy, waiting for (or starting) its generation
+
+        Proxies missing on this host (other worker, restart, eviction) are
+        generated on demand from the media cache.
+        """
+        proxy = self.get(video_id)
+        if proxy is not None:
+            self.hits += 1
+            self._touch(self.proxy_dir(video_id))
+            return proxy
+
+        task = self._inflight.get(video_id)
+        if task is None or task.done():
+            self.on_demand += 1
+            task = self._track(video_id, self._generate_from_cache(video_id, source_url))
+        # shield: a cancelled request must not abort the generation shared with others
+        return await asyncio.shield(task)
+
+    @asynccontextmanager
+    async def open(self, video_id: str, source_url: str):
+        """
+        Ensure a video's proxy and hold it while the block runs (it cannot be evicted)
+
+        Usage:
+            async with media_proxy.open(video_id, url) as proxy:
+                ...
+        """
+        proxy = await self.ensure(video_id, source_url)
+        self._leases[video_id] = self._leases.get(video_id, 0) + 1
+        try:
+            yield proxy
+        finally:
+            self._leases[video_id] -= 1
+            if self._leases[video_id] <= 0:
+                del self._leases[video_id]
+
+    # ---- generation ----
+
+    async def _generate_from_cache(self, video_id: str, source_url: str) -> Proxy:
+        # The source is leased for the whole pass (the media cache cannot evict it)
+        async with media_cache.open(source_url, video_id) as source:
+            return await self._generate(video_id, str(source), remove_source=False)
+
+    async def _generate(self, video_id: str, source: str, remove_source: bool) -> Proxy:
+        directory = self.proxy_dir(video_id)
+        try:
+            # Proxy encodes share the FFmpeg slot budget, behind every user job;
+            # the semaphore keeps them from holding all the slots
+            async with self._semaphore:
+                await ffmpeg_scheduler.run(
+                    f"proxy:{video_id}",
+                    PROXY_ORG,
+                    BACKGROUND_PLAN,
+                    lambda: self._encode(video_id, source, directory)
+                )
+
+            self.generated += 1
+            self._evict(keep=video_id)
+            return self.get(video_id)
+        except Exception:
+            self.failed += 1
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        finally:
+            if remove_source:
+                Path(source).unlink(missing_ok=True)
+
+    async def _encode(self, video_id: str, source: str, directory: Path) -> None:
+        info = await media_probe.probe(source)
+        has_audio = info["audio_codec"] is not None
+
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / MANIFEST).unlink(missing_ok=True)
+        started = time.monotonic()
+        await run_ffmpeg(
+            self.build_command(source, directory, has_audio),
+            duration=info["duration"],
+            timeout=settings.ffmpeg_timeout,
+            outputs=[str(directory / f"tmp_{VIDEO_FILE}"), str(directory / f"tmp_{AUDIO_FILE}")]
+        )
+
+        # Publish atomically: the manifest is written last
+        os.replace(directory / f"tmp_{VIDEO_FILE}", directory / VIDEO_FILE)
+        if has_audio:
+            os.replace(directory / f"tmp_{AUDIO_FILE}", directory / AUDIO_FILE)
+        (directory / MANIFEST).write_text(json.dumps({
+            "version": PROXY_VERSION,
+            "duration": info["duration"],
+            "width": info["width"],
+            "height": info["height"],
+            "has_audio": has_audio,
+        }))
+        logger.info(f"Proxy ready for video {video_id} in {time.monotonic() - started:.1f}s")
+
+    # ---- quota ----
+
+    @staticmethod
+    def _touch(directory: Path) -> None:
+        # Manifest mtime is the LRU clock
+        now = time.time()
+        try:
+            os.utime(directory / MANIFEST, (now, now))
+        except OSError:
+            pass
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Delete least recently used proxies until the store fits the quota"""
+        entries = []
+        total = 0
+        for directory in self.root.iterdir():
+            if not directory.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in directory.iterdir() if f.is_file())
+            total += size
+            manifest = directory / MANIFEST
+            if manifest.exists():
+                entries.append((manifest.stat().st_mtime, size, directory))
+
+        for _, size, directory in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            video_id = directory.name
+            if video_id == keep or video_id in self._leases or video_id in self._inflight:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Proxy store evicted video {video_id} ({size} bytes)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Proxy statistics (for monitoring)"""
+        return {
+            "generated": self.generated,
+            "failed": self.failed,
+            "on_demand": self.on_demand,
+            "hits": self.hits,
+            "inflight": len(self._inflight),
+            "leased": len(self._leases),
+            "evictions": self.evictions,
+        }
+
+
+# Singleton instance
+media_proxy = MediaProxy(
+    root=str(Path(settings.temp_video_path) / "proxies"),
+    height=settings.proxy_height,
+    video_bitrate_kbps=settings.proxy_video_bitrate_kbps,
+    max_concurrent=settings.proxy_max_concurrent,
+    max_bytes=int(settings.proxy_cache_max_gb * 1024 ** 3),
+)
@@ -0,0 +1,225 @@
+"""
+Smart-cut: frame-accurate cuts at close to stream-copy speed
+Each kept range is split at the keyframes inside it: the partial GOPs at the
+edges are re-encoded with the source's codec parameters and everything between
+the first and last keyframe is stream-copied, then all pieces are joined with
+the concat demuxer (no re-encode). Every piece repeats its parameter sets
+(SPS/PPS) in-band at each keyframe: the joined MP4 keeps only the first
+piece's avcC/hvcC, which does not match the re-encoded edges
+"""
+import bisect
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.config import settings
+from app.services.ffmpeg_runner import run_ffmpeg
+from app.utils.logger import get_logger
+
+logger = get_logger("smart_cut")
+
+Segment = Tuple[float, float]
+
+COPY = "copy"
+ENCODE = "encode"
+
+# Source video codecs we can re-encode edges for (concat needs identical params)
+ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+# Source audio codecs the edges are re-encoded to (None: no audio stream)
+AUDIO_CODECS = (None, "aac")
+
+# Bitstream filters writing the parameter sets before every keyframe
+PARAMETER_SET_FILTERS = {
+    "h264": "h264_mp4toannexb,dump_extra=freq=keyframe",
+    "hevc": "hevc_mp4toannexb,dump_extra=freq=keyframe",
+}
+
+
+@dataclass
+class Piece:
+    """A contiguous range of the output, either stream-copied or re-encoded"""
+    start: float
+    end: float
+    mode: str
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def supports_smart_cut(info: Dict[str, Any], keyframes: Optional[List[float]]) -> bool:
+    """True if smart-cut is enabled and the source allows it (known keyframes, supported codecs)"""
+    return (
+        settings.smart_cut_enabled
+        and bool(keyframes)
+        and info.get("video_codec") in ENCODERS
+        # Edges get AAC audio: copied pieces must carry the same codec for concat
+        and info.get("audio_codec") in AUDIO_CODECS
+    )
+
+
+def plan_pieces(
+    segments: List[Segment],
+    keyframes: List[float],
+    fps: float = 30.0
+) -> List[Piece]:
+    """
+    Split kept ranges into copy/encode pieces
+
+    For [start, end): copy [first keyframe >= start, last keyframe <= end) and
+    re-encode the remainders at both edges. Ranges without two keyframes inside
+    are re-encoded whole. Edges shorter than half a frame are ignored.
+
+    Args:
+        segments: Source ranges to keep, sorted
+        keyframes: Sorted keyframe timestamps
+        fps: Source frame rate (sets the tolerance)
+
+    Returns:
+        Pieces in output order
+    """
+    tolerance = 0.5 / (fps or 30.0)
+    pieces: List[Piece] = []
+    for start, end in segments:
+        # First keyframe at/after start and last keyframe at/before end
+        i = bisect.bisect_left(keyframes, start - tolerance)
+        j = bisect.bisect_right(keyframes, end + tolerance) - 1
+        first = keyframes[i] if i < len(keyframes) else None
+        last = keyframes[j] if j >= 0 else None
+
+        if first is None or last is None or last - first <= tolerance:
+            pieces.append(Piece(start, end, ENCODE))
+            continue
+
+        head = first - start > tolerance
+        tail = end - last > tolerance
+        if head:
+            pieces.append(Piece(start, first, ENCODE))
+        pieces.append(Piece(first, last if tail else end, COPY))
+        if tail:
+            pieces.append(Piece(last, end, ENCODE))
+    return pieces
+
+
+def encoder_args(info: Dict[str, Any]) -> List[str]:
+    """Encoder options matching the source stream so pieces can be concatenated"""
+    video = info.get("video") or {}
+    args = ["-c:v", ENCODERS[info["video_codec"]]]
+    if video.get("pix_fmt"):
+        args += ["-pix_fmt", video["pix_fmt"]]
+    profile = (video.get("profile") or "").lower()
+    if info["video_codec"] == "h264" and profile in ("baseline", "main", "high"):
+        args += ["-profile:v", profile]
+    if info.get("fps"):
+        args += ["-r", str(info["fps"])]
+
+    audio = info.get("audio")
+    if audio:
+        args += ["-c:a", "aac"]
+        if audio.get("sample_rate"):
+            args += ["-ar", str(audio["sample_rate"])]
+        if audio.get("channels"):
+            args += ["-ac", str(audio["channels"])]
+    return args
+
+
+def timescale_args(info: Dict[str, Any]) -> List[str]:
+    """Keep the source track timescale in every piece (concat needs it equal)"""
+    time_base = (info.get("video") or {}).get("time_base") or ""
+    _, _, denominator = time_base.partition("/")
+    return ["-video_track_timescale", denominator] if denominator.isdigit() else []
+
+
+def parameter_set_args(info: Dict[str, Any]) -> List[str]:
+    """Carry the piece's SPS/PPS in-band so the joined stream decodes after the avcC changes"""
+    return ["-bsf:v", PARAMETER_SET_FILTERS[info["video_codec"]]]
+
+
+def piece_command(source: str, piece: Piece, output: str, info: Dict[str, Any]) -> List[str]:
+    """FFmpeg command that writes one piece"""
+    cmd = [
+        "ffmpeg",
+        "-ss", f"{piece.start:.6f}",  # Input seek: exact on a keyframe / decode-accurate when encoding
+        "-i", source,
+        "-t", f"{piece.duration:.6f}",
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+    ]
+    if piece.mode == COPY:
+        cmd += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+    else:
+        cmd += encoder_args(info) + ["-threads", str(settings.ffmpeg_threads_per_job)]
+    return cmd + parameter_set_args(info) + timescale_args(info) + ["-y", output]
+
+
+async def smart_cut(
+    source: str,
+    output_path: str,
+    segments: List[Segment],
+    info: Dict[str, Any],
+    keyframes: List[float],
+    work_dir: Optional[str] = None,
+    scratch_dir: Optional[str] = None
+) -> str:
+    """
+    Cut and join source ranges, re-encoding only the GOP edges
+
+    Args:
+        source: Source video path
+        output_path: Output video path
+        segments: Source ranges to keep
+        info: Source media info (see media_probe)
+        keyframes: Source keyframe timestamps
+        work_dir: Directory for the intermediate pieces
+        scratch_dir: Directory for the concat list (defaults to the pieces')
+
+    Returns:
+        Path to output video
+    """
+    pieces = plan_pieces(segments, keyframes, info.get("fps") or 30.0)
+    if not pieces:
+        raise ValueError("No segments to cut")
+
+    scratch = Path(tempfile.mkdtemp(prefix="smartcut_", dir=work_dir or settings.temp_video_path))
+    try:
+        files = []
+        for index, piece in enumerate(pieces):
+            piece_file = str(scratch / f"piece_{index:04d}.mp4")
+            await run_ffmpeg(piece_command(source, piece, piece_file, info), duration=piece.duration, outputs=[piece_file])
+            files.append(piece_file)
+
+        copied = sum(p.duration for p in pieces if p.mode == COPY)
+        total = sum(p.duration for p in pieces)
+        logger.info(
+            f"Smart-cut {len(segments)} segment(s) into {len(pieces)} piece(s), "
+            f"{copied / total * 100:.0f}% stream-copied"
+        )
+
+        if len(files) == 1:
+            shutil.move(files[0], output_path)
+            return output_path
+
+        concat_file = Path(scratch_dir) / f"{scratch.name}.txt" if scratch_dir else scratch / "concat.txt"
+        concat_file.write_text("".join(f"file '{f}'\n" for f in files))
+        await run_ffmpeg(
+            [
+                "ffmpeg",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", str(concat_file),
+                "-c", "copy",
+                "-movflags", "+faststart",
+                "-y",
+                output_path
+            ],
+            duration=total,
+            outputs=[output_path]
+        )
+        return output_path
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if scratch_dir:
+            (Path(scratch_dir) / f"{scratch.name}.txt").unlink(missing_ok=True)
@@ -1,4 +1,5 @@
 from app.database import supabase
+from app.core.cache import invalidate_organization_cache
 from typing import Any, Dict, Optional
 
 def get_organization(org_id: str) -> Optional[Dict[str, Any]]:
@@ -7,4 +8,5 @@ def get_organization(org_id: str) -> Optional[Dict[str, Any]]:
 
 def update_organization_tokens(org_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     res = supabase.table("organizations").update(payload).eq("id", org_id).select().single().execute()
+    invalidate_organization_cache(org_id)
     return res.data if hasattr(res, "data") else res.get("data")
@@ -98,7 +98,8 @@ class TranscriptionService:
     async def transcribe_video(
         self,
         video_url: str,
-        language: str = "pt"
+        language: str = "pt",
+        video_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Transcribe video by extracting audio and transcribing
@@ -106,112 +107,73 @@ class TranscriptionService:
         Args:
             video_url: URL or path to video file
             language: Language code
+            video_id: Video id (media cache key)
             
         Returns:
             Dict with transcription, segments, waveform, language, duration
         """
-        import tempfile
-        import urllib.request
-        from app.services.video_processing import VideoProcessingService
+        from app.services.audio_analysis import audio_analyzer
         
         try:
-            # Download video to temp file
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp_video:
-                video_path = tmp_video.name
-                urllib.request.urlretrieve(video_url, video_path)
-            
-            # Extract audio
-            video_service = VideoProcessingService()
-            audio_path = video_path.replace(".mp4", ".wav")
-            await video_service.extract_audio(video_path, audio_path)
-            
-            # Get video duration
-            info = await video_service.get_video_info(video_path)
-            duration = info["duration"]
+            if video_id:
+                # Audio decoded once per video (upload proxy WAV or one extraction):
+                # transcription and waveform read the same 16 kHz buffer
+                async with audio_analyzer.open(video_id, video_url) as analysis:
+                    result = await self.transcribe_audio(str(analysis.wav_path), language)
+                    return self._video_transcription(result, analysis.waveform(), analysis.duration)
             
-            # Generate waveform data
-            waveform = await self._generate_waveform(audio_path, duration)
-            
-            # Transcribe audio
-            result = await self.transcribe_audio(audio_path, language)
-            
-            # Clean up temp files
-            Path(video_path).unlink(missing_ok=True)
-            Path(audio_path).unlink(missing_ok=True)
-            
-            return {
-                "transcription": result["text"],
-                "segments": result["segments"],
-                "waveform": waveform,
-                "language": result["language"],
-                "duration": duration
-            }
+            return await self._transcribe_source(video_url, language, video_id)
             
         except Exception as e:
             logger.error(f"Video transcription error: {e}", exc_info=True)
             raise
     
-    async def _generate_waveform(self, audio_path: str, duration: float, samples: int = 100) -> list:
-        """
-        Generate waveform data for audio visualization
+    async def _transcribe_source(
+        self,
+        video_url: str,
+        language: str,
+        video_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """Extract audio from the original video, then transcribe it"""
+        from app.services.job_workspace import workspace_manager
+        from app.services.media_cache import media_cache
+        from app.services.video_processing import VideoProcessingService
         
-        Args:
-            audio_path: Path to audio file
-            duration: Duration in seconds
-            samples: Number of waveform samples to generate
-            
-        Returns:
-            List of amplitude values (0.0 to 1.0)
-        """
-        try:
-            import subprocess
-            import json
-            
-            # Use FFmpeg to extract audio stats
-            cmd = [
-                "ffmpeg",
-                "-i", audio_path,
-                "-af", f"astats=metadata=1:reset=1,ametadata=print:key=lavfi.astats.Overall.RMS_level:file=-",
-                "-f", "null",
-                "-"
-            ]
-            
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True
-            )
-            
-            # Parse RMS levels from output
-            lines = result.stderr.split("\n")
-            rms_values = []
-            
-            for line in lines:
-                if "lavfi.astats.Overall.RMS_level" in line:
-                    try:
-                        value = float(line.split("=")[-1].strip())
-                        # Convert dB to 0-1 range (approximate)
-                        normalized = max(0, min(1, (value + 60) / 60))
-                        rms_values.append(normalized)
-                    except:
-                        pass
+        # Source video from the shared media cache (held until the audio is extracted)
+        video_service = VideoProcessingService()
+        async with media_cache.open(video_url, video_id) as source:
+            video_path = str(source)
             
-            # Downsample to desired number of samples
-            if len(rms_values) > samples:
-                step = len(rms_values) / samples
-                waveform = [rms_values[int(i * step)] for i in range(samples)]
-            else:
-                # Upsample or use as is
-                waveform = rms_values + [0.0] * (samples - len(rms_values))
-            
-            return waveform[:samples]
-            
-        except Exception as e:
-            logger.warning(f"Waveform generation failed: {e}")
-            # Return dummy waveform
-            import random
-            return [random.random() * 0.5 for _ in range(samples)]
+            # Extract audio (private workspace, removed on any exit)
+            async with workspace_manager.open(video_id or "transcription") as workspace:
+                audio_path = str(workspace.file("audio.wav"))
+                await video_service.extract_audio(video_path, audio_path)
+                
+                # Get video duration
+                info = await video_service.get_video_info(video_path, video_id)
+                return await self._transcribe_wav(audio_path, info["duration"], language)
+    
+    async def _transcribe_wav(self, audio_path: str, duration: float, language: str) -> Dict[str, Any]:
+        """Waveform + transcription of an extracted 16 kHz WAV"""
+        from app.services.audio_analysis import analyze_wav
+        
+        # Waveform from the same WAV (memory-mapped, no extra FFmpeg pass)
+        analysis = await asyncio.to_thread(analyze_wav, Path(audio_path), duration, False)
+        waveform = analysis.waveform()
+        
+        # Transcribe audio
+        result = await self.transcribe_audio(audio_path, language)
+        return self._video_transcription(result, waveform, duration)
+    
+    @staticmethod
+    def _video_transcription(result: Dict[str, Any], waveform: list, duration: float) -> Dict[str, Any]:
+        return {
+            "transcription": result["text"],
+            "segments": result["segments"],
+            "waveform": waveform,
+            "language": result["language"],
+            "duration": duration
+        }
     
     async def _transcribe_deepgram(
         self, 
@@ -3,72 +3,67 @@ Video processing service using FFmpeg
 Handles: subtitle burning, video cutting, format conversion, silence removal
 """
 import asyncio
-import subprocess
-import json
+import os
+import shutil
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Tuple
 from app.config import settings
+from app.services.ffmpeg_runner import FFmpegError, FFmpegProgress, ProgressCallback, run_ffmpeg
+from app.services.media_cache import media_cache
+from app.services.media_probe import info_keyframes, media_probe
+from app.services.audio_analysis import analyze_wav, audio_analyzer
+from app.services.ass_subtitles import create_ass_file
+from app.services.job_workspace import Workspace, workspace_manager
+from app.services.artifact_cache import artifact_cache, artifact_key, file_identity
+from app.services.smart_cut import smart_cut, supports_smart_cut
+from app.services.ffmpeg_graph import (
+    build_filter_graph,
+    compute_keep_segments,
+    covers_whole_source,
+    remap_subtitle_segments,
+    rendition_size,
+)
 from app.utils.logger import setup_logger
 
 logger = setup_logger()
 
+DEFAULT_SUBTITLE_STYLE = {
+    "fontSize": 32,
+    "fontColor": "#FFFFFF",
+    "backgroundColor": "#000000",
+    "backgroundOpacity": 0.7,
+    "position": "bottom",  # bottom, center, top
+    "preset": "word-by-word"  # word-by-word, sentence, full
+}
+
+# Bumped when the cut stage output changes (older cached cuts are not reused)
+CUT_STAGE_VERSION = 2
+
+
+class CutStageUnavailable(Exception):
+    """The cut stage could not be built losslessly (smart-cut failed)"""
+
+
 class VideoProcessingService:
     def __init__(self):
         self.temp_path = Path(settings.temp_video_path)
         self.temp_path.mkdir(parents=True, exist_ok=True)
     
-    async def get_video_info(self, video_path: str) -> Dict[str, Any]:
+    async def get_video_info(self, video_path: str, video_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Get video metadata using ffprobe
+        Get video metadata using ffprobe (memoized, see media_probe)
+        
+        Args:
+            video_path: Local video path
+            video_id: Video id whose source this is (reads/persists videos.metadata)
         
         Returns:
             Dict with duration, width, height, fps, codec, etc.
         """
         try:
-            cmd = [
-                "ffprobe",
-                "-v", "quiet",
-                "-print_format", "json",
-                "-show_format",
-                "-show_streams",
-                video_path
-            ]
-            
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            data = json.loads(result.stdout)
-            
-            # Extract video stream info
-            video_stream = next(
-                (s for s in data["streams"] if s["codec_type"] == "video"),
-                None
-            )
-            
-            if not video_stream:
-                raise Exception("No video stream found")
-            
-            # Extract audio stream info
-            audio_stream = next(
-                (s for s in data["streams"] if s["codec_type"] == "audio"),
-                None
-            )
-            
-            return {
-                "duration": float(data["format"]["duration"]),
-                "size": int(data["format"]["size"]),
-                "width": int(video_stream["width"]),
-                "height": int(video_stream["height"]),
-                "fps": eval(video_stream["r_frame_rate"]),  # "30/1" -> 30.0
-                "video_codec": video_stream["codec_name"],
-                "audio_codec": audio_stream["codec_name"] if audio_stream else None,
-                "bitrate": int(data["format"]["bit_rate"]),
-            }
+            if video_id:
+                return await media_probe.for_video(video_path, video_id)
+            return await media_probe.probe(video_path)
             
         except Exception as e:
             logger.error(f"Failed to get video info: {e}", exc_info=True)
@@ -94,120 +89,53 @@ class VideoProcessingService:
             Path to output video
         """
         try:
-            # Default style
-            default_style = {
-                "fontSize": 32,
-                "fontColor": "#FFFFFF",
-                "backgroundColor": "#000000",
-                "backgroundOpacity": 0.7,
-                "position": "bottom",  # bottom, center, top
-                "preset": "word-by-word"  # word-by-word, sentence, full
-            }
-            
-            style = {**default_style, **(style or {})}
-            
-            # Create SRT subtitle file
-            srt_path = self.temp_path / f"{Path(video_path).stem}_subtitles.srt"
-            self._create_srt_file(srt_path, segments, style["preset"])
-            
-            # Build FFmpeg command
-            # Position mapping
-            position_map = {
-                "top": "Alignment=2",  # Top center
-                "center": "Alignment=5",  # Middle center
-                "bottom": "Alignment=2"  # Bottom center (default)
-            }
-            
-            # Convert hex color to BGR for FFmpeg
-            font_color = style["fontColor"].lstrip("#")
-            bg_color = style["backgroundColor"].lstrip("#")
-            
-            # FFmpeg subtitle filter
-            subtitle_filter = (
-                f"subtitles={srt_path}:force_style='"
-                f"FontSize={style['fontSize']},"
-                f"PrimaryColour=&H{font_color[::-1]}&,"  # BGR format
-                f"BackColour=&H{bg_color[::-1]}&,"
-                f"BorderStyle=4,"
-                f"{position_map.get(style['position'], 'Alignment=2')}'"
-            )
-            
-            cmd = [
-                "ffmpeg",
-                "-i", video_path,
-                "-vf", subtitle_filter,
-                "-c:a", "copy",  # Copy audio without re-encoding
-                "-y",  # Overwrite output
-                output_path
-            ]
+            style = {**DEFAULT_SUBTITLE_STYLE, **(style or {})}
             
-            logger.info(f"Burning subtitles with command: {' '.join(cmd)}")
-            
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            # ASS subtitle file in a private workspace (removed on any exit)
+            async with workspace_manager.open(Path(video_path).stem) as workspace:
+                ass_path = workspace.scratch_file("subtitles.ass")
+                self._create_subtitle_file(ass_path, segments, style)
+                
+                subtitle_filter = self._subtitle_filter(ass_path)
+                
+                cmd = [
+                    "ffmpeg",
+                    "-i", video_path,
+                    "-vf", subtitle_filter,
+                    "-c:a", "copy",  # Copy audio without re-encoding
+                    "-threads", str(settings.ffmpeg_threads_per_job),
+                    "-y",  # Overwrite output
+                    output_path
+                ]
+                
+                logger.info(f"Burning subtitles with command: {' '.join(cmd)}")
+                
+                await run_ffmpeg(cmd, outputs=[output_path])
             
             logger.info(f"Subtitles burned successfully: {output_path}")
             
-            # Clean up SRT file
-            srt_path.unlink(missing_ok=True)
-            
             return output_path
             
-        except subprocess.CalledProcessError as e:
+        except FFmpegError as e:
             logger.error(f"FFmpeg subtitle burning failed: {e.stderr}", exc_info=True)
             raise Exception(f"Subtitle burning failed: {e.stderr}")
         except Exception as e:
             logger.error(f"Subtitle burning error: {e}", exc_info=True)
             raise Exception(f"Subtitle burning failed: {str(e)}")
     
-    def _create_srt_file(
+    def _subtitle_filter(self, ass_path: Path) -> str:
+        """Build the FFmpeg filter for an ASS file (style lives in the file)"""
+        return f"ass={ass_path}"
+    
+    def _create_subtitle_file(
         self,
-        srt_path: Path,
+        ass_path: Path,
         segments: List[Dict[str, Any]],
-        preset: str
+        style: Dict[str, Any]
     ):
-        """Create SRT subtitle file from segments"""
-        with open(srt_path, "w", encoding="utf-8") as f:
-            if preset == "word-by-word":
-                # One word per subtitle
-                for i, segment in enumerate(segments, 1):
-                    start = self._format_srt_time(segment["start"])
-                    end = self._format_srt_time(segment["end"])
-                    text = segment["text"].strip()
-                    
-                    f.write(f"{i}\n")
-                    f.write(f"{start} --> {end}\n")
-                    f.write(f"{text}\n\n")
-            
-            elif preset == "sentence":
-                # Group words into sentences (simplified)
-                # TODO: Implement proper sentence detection
-                pass
-            
-            elif preset == "full":
-                # All text at once
-                if segments:
-                    start = self._format_srt_time(segments[0]["start"])
-                    end = self._format_srt_time(segments[-1]["end"])
-                    text = " ".join(s["text"] for s in segments)
-                    
-                    f.write("1\n")
-                    f.write(f"{start} --> {end}\n")
-                    f.write(f"{text}\n\n")
-    
-    def _format_srt_time(self, seconds: float) -> str:
-        """Convert seconds to SRT time format (HH:MM:SS,mmm)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
-        
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+        """Create ASS subtitle file from word segments (grouped lines, karaoke highlight)"""
+        events = create_ass_file(ass_path, segments, style)
+        logger.info(f"Subtitle file written: {events} events for {len(segments)} words ({style['preset']})")
     
     async def convert_format(
         self,
@@ -233,22 +161,17 @@ class VideoProcessingService:
                 "-c:v", "libx264",  # H.264 codec
                 "-c:a", "aac",  # AAC audio
                 "-movflags", "+faststart",  # Enable streaming
+                "-threads", str(settings.ffmpeg_threads_per_job),
                 "-y",
                 output_path
             ]
             
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            await run_ffmpeg(cmd, outputs=[output_path])
             
             logger.info(f"Video converted to {target_format}: {output_path}")
             return output_path
             
-        except subprocess.CalledProcessError as e:
+        except FFmpegError as e:
             logger.error(f"FFmpeg conversion failed: {e.stderr}", exc_info=True)
             raise Exception(f"Video conversion failed: {e.stderr}")
     
@@ -275,18 +198,12 @@ class VideoProcessingService:
                 output_path
             ]
             
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            await run_ffmpeg(cmd, outputs=[output_path])
             
             logger.info(f"Audio extracted: {output_path}")
             return output_path
             
-        except subprocess.CalledProcessError as e:
+        except FFmpegError as e:
             logger.error(f"FFmpeg audio extraction failed: {e.stderr}", exc_info=True)
             raise Exception(f"Audio extraction failed: {e.stderr}")
     
@@ -295,21 +212,59 @@ class VideoProcessingService:
         video_path: str,
         output_path: str,
         start_time: float,
-        end_time: float
+        end_time: float,
+        keyframes: Optional[List[float]] = None,
+        video_id: Optional[str] = None
     ) -> str:
         """
-        Trim video to specific time range
+        Trim video to specific time range (frame-accurate smart-cut)
+        
+        Only the partial GOPs at the edges are re-encoded; the rest is
+        stream-copied; a failed smart-cut is re-encoded instead. Sources that
+        cannot be smart-cut fall back to a plain stream copy (keyframe-aligned).
         
         Args:
             video_path: Input video path
             output_path: Output video path
             start_time: Start time in seconds
             end_time: End time in seconds
+            keyframes: Source keyframe timestamps (from the keyframe index if omitted)
+            video_id: Video id whose source this is (index read from videos.metadata)
             
         Returns:
             Path to trimmed video
         """
         try:
+            info = await self.get_video_info(video_path, video_id)
+            if keyframes is None:
+                keyframes = info_keyframes(info)
+            if keyframes is None:
+                keyframes = await media_probe.keyframes(video_path)
+            
+            if supports_smart_cut(info, keyframes):
+                try:
+                    # Pieces go in the job's own workspace (reserved, cleaned on exit)
+                    reserve = self.scratch_reservation(os.path.getsize(video_path))
+                    async with workspace_manager.open(video_id or Path(video_path).stem, reserve) as workspace:
+                        await smart_cut(
+                            video_path, output_path, [(start_time, end_time)], info, keyframes,
+                            work_dir=str(workspace.path),
+                            scratch_dir=str(workspace.scratch)
+                        )
+                    logger.info(f"Video trimmed (smart-cut): {output_path}")
+                    return output_path
+                except FFmpegError as e:
+                    logger.warning(f"Smart-cut failed, re-encoding instead: {e}")
+                    await self.render(
+                        video_path,
+                        output_path,
+                        [(start_time, end_time)],
+                        info["duration"],
+                        has_audio=info.get("audio_codec") is not None
+                    )
+                    logger.info(f"Video trimmed (re-encoded): {output_path}")
+                    return output_path
+            
             duration = end_time - start_time
             
             cmd = [
@@ -322,26 +277,72 @@ class VideoProcessingService:
                 output_path
             ]
             
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            await run_ffmpeg(cmd, outputs=[output_path])
             
             logger.info(f"Video trimmed: {output_path}")
             return output_path
             
-        except subprocess.CalledProcessError as e:
+        except FFmpegError as e:
             logger.error(f"FFmpeg trim failed: {e.stderr}", exc_info=True)
             raise Exception(f"Video trim failed: {e.stderr}")
     
+    async def cut_segments(
+        self,
+        input_path: str,
+        output_path: str,
+        keep_segments: List[Tuple[float, float]],
+        info: Dict[str, Any],
+        keyframes: Optional[List[float]] = None,
+        workspace: Optional[Workspace] = None
+    ) -> str:
+        """
+        Keep only the given source ranges, frame-accurately
+        
+        Uses smart-cut when the source allows it, otherwise a single-pass
+        re-encode of the cut graph. Smart-cut pieces go in the job's
+        workspace when one is given.
+        """
+        if keyframes is None:
+            keyframes = info_keyframes(info)
+        if keyframes is None:
+            keyframes = await media_probe.keyframes(input_path)
+        
+        if supports_smart_cut(info, keyframes):
+            try:
+                return await smart_cut(
+                    input_path, output_path, keep_segments, info, keyframes,
+                    work_dir=str(workspace.path if workspace else self.temp_path),
+                    scratch_dir=str(workspace.scratch) if workspace else None
+                )
+            except FFmpegError as e:
+                # e.g. concat rejected mismatched pieces: the re-encode path always works
+                logger.warning(f"Smart-cut failed, re-encoding instead: {e}")
+        
+        return await self.render(
+            input_path,
+            output_path,
+            keep_segments,
+            info["duration"],
+            has_audio=info.get("audio_codec") is not None
+        )
+    
     async def extract_metadata(self, video_path: str) -> Dict[str, Any]:
         """
         Extract video metadata (wrapper for get_video_info)
         """
         info = await self.get_video_info(video_path)
+        return self._public_metadata(info)
+    
+    async def extract_media_info(self, video_path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Extract public metadata plus the full media_info record (streams,
+        container, keyframe index) stored in videos.metadata at upload
+        """
+        media_info = await media_probe.media_info(video_path)
+        return self._public_metadata(media_info), media_info
+    
+    @staticmethod
+    def _public_metadata(info: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "duration": info["duration"],
             "resolution": f"{info['width']}x{info['height']}",
@@ -354,73 +355,27 @@ class VideoProcessingService:
         self,
         video_url: str,
         min_silence_duration: float = 1.0,
-        silence_threshold: int = -30
+        silence_threshold: int = -30,
+        video_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Detect silences in video audio using FFmpeg silencedetect filter
-        """
-        import tempfile
-        import urllib.request
+        Detect silences in video audio from its RMS envelope (NumPy run-length)
         
+        With a video_id the envelope is the per-video cached analysis (audio
+        decoded once), so re-querying with other thresholds takes milliseconds.
+        """
         try:
-            # Download video to temp file
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp_file:
-                temp_path = tmp_file.name
-                urllib.request.urlretrieve(video_url, temp_path)
-            
-            # Get video duration
-            info = await self.get_video_info(temp_path)
-            video_duration = info["duration"]
-            
-            # Run FFmpeg with silencedetect filter
-            cmd = [
-                "ffmpeg",
-                "-i", temp_path,
-                "-af", f"silencedetect=noise={silence_threshold}dB:d={min_silence_duration}",
-                "-f", "null",
-                "-"
-            ]
-            
-            result = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True
-            )
-            
-            # Parse silence detection output
-            silences = []
-            lines = result.stderr.split("\n")
-            
-            silence_start = None
-            for line in lines:
-                if "silence_start:" in line:
-                    silence_start = float(line.split("silence_start:")[1].strip())
-                elif "silence_end:" in line and silence_start is not None:
-                    parts = line.split("|")
-                    silence_end = float(parts[0].split("silence_end:")[1].strip())
-                    silence_duration = float(parts[1].split("silence_duration:")[1].strip())
-                    
-                    silences.append({
-                        "start": silence_start,
-                        "end": silence_end,
-                        "duration": silence_duration
-                    })
-                    silence_start = None
-            
-            # Calculate total silence duration
-            total_silence = sum(s["duration"] for s in silences)
-            silence_percentage = (total_silence / video_duration * 100) if video_duration > 0 else 0
-            
-            # Clean up temp file
-            Path(temp_path).unlink(missing_ok=True)
-            
-            return {
-                "silences": silences,
-                "totalSilenceDuration": total_silence,
-                "videoDuration": video_duration,
-                "silencePercentage": round(silence_percentage, 2)
-            }
+            if video_id:
+                async with audio_analyzer.open(video_id, video_url) as analysis:
+                    return analysis.silences(min_silence_duration, silence_threshold)
+            
+            # No video record: decode this source's audio once, just for this query
+            async with media_cache.open(video_url) as source, workspace_manager.open("silences") as workspace:
+                audio_path = workspace.file("audio.wav")
+                await self.extract_audio(str(source), str(audio_path))
+                info = await self.get_video_info(str(source))
+                analysis = await asyncio.to_thread(analyze_wav, audio_path, info["duration"], False)
+                return analysis.silences(min_silence_duration, silence_threshold)
             
         except Exception as e:
             logger.error(f"Silence detection error: {e}", exc_info=True)
@@ -433,175 +388,447 @@ class VideoProcessingService:
         subtitles: Optional[Dict[str, Any]] = None,
         trim: Optional[Dict[str, Any]] = None,
         silence_removal: Optional[Dict[str, Any]] = None,
-        progress_callback = None
+        renditions: Optional[List[Dict[str, Any]]] = None,
+        progress_callback = None,
+        workspace: Optional[Workspace] = None
     ) -> Dict[str, Any]:
         """
         Process video with multiple operations: trim, silence removal, subtitles
-        """
-        import tempfile
-        import urllib.request
         
+        With renditions (aspect ratio, crop/pad, max resolution, bitrate cap),
+        every rendition is encoded from the same decode in one FFmpeg process.
+        
+        Intermediates and outputs are written to `workspace`, which the caller
+        owns (and cleans). Without one, the job runs in a private workspace
+        and its outputs are moved to temp_path for the caller to delete.
+        """
         try:
-            # Download video
+            # Download video (shared media cache; held until the render ends)
             if progress_callback:
                 progress_callback(10, "Baixando vídeo...")
             
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp_file:
-                temp_input = tmp_file.name
-                urllib.request.urlretrieve(video_url, temp_input)
-            
-            current_file = temp_input
-            
-            # Apply trim
-            if trim:
-                if progress_callback:
-                    progress_callback(25, "Aplicando cortes...")
+            async with media_cache.open(video_url, video_id) as source:
+                args = (str(source), video_id, subtitles, trim, silence_removal, renditions, progress_callback)
+                if workspace is not None:
+                    return await self._process_source(*args, workspace)
                 
-                trimmed_file = str(self.temp_path / f"{video_id}_trimmed.mp4")
-                await self.trim_video(
-                    current_file,
-                    trimmed_file,
-                    trim["start"],
-                    trim["end"]
+                reserve = self.scratch_reservation(os.path.getsize(source), renditions)
+                async with workspace_manager.open(video_id, reserve) as own:
+                    return self._detach_outputs(await self._process_source(*args, own), own)
+            
+        except Exception as e:
+            logger.error(f"Video processing error: {e}", exc_info=True)
+            raise
+    
+    @staticmethod
+    def scratch_reservation(source_bytes: int, renditions: Optional[List[Any]] = None) -> int:
+        """Disk a render job may need: one output per rendition plus smart-cut pieces"""
+        return source_bytes * (max(1, len(renditions or [])) + 1)
+    
+    def _detach_outputs(self, result: Dict[str, Any], workspace: Workspace) -> Dict[str, Any]:
+        """Move a job's outputs out of its workspace before it is cleaned"""
+        moved = {}
+        for output in result.get("renditions") or [result]:
+            destination = str(self.temp_path / f"{workspace.path.name}_{Path(output['output_path']).name}")
+            shutil.move(output["output_path"], destination)
+            moved[output["output_path"]] = destination
+            output["output_path"] = destination
+        result["output_path"] = moved.get(result["output_path"], result["output_path"])
+        return result
+    
+    async def _process_source(
+        self,
+        temp_input: str,
+        video_id: str,
+        subtitles: Optional[Dict[str, Any]],
+        trim: Optional[Dict[str, Any]],
+        silence_removal: Optional[Dict[str, Any]],
+        renditions: Optional[List[Dict[str, Any]]],
+        progress_callback,
+        workspace: Workspace
+    ) -> Dict[str, Any]:
+        """Render a downloaded source (the source file is left untouched)"""
+        # Compile trim + silence removal + subtitles into one render pass
+        info = await self.get_video_info(temp_input, video_id)
+        duration = info["duration"]
+        
+        silences = []
+        if silence_removal and silence_removal.get("enabled"):
+            silences = silence_removal.get("silences", [])
+        
+        keep_segments = compute_keep_segments(duration, trim, silences)
+        if not keep_segments:
+            raise Exception("Nothing left to render after trim and silence removal")
+        
+        subtitle_filter = None
+        if subtitles and subtitles.get("enabled"):
+            style = {**DEFAULT_SUBTITLE_STYLE, **(subtitles.get("style") or {})}
+            # Subtitles run after the cuts, so they use output timestamps
+            segments = remap_subtitle_segments(subtitles["segments"], keep_segments)
+            ass_path = workspace.scratch_file("subtitles.ass")
+            self._create_subtitle_file(ass_path, segments, style)
+            subtitle_filter = self._subtitle_filter(ass_path)
+        
+        output_file = str(workspace.file(f"{video_id}_final.mp4"))
+        outputs = []
+        if renditions:
+            source_size = (info["width"], info["height"])
+            for rendition in renditions:
+                width, height = rendition_size(rendition["aspectRatio"], rendition["maxResolution"], source_size)
+                outputs.append({
+                    **rendition,
+                    "output_path": str(workspace.file(f"{video_id}_{rendition['name']}.mp4")),
+                    "width": width,
+                    "height": height
+                })
+            output_file = outputs[0]["output_path"]
+        
+        if progress_callback:
+            progress_callback(25, "Processando vídeo...")
+        
+        final_stage = (output_file, outputs, subtitle_filter, info, workspace, progress_callback)
+        keyframes = None
+        if artifact_cache.enabled and not covers_whole_source(keep_segments, duration):
+            keyframes = info_keyframes(info)
+            if keyframes is None:
+                keyframes = await media_probe.keyframes(temp_input)
+        
+        cached = False
+        if keyframes is not None and supports_smart_cut(info, keyframes):
+            # Cut stage cached by (source, cuts): a re-render with another subtitle
+            # style or other renditions only redoes the final stage. Only a
+            # smart-cut (stream copy) is cached: a re-encoded cut would add a
+            # lossy generation before the final encode
+            cut_duration = sum(end - start for start, end in keep_segments)
+            try:
+                async with self._cut_stage(temp_input, keep_segments, info, keyframes, workspace) as cut_path:
+                    await self._final_stage(str(cut_path), [(0.0, cut_duration)], cut_duration, *final_stage)
+                cached = True
+            except CutStageUnavailable as e:
+                logger.warning(f"Cut stage not cached, rendering from source: {e}")
+        if not cached:
+            await self._final_stage(temp_input, keep_segments, duration, *final_stage)
+        
+        if progress_callback:
+            progress_callback(80, "Finalizando vídeo...")
+        
+        for output in outputs:
+            output["size"] = os.path.getsize(output["output_path"])
+        
+        # Output duration is known from the cuts: no probe of the final file
+        result = {
+            "output_path": output_file,
+            "duration": round(sum(end - start for start, end in keep_segments), 3),
+            "size": os.path.getsize(output_file)
+        }
+        if outputs:
+            result["renditions"] = outputs
+        return result
+    
+    def _cut_stage(
+        self,
+        source: str,
+        keep_segments: List[Tuple[float, float]],
+        info: Dict[str, Any],
+        keyframes: List[float],
+        workspace: Workspace
+    ):
+        """
+        Cut stage (trim + silence removal) of a source, from the artifact cache
+        
+        The cut is a smart-cut of the source; if that fails nothing is cached
+        and CutStageUnavailable is raised. Smart-cut pieces are written to
+        the job's workspace.
+        
+        Usage:
+            async with self._cut_stage(source, keep_segments, info, keyframes, workspace) as cut_path:
+                ...
+        """
+        key = artifact_key("cut", file_identity(source), {
+            "version": CUT_STAGE_VERSION,
+            "keep": [[round(start, 3), round(end, 3)] for start, end in keep_segments]
+        })
+        
+        async def build(path: Path):
+            # Smart-cut: stream copy between keyframes, only GOP edges are encoded
+            try:
+                await smart_cut(
+                    source, str(path), keep_segments, info, keyframes,
+                    work_dir=str(workspace.path),
+                    scratch_dir=str(workspace.scratch)
                 )
-                if current_file != temp_input:
-                    Path(current_file).unlink(missing_ok=True)
-                current_file = trimmed_file
-            
-            # Apply silence removal
-            if silence_removal and silence_removal.get("enabled"):
-                if progress_callback:
-                    progress_callback(40, "Removendo silêncios...")
-                
-                # Build complex filter for removing silences
-                silences = silence_removal.get("silences", [])
-                if silences:
-                    removed_file = str(self.temp_path / f"{video_id}_no_silence.mp4")
-                    await self._remove_silences(current_file, removed_file, silences)
-                    if current_file != temp_input:
-                        Path(current_file).unlink(missing_ok=True)
-                    current_file = removed_file
-            
-            # Apply subtitles
-            if subtitles and subtitles.get("enabled"):
-                if progress_callback:
-                    progress_callback(60, "Aplicando legendas...")
-                
-                subtitled_file = str(self.temp_path / f"{video_id}_subtitled.mp4")
-                await self.burn_subtitles(
-                    current_file,
-                    subtitled_file,
-                    subtitles["segments"],
-                    subtitles.get("style")
+            except FFmpegError as e:
+                raise CutStageUnavailable(str(e)) from e
+        
+        return artifact_cache.open(key, build)
+    
+    async def _final_stage(
+        self,
+        input_path: str,
+        keep_segments: List[Tuple[float, float]],
+        duration: float,
+        output_file: str,
+        outputs: List[Dict[str, Any]],
+        subtitle_filter: Optional[str],
+        info: Dict[str, Any],
+        workspace: Workspace,
+        progress_callback
+    ) -> None:
+        """Subtitle/encode stage: write the job's output(s) from input_path"""
+        if outputs:
+            # One decode, split into one encoder per rendition
+            await self.render_renditions(
+                input_path,
+                outputs,
+                keep_segments,
+                duration,
+                subtitle_filter=subtitle_filter,
+                has_audio=info["audio_codec"] is not None,
+                source_size=(info["width"], info["height"]),
+                on_progress=self._render_progress(progress_callback)
+            )
+        elif subtitle_filter is None and covers_whole_source(keep_segments, duration):
+            # Nothing to do: link (or copy) the input
+            await asyncio.to_thread(self._link_or_copy, input_path, output_file)
+        elif subtitle_filter is None:
+            # Cuts only: smart-cut (copy between keyframes, encode GOP edges)
+            await self.cut_segments(input_path, output_file, keep_segments, info, workspace=workspace)
+        else:
+            await self.render(
+                input_path,
+                output_file,
+                keep_segments,
+                duration,
+                subtitle_filter=subtitle_filter,
+                has_audio=info["audio_codec"] is not None,
+                on_progress=self._render_progress(progress_callback)
+            )
+    
+    @staticmethod
+    def _render_progress(progress_callback):
+        """Map live render progress onto the job's 25-80% range"""
+        if not progress_callback:
+            return None
+        
+        def on_progress(progress: FFmpegProgress):
+            if progress.percent is not None:
+                progress_callback(
+                    25 + int(progress.percent * 0.55),
+                    f"Processando vídeo... {progress.percent}% ({progress.fps:.0f} fps)"
                 )
-                if current_file != temp_input:
-                    Path(current_file).unlink(missing_ok=True)
-                current_file = subtitled_file
+        return on_progress
+    
+    @staticmethod
+    def _link_or_copy(source: str, destination: str) -> None:
+        """Hard link source to destination, copying across filesystems"""
+        Path(destination).unlink(missing_ok=True)
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+    
+    async def render(
+        self,
+        input_path: str,
+        output_path: str,
+        keep_segments: List[Tuple[float, float]],
+        duration: float,
+        subtitle_filter: Optional[str] = None,
+        has_audio: bool = True,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> str:
+        """
+        Render cuts and subtitles in a single decode/encode pass
+        
+        Args:
+            input_path: Source video path
+            output_path: Output MP4 path
+            keep_segments: Source ranges to keep (see compute_keep_segments)
+            duration: Source duration in seconds
+            subtitle_filter: Optional subtitles filter (timestamps in output time)
+            has_audio: Whether the source has an audio stream
+            on_progress: Called with live FFmpeg progress (percent, fps)
             
-            # Final output
-            if progress_callback:
-                progress_callback(80, "Finalizando vídeo...")
+        Returns:
+            Path to output video
+        """
+        try:
+            cmd = self._build_render_command(
+                input_path, output_path, keep_segments, duration, subtitle_filter, has_audio
+            )
+            
+            logger.info(
+                f"Rendering {len(keep_segments)} segment(s) in one pass "
+                f"(subtitles={'yes' if subtitle_filter else 'no'})"
+            )
             
-            output_file = str(self.temp_path / f"{video_id}_final.mp4")
+            await run_ffmpeg(
+                cmd,
+                duration=sum(end - start for start, end in keep_segments),
+                on_progress=on_progress,
+                outputs=[output_path]
+            )
             
-            # Convert to MP4 if needed
-            if not current_file.endswith(".mp4"):
-                await self.convert_format(current_file, output_file, "mp4")
-                Path(current_file).unlink(missing_ok=True)
-            else:
-                # Just rename/move
-                Path(current_file).rename(output_file)
+            logger.info(f"Video rendered: {output_path}")
+            return output_path
             
-            # Get final video info
-            info = await self.get_video_info(output_file)
+        except FFmpegError as e:
+            logger.error(f"FFmpeg render failed: {e.stderr}", exc_info=True)
+            raise Exception(f"Video render failed: {e.stderr}")
+    
+    def _build_render_command(
+        self,
+        input_path: str,
+        output_path: str,
+        keep_segments: List[Tuple[float, float]],
+        duration: float,
+        subtitle_filter: Optional[str] = None,
+        has_audio: bool = True
+    ) -> List[str]:
+        """Build the single-pass FFmpeg command for render()"""
+        graph = build_filter_graph(keep_segments, duration, subtitle_filter, has_audio)
+        
+        cmd = [
+            "ffmpeg",
+            "-i", input_path,
+            "-filter_complex", graph.filter_complex,
+            "-map", graph.video_map,
+        ]
+        if graph.audio_map:
+            cmd += ["-map", graph.audio_map]
+        cmd += [
+            "-c:v", "libx264",  # H.264 codec
+            "-c:a", "aac",  # AAC audio
+            "-movflags", "+faststart",  # Enable streaming
+            "-threads", str(settings.ffmpeg_threads_per_job),
+            "-y",
+            output_path
+        ]
+        return cmd
+    
+    async def render_renditions(
+        self,
+        input_path: str,
+        renditions: List[Dict[str, Any]],
+        keep_segments: List[Tuple[float, float]],
+        duration: float,
+        subtitle_filter: Optional[str] = None,
+        has_audio: bool = True,
+        source_size: Optional[Tuple[int, int]] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> List[str]:
+        """
+        Render several output renditions from a single decode
+        
+        The cut/subtitled video is split once per rendition and each branch is
+        scaled, cropped or padded and encoded by its own encoder in the same
+        FFmpeg process.
+        
+        Args:
+            input_path: Source video path
+            renditions: Dicts with name, aspectRatio, fit, maxResolution,
+                maxBitrateKbps and output_path
+            keep_segments: Source ranges to keep (see compute_keep_segments)
+            duration: Source duration in seconds
+            subtitle_filter: Optional subtitles filter (timestamps in output time)
+            has_audio: Whether the source has an audio stream
+            source_size: Source (width, height), to avoid upscaling
+            on_progress: Called with live FFmpeg progress (percent, fps)
             
-            # Clean up temp input
-            Path(temp_input).unlink(missing_ok=True)
+        Returns:
+            Output paths, in rendition order
+        """
+        output_paths = [r["output_path"] for r in renditions]
+        try:
+            cmd = self._build_renditions_command(
+                input_path, renditions, keep_segments, duration, subtitle_filter, has_audio, source_size
+            )
             
-            return {
-                "output_path": output_file,
-                "duration": info["duration"],
-                "size": info["size"]
-            }
+            logger.info(
+                f"Rendering {len(renditions)} rendition(s) from one decode: "
+                f"{', '.join(r['name'] for r in renditions)}"
+            )
             
-        except Exception as e:
-            logger.error(f"Video processing error: {e}", exc_info=True)
-            raise
+            await run_ffmpeg(
+                cmd,
+                duration=sum(end - start for start, end in keep_segments),
+                on_progress=on_progress,
+                outputs=output_paths
+            )
+            return output_paths
+            
+        except FFmpegError as e:
+            logger.error(f"FFmpeg rendition render failed: {e.stderr}", exc_info=True)
+            raise Exception(f"Video render failed: {e.stderr}")
+    
+    def _build_renditions_command(
+        self,
+        input_path: str,
+        renditions: List[Dict[str, Any]],
+        keep_segments: List[Tuple[float, float]],
+        duration: float,
+        subtitle_filter: Optional[str] = None,
+        has_audio: bool = True,
+        source_size: Optional[Tuple[int, int]] = None
+    ) -> List[str]:
+        """Build the single-decode, multi-output FFmpeg command for render_renditions()"""
+        graph = build_filter_graph(
+            keep_segments, duration, subtitle_filter, has_audio,
+            renditions=renditions, source_size=source_size
+        )
+        # The scheduler budgets threads per job, so the encoders share them
+        threads = max(1, settings.ffmpeg_threads_per_job // len(renditions))
+        
+        cmd = [
+            "ffmpeg",
+            "-i", input_path,
+            "-filter_complex", graph.filter_complex,
+        ]
+        for rendition, (video_map, audio_map) in zip(renditions, graph.outputs):
+            cmd += ["-map", video_map]
+            if audio_map:
+                cmd += ["-map", audio_map]
+            cmd += ["-c:v", "libx264"]
+            if rendition.get("maxBitrateKbps"):
+                # VBV cap: peak bitrate with a 2s buffer
+                bitrate = int(rendition["maxBitrateKbps"])
+                cmd += ["-maxrate", f"{bitrate}k", "-bufsize", f"{bitrate * 2}k"]
+            cmd += [
+                "-c:a", "aac",
+                "-movflags", "+faststart",
+                "-threads", str(threads),
+                "-y",
+                rendition["output_path"]
+            ]
+        return cmd
     
     async def _remove_silences(
         self,
         input_path: str,
         output_path: str,
-        silences: List[Dict[str, Any]]
+        silences: List[Dict[str, Any]],
+        video_id: Optional[str] = None
     ) -> str:
         """
         Remove silence segments from video
+        
+        Copy vs re-encode boundaries come from the source's keyframe index
+        (videos.metadata with a video_id), so no extra probe is needed.
         """
         try:
-            # Get video duration
-            info = await self.get_video_info(input_path)
+            # Get video duration and keyframe index
+            info = await self.get_video_info(input_path, video_id)
             duration = info["duration"]
             
             # Build segments to keep (inverse of silences)
-            keep_segments = []
-            last_end = 0
-            
-            for silence in sorted(silences, key=lambda x: x["start"]):
-                if silence["start"] > last_end:
-                    keep_segments.append((last_end, silence["start"]))
-                last_end = silence["end"]
-            
-            # Add final segment
-            if last_end < duration:
-                keep_segments.append((last_end, duration))
+            keep_segments = compute_keep_segments(duration, silences=silences)
             
             if not keep_segments:
                 # No segments to keep, just copy
                 Path(input_path).rename(output_path)
                 return output_path
             
-            # Create temp files for each segment
-            segment_files = []
-            for i, (start, end) in enumerate(keep_segments):
-                segment_file = str(self.temp_path / f"segment_{i}.mp4")
-                await self.trim_video(input_path, segment_file, start, end)
-                segment_files.append(segment_file)
-            
-            # Concatenate segments
-            if len(segment_files) == 1:
-                Path(segment_files[0]).rename(output_path)
-            else:
-                # Create concat file
-                concat_file = str(self.temp_path / "concat.txt")
-                with open(concat_file, "w") as f:
-                    for seg_file in segment_files:
-                        f.write(f"file '{seg_file}'\n")
-                
-                # Concatenate
-                cmd = [
-                    "ffmpeg",
-                    "-f", "concat",
-                    "-safe", "0",
-                    "-i", concat_file,
-                    "-c", "copy",
-                    "-y",
-                    output_path
-                ]
-                
-                await asyncio.to_thread(
-                    subprocess.run,
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                
-                # Clean up
-                Path(concat_file).unlink(missing_ok=True)
-                for seg_file in segment_files:
-                    Path(seg_file).unlink(missing_ok=True)
-            
-            return output_path
+            return await self.cut_segments(input_path, output_path, keep_segments, info)
             
         except Exception as e:
             logger.error(f"Silence removal error: {e}", exc_info=True)
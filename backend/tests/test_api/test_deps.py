@@ -0,0 +1,66 @@
+"""
+Testes unitários das dependências de autenticação (app/api/deps.py)
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import HTTPException
+from app.api import deps
+from app.api.deps import Principal, get_current_principal, require_plan
+
+
+PRINCIPAL_DATA = {
+    "organization_id": "test-org-123",
+    "plan": "starter",
+    "heygen_configured": True,
+    "metricool_configured": False,
+}
+
+
+class TestGetCurrentPrincipal:
+    """Testes da resolução usuário → organização → plano"""
+
+    async def test_loads_from_database_and_caches(self):
+        user = SimpleNamespace(id="test-user-123")
+        with patch.object(deps, "get_cached_principal", AsyncMock(return_value=None)), \
+             patch.object(deps, "cache_principal", AsyncMock()) as mock_cache, \
+             patch.object(deps.database, "get_principal_by_user_id", AsyncMock(return_value=PRINCIPAL_DATA)) as mock_db:
+            principal = await get_current_principal(user)
+
+        mock_db.assert_awaited_once_with("test-user-123")
+        mock_cache.assert_awaited_once_with("test-user-123", PRINCIPAL_DATA)
+        assert principal.organization_id == "test-org-123"
+        assert principal.plan == "starter"
+        assert principal.user_id == "test-user-123"
+
+    async def test_cache_hit_skips_database(self):
+        user = SimpleNamespace(id="test-user-123")
+        with patch.object(deps, "get_cached_principal", AsyncMock(return_value=PRINCIPAL_DATA)), \
+             patch.object(deps.database, "get_principal_by_user_id", AsyncMock()) as mock_db:
+            principal = await get_current_principal(user)
+
+        mock_db.assert_not_awaited()
+        assert principal.heygen_configured is True
+
+    async def test_missing_organization_returns_404(self):
+        user = SimpleNamespace(id="test-user-123")
+        with patch.object(deps, "get_cached_principal", AsyncMock(return_value=None)), \
+             patch.object(deps.database, "get_principal_by_user_id", AsyncMock(return_value=None)):
+            with pytest.raises(HTTPException) as exc:
+                await get_current_principal(user)
+        assert exc.value.status_code == 404
+
+
+class TestRequirePlan:
+    """Testes do require_plan sobre o principal já resolvido"""
+
+    async def test_plan_sufficient(self):
+        user = SimpleNamespace(id="test-user-123")
+        principal = Principal(user=user, organization_id="test-org-123", plan="pro")
+        assert await require_plan("starter")(principal) is user
+
+    async def test_plan_insufficient(self):
+        principal = Principal(user=MagicMock(), organization_id="test-org-123", plan="free")
+        with pytest.raises(HTTPException) as exc:
+            await require_plan("pro")(principal)
+        assert exc.value.status_code == 403
@@ -58,7 +58,7 @@ def override_auth():
 
     Estratégia:
     - Override direto de get_current_user e get_current_organization
-    - Patch de app.database.get_organization_by_user_id (usado internamente por require_plan)
+    - Patch de app.database.get_principal_by_user_id (usado internamente por require_plan)
     - Patch de app.database.supabase mockando a query de plano
     """
     # Override das dependências de auth
@@ -68,10 +68,11 @@ def override_auth():
     # Patch do supabase e da função de database usados internamente por require_plan
     mock_supabase = build_supabase_mock()
 
-    with patch("app.database.get_organization_by_user_id", new_callable=AsyncMock) as mock_get_org_by_user, \
+    with patch("app.database.get_principal_by_user_id", new_callable=AsyncMock) as mock_get_principal, \
+         patch("app.api.deps.get_cached_principal", new_callable=AsyncMock, return_value=None), \
          patch("app.database.supabase", mock_supabase):
 
-        mock_get_org_by_user.return_value = MOCK_ORG_ID
+        mock_get_principal.return_value = {"organization_id": MOCK_ORG_ID, "plan": "pro"}
 
         yield
 
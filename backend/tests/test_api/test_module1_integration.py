@@ -29,9 +29,10 @@ def mock_get_current_user(mock_auth_user):
 
 @pytest.fixture
 def mock_get_organization():
-    """Mock da função get_organization_by_user_id"""
-    with patch('app.api.deps.get_organization_by_user_id', new_callable=AsyncMock) as mock:
-        mock.return_value = "test-org-123"
+    """Mock da resolução usuário → organização (get_principal_by_user_id)"""
+    with patch('app.database.get_principal_by_user_id', new_callable=AsyncMock) as mock, \
+         patch('app.api.deps.get_cached_principal', new_callable=AsyncMock, return_value=None):
+        mock.return_value = {"organization_id": "test-org-123", "plan": "free"}
         yield mock
 
 
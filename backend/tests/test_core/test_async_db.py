@@ -0,0 +1,58 @@
+"""
+Testes do cliente PostgREST assíncrono com pool (app/database.py)
+"""
+import httpx
+from unittest.mock import patch
+from app import database
+from app.config import settings
+
+
+class TestAsyncSupabaseClient:
+    """Testes do cliente assíncrono compartilhado"""
+
+    async def test_client_is_shared_and_pooled(self):
+        client = database.get_async_supabase()
+        try:
+            assert database.get_async_supabase() is client
+            assert isinstance(client.session, httpx.AsyncClient)
+            assert str(client.session.base_url).endswith("/rest/v1/")
+            pool = client.session._transport._pool
+            assert pool._max_connections == settings.db_pool_max_connections
+            assert pool._max_keepalive_connections == settings.db_pool_max_keepalive
+        finally:
+            await database.close_async_supabase()
+
+    async def test_fluent_api_builds_requests(self):
+        client = database.get_async_supabase()
+        try:
+            query = client.table("videos").select("id").eq("id", "abc")
+            assert "id=eq.abc" in str(query.params)
+        finally:
+            await database.close_async_supabase()
+
+    async def test_pool_stats(self):
+        await database.close_async_supabase()
+        stats = database.get_db_pool_stats()
+        assert stats["initialized"] is False
+        assert stats["max_connections"] == settings.db_pool_max_connections
+
+        database.get_async_supabase()
+        try:
+            stats = database.get_db_pool_stats()
+            assert stats["initialized"] is True
+            assert stats["open_connections"] == 0
+            assert stats["utilization"] == 0.0
+        finally:
+            await database.close_async_supabase()
+
+    async def test_pool_stats_without_httpx_internals(self):
+        client = database.get_async_supabase()
+        try:
+            # Internos privados do httpx ausentes: só os limites configurados
+            with patch.object(client.session, "_transport", object()):
+                stats = database.get_db_pool_stats()
+            assert stats["introspected"] is False
+            assert stats["max_connections"] == settings.db_pool_max_connections
+            assert stats["active_connections"] == 0
+        finally:
+            await database.close_async_supabase()
@@ -1,11 +1,22 @@
 """
 Testes do sistema de cache
 """
+import asyncio
 import pytest
+import socket
+import threading
 import time
+import json
+import redis
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core import cache as cache_module
 from app.core.cache import (
     CacheManager,
+    AsyncCacheManager,
+    LocalCache,
+    resolve_tags,
     cached,
+    cached_batch,
     invalidate_cache,
     cache_user_data,
     get_cached_user_data,
@@ -127,6 +138,253 @@ class TestCacheManager:
         assert cache_disabled.increment("any_key") is None
 
 
+class TestAsyncCacheManager:
+    """Testes do gerenciador de cache assíncrono"""
+    
+    def setup_method(self):
+        """Setup antes de cada teste"""
+        self.cache = AsyncCacheManager()
+    
+    async def test_set_get_roundtrip(self):
+        """Testa salvar e buscar com cliente assíncrono mockado"""
+        store = {}
+        
+        async def fake_setex(key, ttl, value):
+            store[key] = value
+        
+        async def fake_get(key):
+            return store.get(key)
+        
+        self.cache.redis_client.setex = fake_setex
+        self.cache.redis_client.get = fake_get
+        
+        assert await self.cache.set("test:async", {"data": "value"}, ttl=60) is True
+        assert await self.cache.get("test:async") == {"data": "value"}
+    
+    async def test_mget_returns_none_for_missing(self):
+        """Testa mget preservando a ordem das chaves"""
+        self.cache.redis_client.mget = AsyncMock(return_value=['{"a": 1}', None])
+        assert await self.cache.mget(["test:a", "test:b"]) == [{"a": 1}, None]
+    
+    async def test_connection_error_suspends_cache(self):
+        """Testa que erro de conexão desativa o cache temporariamente"""
+        self.cache.redis_client.get = AsyncMock(side_effect=redis.ConnectionError("down"))
+        
+        assert await self.cache.get("test:key") is None
+        assert self.cache.available is False
+        
+        # Durante o backoff nenhuma chamada ao Redis é feita
+        assert await self.cache.get("test:key") is None
+        assert self.cache.redis_client.get.await_count == 1
+    
+    def test_loop_change_closes_previous_pool(self):
+        """Testa que a troca de event loop fecha as conexões do pool anterior"""
+        server = socket.create_server(("127.0.0.1", 0))
+        closed = threading.Event()
+        
+        def serve():
+            # Redis falso: responde +OK a cada comando até o cliente fechar
+            conn, _ = server.accept()
+            with conn:
+                while data := conn.recv(65536):
+                    conn.sendall(b"+OK\r\n" * max(data.count(b"*"), 1))
+            closed.set()
+        
+        threading.Thread(target=serve, daemon=True).start()
+        with patch.multiple(
+            "app.core.cache.settings",
+            redis_host="127.0.0.1", redis_port=server.getsockname()[1], redis_password=None, redis_db=0
+        ):
+            manager = AsyncCacheManager()
+        
+        async def ping():
+            assert manager.available
+            await manager.redis_client.ping()
+        
+        async def check():
+            assert manager.available
+        
+        try:
+            asyncio.run(ping())
+            asyncio.run(check())
+            assert closed.wait(2)
+        finally:
+            server.close()
+    
+    async def test_disabled_returns_defaults(self):
+        """Testa valores padrão com cache assíncrono desabilitado"""
+        self.cache.enabled = False
+        assert await self.cache.get("any_key") is None
+        assert await self.cache.mget(["a", "b"]) == [None, None]
+        assert await self.cache.set("any_key", "value") is False
+        assert await self.cache.delete("any_key") == 0
+        assert await self.cache.exists("any_key") is False
+
+
+class TestLocalCache:
+    """Testes do LRU em memória (tier L1)"""
+    
+    def test_lru_evicts_least_recently_used(self):
+        l1 = LocalCache(max_entries=2)
+        l1.set("user:1", "1", ttl=60)
+        l1.set("user:2", "2", ttl=60)
+        assert l1.get("user:1") == "1"
+        l1.set("user:3", "3", ttl=60)
+        
+        assert l1.get("user:2") is None
+        assert l1.get("user:1") == "1"
+        assert l1.evictions == 1
+    
+    def test_ttl_capped_by_max_ttl(self):
+        l1 = LocalCache(max_ttl=0.05)
+        l1.set("org:1", "x", ttl=600)
+        assert l1.get("org:1") == "x"
+        time.sleep(0.06)
+        assert l1.get("org:1") is None
+    
+    def test_stale_generation_is_not_stored(self):
+        l1 = LocalCache()
+        generation = l1.generation
+        l1.delete_pattern("org:1:*")
+        assert l1.set("org:1:principal", "old", ttl=60, generation=generation) is False
+        assert l1.get("org:1:principal") is None
+    
+    def test_delete_pattern_and_stats(self):
+        l1 = LocalCache()
+        l1.set("org:1:principal", "a", ttl=60)
+        l1.set("org:2:principal", "b", ttl=60)
+        assert l1.delete_pattern("org:1:*") == 1
+        assert l1.get("org:1:principal") is None
+        assert l1.get("org:2:principal") == "b"
+        
+        stats = l1.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+
+async def async_iter(items):
+    for item in items:
+        yield item
+
+
+def build_pipeline_mock(results):
+    """Mock de pipeline do redis.asyncio: comandos enfileirados, execute() aguardável"""
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=results)
+    return pipe
+
+
+class TestTwoTierCache:
+    """Testes do L1 em memória na frente do Redis"""
+    
+    def setup_method(self):
+        self.cache = AsyncCacheManager(l1=LocalCache(max_ttl=30))
+        self.cache._listening = True
+    
+    async def test_l2_hit_populates_l1(self):
+        pipe = build_pipeline_mock(['{"plan": "pro"}', 10000])
+        self.cache.redis_client.pipeline = MagicMock(return_value=pipe)
+        
+        assert await self.cache.get("org:1:principal") == {"plan": "pro"}
+        assert await self.cache.get("org:1:principal") == {"plan": "pro"}
+        
+        pipe.execute.assert_awaited_once()
+        stats = self.cache.get_stats()
+        assert stats["l1"]["hits"] == 1
+        assert stats["l2"]["hits"] == 1
+    
+    async def test_l1_ttl_not_longer_than_l2(self):
+        self.cache.redis_client.pipeline = MagicMock(return_value=build_pipeline_mock(['"org-1"', 50]))
+        await self.cache.get("user:1:org")
+        time.sleep(0.06)
+        
+        self.cache.redis_client.pipeline = MagicMock(return_value=build_pipeline_mock([None, -2]))
+        assert await self.cache.get("user:1:org") is None
+    
+    async def test_l1_bypassed_without_invalidation_channel(self):
+        self.cache._listening = False
+        self.cache.l1.set("user:1:org", '"org-1"', ttl=60)
+        self.cache.redis_client.get = AsyncMock(return_value='"org-2"')
+        
+        assert await self.cache.get("user:1:org") == "org-2"
+    
+    async def test_set_publishes_invalidation(self):
+        pipe = build_pipeline_mock([True, 1])
+        self.cache.redis_client.pipeline = MagicMock(return_value=pipe)
+        
+        assert await self.cache.set("org:1:principal", {"plan": "pro"}, ttl=60) is True
+        
+        channel, message = pipe.publish.call_args.args
+        assert json.loads(message)["keys"] == ["org:1:principal"]
+        # Próxima leitura vem do L1, sem round trip
+        self.cache.redis_client.pipeline.reset_mock()
+        assert await self.cache.get("org:1:principal") == {"plan": "pro"}
+        self.cache.redis_client.pipeline.assert_not_called()
+    
+    async def test_delete_pattern_evicts_local_l1(self):
+        self.cache.l1.set("org:1:principal", "{}", ttl=60)
+        self.cache.redis_client.scan_iter = lambda **kwargs: async_iter(["org:1:principal"])
+        self.cache.redis_client.pipeline = MagicMock(return_value=build_pipeline_mock([1]))
+        self.cache.redis_client.publish = AsyncMock()
+        
+        assert await self.cache.delete_pattern("org:1:*") == 1
+        assert self.cache.l1.get("org:1:principal") is None
+        self.cache.redis_client.publish.assert_awaited_once()
+    
+    def test_remote_invalidation_evicts_l1(self):
+        self.cache.l1.set("org:1:principal", "{}", ttl=60)
+        self.cache.l1.set("user:1:org", '"1"', ttl=60)
+        
+        self.cache.apply_invalidation(json.dumps({"origin": "other", "pattern": "org:1:*"}))
+        self.cache.apply_invalidation(json.dumps({"origin": "other", "keys": ["user:1:org"]}))
+        
+        assert self.cache.l1.get_stats()["entries"] == 0
+    
+    def test_own_invalidation_is_ignored(self):
+        self.cache.l1.set("user:1:org", '"1"', ttl=60)
+        self.cache.apply_invalidation(json.dumps({"origin": self.cache.instance_id, "keys": ["user:1:org"]}))
+        assert self.cache.l1.get("user:1:org") == '"1"'
+
+
+class TestTagInvalidation:
+    """Testes da invalidação por tags"""
+    
+    def test_implicit_namespace_tags(self):
+        assert resolve_tags("org:1:principal") == ["org:1"]
+        assert resolve_tags("user:123") == ["user:123"]
+        assert resolve_tags("analytics:1:7d") == []
+        assert resolve_tags("analytics:1:7d", ["org:1"]) == ["org:1"]
+        assert resolve_tags("user:1:org", ["org:2"]) == ["org:2", "user:1"]
+    
+    async def test_set_registers_key_in_tag_sets(self):
+        cache = AsyncCacheManager()
+        pipe = build_pipeline_mock([True, 1, True])
+        cache.redis_client.pipeline = MagicMock(return_value=pipe)
+        
+        assert await cache.set("org:1:videos", [], ttl=60) is True
+        pipe.sadd.assert_called_once_with("tag:org:1", "org:1:videos")
+    
+    async def test_invalidate_tags_deletes_only_members(self):
+        cache = AsyncCacheManager()
+        members = build_pipeline_mock([{"org:1:videos", "org:1:principal"}, {"org:1:videos"}, 2])
+        deletes = build_pipeline_mock([2])
+        cache.redis_client.pipeline = MagicMock(side_effect=[members, deletes])
+        cache.redis_client.keys = AsyncMock()
+        cache.redis_client.scan_iter = MagicMock()
+        
+        assert await cache.invalidate_tags("org:1", "user:1") == 2
+        deletes.delete.assert_called_once_with("org:1:principal", "org:1:videos")
+        members.delete.assert_called_once_with("tag:org:1", "tag:user:1")
+        cache.redis_client.keys.assert_not_called()
+        cache.redis_client.scan_iter.assert_not_called()
+    
+    async def test_invalidate_empty_tag(self):
+        cache = AsyncCacheManager()
+        cache.redis_client.pipeline = MagicMock(return_value=build_pipeline_mock([set(), 0]))
+        assert await cache.invalidate_tags("org:404") == 0
+
+
 class TestCachedDecorator:
     """Testes do decorator @cached"""
     
@@ -183,6 +441,23 @@ class TestCachedDecorator:
         assert result2 == 15
         assert self.call_count == 1  # Não incrementou
     
+    @pytest.mark.asyncio
+    async def test_cached_decorator_async_uses_async_backend(self):
+        """Testa que o decorator assíncrono aguarda o backend assíncrono"""
+        with patch("app.core.cache.async_cache") as mock_async_cache:
+            mock_async_cache.get = AsyncMock(return_value=None)
+            mock_async_cache.set = AsyncMock(return_value=True)
+            mock_async_cache.acquire_lock = AsyncMock(return_value="token")
+            mock_async_cache.release_lock = AsyncMock()
+            
+            @cached(ttl=60, key_prefix="test")
+            async def async_function(x: int) -> int:
+                return x * 4
+            
+            assert await async_function(2) == 8
+            mock_async_cache.get.assert_awaited_once()
+            mock_async_cache.set.assert_awaited_once_with("test:async_function:2:", 8, 60, tags=None)
+    
     def test_cached_with_custom_key_builder(self):
         """Testa decorator com key builder customizado"""
         if not self.cache.enabled:
@@ -207,6 +482,250 @@ class TestCachedDecorator:
         assert self.call_count == 1
 
 
+class FakeCacheBackend:
+    """Backend em memória com a interface de cache/async_cache usada pelo @cached"""
+    
+    def __init__(self):
+        self.store = {}
+        self.locks = set()
+        self.get_many_calls = 0
+        self.set_many_calls = 0
+    
+    def _set(self, key, value, ttl=300, tags=None):
+        self.store[key] = value
+        return True
+    
+    def _acquire(self, name, timeout):
+        if name in self.locks:
+            return None
+        self.locks.add(name)
+        return "token"
+    
+    def _release(self, name, token):
+        self.locks.discard(name)
+    
+    def _get_many(self, keys):
+        self.get_many_calls += 1
+        return {key: self.store[key] for key in keys if key in self.store}
+    
+    def _set_many(self, mapping, ttl=300, tags=None):
+        self.set_many_calls += 1
+        self.store.update(mapping)
+        return True
+
+
+class FakeAsyncCache(FakeCacheBackend):
+    async def get(self, key):
+        return self.store.get(key)
+    
+    async def set(self, key, value, ttl=300, tags=None):
+        return self._set(key, value, ttl, tags)
+    
+    async def acquire_lock(self, name, timeout):
+        return self._acquire(name, timeout)
+    
+    async def release_lock(self, name, token):
+        self._release(name, token)
+    
+    async def get_many(self, keys):
+        return self._get_many(keys)
+    
+    async def set_many(self, mapping, ttl=300, tags=None):
+        return self._set_many(mapping, ttl, tags)
+
+
+class FakeSyncCache(FakeCacheBackend):
+    def get(self, key):
+        return self.store.get(key)
+    
+    def set(self, key, value, ttl=300, tags=None):
+        return self._set(key, value, ttl, tags)
+    
+    def acquire_lock(self, name, timeout):
+        return self._acquire(name, timeout)
+    
+    def release_lock(self, name, token):
+        self._release(name, token)
+    
+    def get_many(self, keys):
+        return self._get_many(keys)
+    
+    def set_many(self, mapping, ttl=300, tags=None):
+        return self._set_many(mapping, ttl, tags)
+
+
+def stale_entry(value, expires_in=-1.0, delta=0.5):
+    return {"__cached__": 1, "value": value, "expires_at": time.time() + expires_in, "delta": delta}
+
+
+class TestCachedStampede:
+    """Testes de single-flight, refresh antecipado e stale-while-revalidate"""
+    
+    def setup_method(self):
+        self.backend = FakeAsyncCache()
+        self.calls = 0
+    
+    def make_function(self, fail=False, delay=0.05, **options):
+        @cached(ttl=60, key_prefix="test", **options)
+        async def expensive(x: int) -> int:
+            self.calls += 1
+            await asyncio.sleep(delay)
+            if fail:
+                raise RuntimeError("upstream down")
+            return x * 10
+        return expensive
+    
+    async def test_concurrent_misses_execute_once(self):
+        expensive = self.make_function()
+        with patch("app.core.cache.async_cache", self.backend):
+            results = await asyncio.gather(*[expensive(1) for _ in range(10)])
+        assert results == [10] * 10
+        assert self.calls == 1
+        assert self.backend.locks == set()
+    
+    async def test_waits_for_value_when_other_worker_holds_lock(self):
+        expensive = self.make_function()
+        self.backend.locks.add("test:expensive:1:")
+        
+        async def other_worker():
+            await asyncio.sleep(0.1)
+            self.backend.store["test:expensive:1:"] = 42
+        
+        with patch("app.core.cache.async_cache", self.backend):
+            result, _ = await asyncio.gather(expensive(1), other_worker())
+        assert result == 42
+        assert self.calls == 0
+    
+    async def test_stale_value_served_while_refreshing_once(self):
+        expensive = self.make_function(stale_ttl=300)
+        self.backend.store["test:expensive:1:"] = stale_entry(7)
+        
+        with patch("app.core.cache.async_cache", self.backend):
+            results = await asyncio.gather(*[expensive(1) for _ in range(5)])
+            assert results == [7] * 5
+            await asyncio.sleep(0.1)
+        
+        assert self.calls == 1
+        assert self.backend.store["test:expensive:1:"]["value"] == 10
+        assert self.backend.store["test:expensive:1:"]["expires_at"] > time.time()
+    
+    async def test_stale_value_kept_when_refresh_raises(self):
+        expensive = self.make_function(fail=True, stale_ttl=300)
+        self.backend.store["test:expensive:1:"] = stale_entry(7)
+        
+        with patch("app.core.cache.async_cache", self.backend):
+            assert await expensive(1) == 7
+            await asyncio.sleep(0.1)
+            assert await expensive(1) == 7
+        assert self.backend.store["test:expensive:1:"]["value"] == 7
+        assert self.backend.locks == set()
+    
+    async def test_probabilistic_early_refresh(self):
+        expensive = self.make_function(early_refresh=1.0)
+        self.backend.store["test:expensive:1:"] = stale_entry(7, expires_in=5, delta=1.0)
+        
+        with patch("app.core.cache.async_cache", self.backend):
+            with patch("app.core.cache.random.random", return_value=0.0):
+                assert await expensive(1) == 7
+                await asyncio.sleep(0.1)
+            assert self.calls == 0
+            
+            with patch("app.core.cache.random.random", return_value=0.999999):
+                assert await expensive(1) == 7
+                await asyncio.sleep(0.1)
+        assert self.calls == 1
+        assert self.backend.store["test:expensive:1:"]["value"] == 10
+    
+    def test_sync_stale_fallback_when_refresh_raises(self):
+        backend = FakeSyncCache()
+        backend.store["test:fetch:1:"] = stale_entry("old")
+        
+        @cached(ttl=60, key_prefix="test", stale_ttl=300)
+        def fetch(x: int) -> str:
+            raise RuntimeError("upstream down")
+        
+        with patch("app.core.cache.cache", backend):
+            assert fetch(1) == "old"
+        assert backend.locks == set()
+    
+    def test_sync_thread_locks_do_not_accumulate(self):
+        backend = FakeSyncCache()
+        
+        @cached(ttl=60, key_prefix="test")
+        def fetch(x: int) -> int:
+            return x * 10
+        
+        with patch("app.core.cache.cache", backend):
+            assert [fetch(i) for i in range(100)] == [i * 10 for i in range(100)]
+        # Locks por chave saem do registro quando nenhuma thread os usa
+        assert cache_module._thread_locks == {}
+
+
+class TestBatchOperations:
+    """Testes de get_many/set_many/delete_many e do @cached_batch"""
+    
+    async def test_get_many_single_mget(self):
+        cache = AsyncCacheManager()
+        cache.redis_client.mget = AsyncMock(return_value=[b'{"a": 1}', None, b'"x"'])
+        
+        assert await cache.get_many(["test:a", "test:b", "test:c"]) == {"test:a": {"a": 1}, "test:c": "x"}
+        cache.redis_client.mget.assert_awaited_once_with(["test:a", "test:b", "test:c"])
+    
+    async def test_set_many_single_pipeline(self):
+        cache = AsyncCacheManager()
+        pipe = build_pipeline_mock([])
+        cache.redis_client.pipeline = MagicMock(return_value=pipe)
+        
+        assert await cache.set_many({"test:a": 1, "org:1:x": 2}, ttl=60, tags={"test:a": ["org:1"]}) is True
+        assert pipe.setex.call_count == 2
+        assert {c.args for c in pipe.sadd.call_args_list} == {("tag:org:1", "test:a"), ("tag:org:1", "org:1:x")}
+        pipe.execute.assert_awaited_once()
+    
+    def test_sync_set_many_and_delete_many(self):
+        cache = CacheManager()
+        cache.enabled = True
+        cache.redis_client = MagicMock()
+        pipe = cache.redis_client.pipeline.return_value
+        pipe.execute.return_value = [2]
+        
+        assert cache.set_many({"test:a": 1, "test:b": 2}, ttl=60) is True
+        assert pipe.setex.call_count == 2
+        assert cache.delete_many(["test:a", "test:b", "test:a"]) == 2
+        pipe.delete.assert_called_with("test:a", "test:b")
+    
+    async def test_cached_batch_fetches_only_misses(self):
+        backend = FakeAsyncCache()
+        backend.store["org:get_orgs:1::"] = {"name": "cached"}
+        calls = []
+        
+        @cached_batch(ttl=60, key_prefix="org")
+        async def get_orgs(org_ids):
+            calls.append(list(org_ids))
+            return {org_id: {"name": f"org {org_id}"} for org_id in org_ids if org_id != "404"}
+        
+        with patch("app.core.cache.async_cache", backend):
+            result = await get_orgs(["1", "2", "404", "2"])
+            assert result == {"1": {"name": "cached"}, "2": {"name": "org 2"}}
+            assert calls == [["2", "404"]]
+            
+            # Segunda chamada: tudo do cache, sem chamar a função
+            assert await get_orgs(["1", "2"]) == {"1": {"name": "cached"}, "2": {"name": "org 2"}}
+        assert calls == [["2", "404"]]
+        assert backend.get_many_calls == 2
+        assert backend.set_many_calls == 1
+    
+    def test_cached_batch_sync_with_key_builder(self):
+        backend = FakeSyncCache()
+        
+        @cached_batch(ttl=60, key_builder=lambda platform, org_id: f"desc:{org_id}:{platform}")
+        def descriptions(platforms, org_id):
+            return {p: f"{p} text" for p in platforms}
+        
+        with patch("app.core.cache.cache", backend):
+            assert descriptions(["instagram", "tiktok"], "o1") == {"instagram": "instagram text", "tiktok": "tiktok text"}
+        assert set(backend.store) == {"desc:o1:instagram", "desc:o1:tiktok"}
+
+
 class TestCacheHelpers:
     """Testes das funções helper de cache"""
     
@@ -0,0 +1,85 @@
+"""
+Testes do codec versionado do cache (app/core/cache_codec.py)
+"""
+import json
+import pytest
+from datetime import datetime
+from app.core.cache_codec import CacheCodec, CacheCodecError, HEADER_MARK
+from app.core import cache_codec as codec_module
+
+
+LARGE_VALUE = {"evolution": [{"date": f"2024-01-{d:02d}", "reach": d * 100} for d in range(1, 29)] * 5}
+
+
+class TestCacheCodec:
+    """Testes de serialização, compressão e compatibilidade"""
+
+    @pytest.mark.parametrize("format", ["json", "msgpack"])
+    @pytest.mark.parametrize("compression", ["none", "zstd", "lz4"])
+    def test_roundtrip(self, format, compression):
+        if format == "msgpack" and codec_module.msgpack is None:
+            pytest.skip("msgpack não instalado")
+        if compression == "zstd" and codec_module.zstandard is None:
+            pytest.skip("zstandard não instalado")
+        if compression == "lz4" and codec_module.lz4_frame is None:
+            pytest.skip("lz4 não instalado")
+        codec = CacheCodec(format=format, compression=compression, compression_threshold=64)
+        for value in (LARGE_VALUE, "org-1", 5, None, [1, "a"], {"small": True}):
+            assert codec.decode(codec.encode(value)) == value
+
+    def test_header_byte(self):
+        data = CacheCodec(compression="none").encode({"a": 1})
+        assert data[0] & 0xC0 == HEADER_MARK
+        assert data[1:] == b'{"a":1}'
+
+    def test_compression_only_above_threshold(self):
+        if codec_module.zstandard is None:
+            pytest.skip("zstandard não instalado")
+        codec = CacheCodec(compression="zstd", compression_threshold=1024)
+        small = codec.encode({"a": 1})
+        large = codec.encode(LARGE_VALUE)
+        assert small[0] & 0x0F == 0
+        assert large[0] & 0x0F != 0
+        assert len(large) < len(json.dumps(LARGE_VALUE))
+
+    def test_reads_legacy_json_values(self):
+        codec = CacheCodec()
+        assert codec.decode('{"plan": "pro"}') == {"plan": "pro"}
+        assert codec.decode(b'"org-1"') == "org-1"
+        assert codec.decode(b"5") == 5
+
+    def test_reads_values_written_with_other_settings(self):
+        if codec_module.zstandard is None:
+            pytest.skip("zstandard não instalado")
+        old = CacheCodec(compression="zstd", compression_threshold=0).encode(LARGE_VALUE)
+        assert CacheCodec(compression="none").decode(old) == LARGE_VALUE
+
+    def test_unavailable_compression_raises(self, monkeypatch):
+        if codec_module.zstandard is None:
+            pytest.skip("zstandard não instalado")
+        data = CacheCodec(compression="zstd", compression_threshold=0).encode(LARGE_VALUE)
+        monkeypatch.setattr(codec_module, "zstandard", None)
+        with pytest.raises(CacheCodecError):
+            CacheCodec(compression="none").decode(data)
+
+    def test_datetime_serialized_as_isoformat(self):
+        value = CacheCodec().decode(CacheCodec().encode({"at": datetime(2024, 1, 2, 3, 4, 5)}))
+        assert value == {"at": "2024-01-02T03:04:05"}
+
+    def test_stats_per_key_prefix(self):
+        codec = CacheCodec(compression="none")
+        data = codec.encode(LARGE_VALUE, "analytics:1:30d")
+        codec.decode(data, "analytics:1:30d")
+        codec.encode("org-1", "user:1:org")
+
+        stats = codec.get_stats()
+        assert set(stats) == {"analytics", "user"}
+        assert stats["analytics"]["encodes"] == 1
+        assert stats["analytics"]["decodes"] == 1
+        assert stats["analytics"]["avg_stored_bytes"] == len(data)
+
+    def test_invalid_settings(self):
+        with pytest.raises(ValueError):
+            CacheCodec(format="pickle")
+        with pytest.raises(ValueError):
+            CacheCodec(compression="gzip")
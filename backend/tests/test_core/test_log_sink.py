@@ -0,0 +1,120 @@
+"""
+Testes do writer em lote de api_logs (app/core/log_sink.py)
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.core.log_sink import ApiLogSink, DROP_NEWEST
+
+
+def build_db_mock():
+    """Mock do cliente assíncrono: .table().insert().execute()"""
+    builder = MagicMock()
+    builder.execute = AsyncMock(return_value=MagicMock(data=[]))
+    client = MagicMock()
+    client.table.return_value.insert.return_value = builder
+    return client
+
+
+class TestApiLogSink:
+    """Testes da fila de api_logs"""
+
+    async def test_enqueue_does_not_write_immediately(self):
+        sink = ApiLogSink(batch_size=10, flush_interval=60)
+        db = build_db_mock()
+        with patch("app.database.get_async_supabase", return_value=db):
+            assert sink.enqueue({"module": "1", "endpoint": "/x"}) is True
+            db.table.assert_not_called()
+            await sink.stop()
+        db.table.return_value.insert.assert_called_once()
+        assert sink.written == 1
+
+    async def test_flush_batches_by_size(self):
+        sink = ApiLogSink(batch_size=2, flush_interval=60)
+        db = build_db_mock()
+        with patch("app.database.get_async_supabase", return_value=db):
+            for i in range(5):
+                sink.enqueue({"module": "1", "endpoint": f"/{i}"})
+            await sink.stop()
+        assert db.table.return_value.insert.call_count == 3
+        assert sink.written == 5
+
+    async def test_rows_with_different_columns_are_grouped(self):
+        sink = ApiLogSink(batch_size=10, flush_interval=60)
+        db = build_db_mock()
+        with patch("app.database.get_async_supabase", return_value=db):
+            sink.enqueue({"module": "1", "endpoint": "/a"})
+            sink.enqueue({"org_id": "o", "module": "module2", "endpoint": "/b"})
+            await sink.flush()
+            await sink.stop()
+        assert db.table.return_value.insert.call_count == 2
+
+    async def test_full_batch_wakes_writer(self):
+        sink = ApiLogSink(batch_size=2, flush_interval=60)
+        db = build_db_mock()
+        with patch("app.database.get_async_supabase", return_value=db):
+            sink.enqueue({"endpoint": "/a"})
+            sink.enqueue({"endpoint": "/b"})
+            await asyncio.sleep(0.05)
+            assert sink.written == 2
+            await sink.stop()
+
+    async def test_stop_waits_for_batch_in_flight(self):
+        sink = ApiLogSink(batch_size=2, flush_interval=60)
+        db = build_db_mock()
+        started = asyncio.Event()
+
+        async def slow_execute():
+            started.set()
+            await asyncio.sleep(0.05)
+            return MagicMock(data=[])
+
+        db.table.return_value.insert.return_value.execute = AsyncMock(side_effect=slow_execute)
+        with patch("app.database.get_async_supabase", return_value=db):
+            sink.enqueue({"endpoint": "/a"})
+            sink.enqueue({"endpoint": "/b"})
+            await started.wait()
+            sink.enqueue({"endpoint": "/c"})
+            await sink.stop()
+        # Lote em gravação não é cancelado e o restante é gravado no stop
+        assert sink.written == 3
+        assert sink.get_stats()["queue_size"] == 0
+
+    async def test_cancelled_batch_is_requeued(self):
+        sink = ApiLogSink(batch_size=10, flush_interval=60)
+        db = build_db_mock()
+        db.table.return_value.insert.return_value.execute = AsyncMock(side_effect=asyncio.CancelledError)
+        with patch("app.database.get_async_supabase", return_value=db):
+            sink.enqueue({"endpoint": "/a"})
+            sink.enqueue({"endpoint": "/b"})
+            with pytest.raises(asyncio.CancelledError):
+                await sink.flush()
+        assert [r["endpoint"] for r in sink._queue] == ["/a", "/b"]
+
+    def test_drop_oldest_when_full(self):
+        sink = ApiLogSink(max_queue_size=2)
+        for i in range(3):
+            assert sink.enqueue({"endpoint": f"/{i}"}) is True
+        assert [r["endpoint"] for r in sink._queue] == ["/1", "/2"]
+        assert sink.dropped == 1
+
+    def test_drop_newest_when_full(self):
+        sink = ApiLogSink(max_queue_size=2, drop_policy=DROP_NEWEST)
+        sink.enqueue({"endpoint": "/0"})
+        sink.enqueue({"endpoint": "/1"})
+        assert sink.enqueue({"endpoint": "/2"}) is False
+        assert [r["endpoint"] for r in sink._queue] == ["/0", "/1"]
+
+    async def test_write_failure_is_counted_not_raised(self):
+        sink = ApiLogSink(flush_interval=60)
+        db = build_db_mock()
+        db.table.return_value.insert.return_value.execute = AsyncMock(side_effect=Exception("db down"))
+        with patch("app.database.get_async_supabase", return_value=db):
+            sink.enqueue({"endpoint": "/a"})
+            await sink.stop()
+        assert sink.failed == 1
+        assert sink.get_stats()["queue_size"] == 0
+
+    def test_invalid_drop_policy(self):
+        with pytest.raises(ValueError):
+            ApiLogSink(drop_policy="block")
@@ -0,0 +1,86 @@
+"""
+Testes da verificação local de JWT (app/core/token_verifier.py)
+"""
+import time
+import pytest
+from jose import jwt
+from app.core.token_verifier import (
+    TokenVerifier,
+    TokenVerificationError,
+    LocalVerificationUnavailable,
+)
+
+SUPABASE_URL = "https://example.supabase.co"
+SECRET = "test-jwt-secret"
+
+
+def make_token(secret: str = SECRET, **overrides) -> str:
+    claims = {
+        "sub": "user-123",
+        "email": "test@example.com",
+        "role": "authenticated",
+        "aud": "authenticated",
+        "iss": f"{SUPABASE_URL}/auth/v1",
+        "exp": int(time.time()) + 3600,
+        "session_id": "session-1",
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+class TestTokenVerifier:
+    """Testes do verificador com HS256"""
+
+    def setup_method(self):
+        self.verifier = TokenVerifier(SUPABASE_URL, jwt_secret=SECRET, cache_size=2)
+
+    async def test_verify_valid_token(self):
+        user = await self.verifier.verify(make_token())
+        assert user.id == "user-123"
+        assert user.email == "test@example.com"
+        assert user.session_id == "session-1"
+
+    async def test_verify_expired_token(self):
+        with pytest.raises(TokenVerificationError):
+            await self.verifier.verify(make_token(exp=int(time.time()) - 10))
+
+    async def test_verify_wrong_audience(self):
+        with pytest.raises(TokenVerificationError):
+            await self.verifier.verify(make_token(aud="anon"))
+
+    async def test_verify_wrong_issuer(self):
+        with pytest.raises(TokenVerificationError):
+            await self.verifier.verify(make_token(iss="https://evil.example.com/auth/v1"))
+
+    async def test_verify_wrong_signature(self):
+        with pytest.raises(TokenVerificationError):
+            await self.verifier.verify(make_token(secret="other-secret"))
+
+    async def test_verify_malformed_token(self):
+        with pytest.raises(TokenVerificationError):
+            await self.verifier.verify("not-a-jwt")
+
+    async def test_hs256_without_secret_is_unavailable(self):
+        verifier = TokenVerifier(SUPABASE_URL, jwt_secret=None)
+        with pytest.raises(LocalVerificationUnavailable):
+            await verifier.verify(make_token())
+
+    async def test_verified_tokens_are_cached(self):
+        token = make_token()
+        first = await self.verifier.verify(token)
+        # Sem secret, só o cache pode responder
+        self.verifier.jwt_secret = None
+        second = await self.verifier.verify(token)
+        assert second is first
+
+    async def test_cache_is_bounded(self):
+        tokens = [make_token(sub=f"user-{i}") for i in range(3)]
+        for token in tokens:
+            await self.verifier.verify(token)
+        assert len(self.verifier._tokens) == 2
+
+    async def test_forget_removes_cached_token(self):
+        token = make_token()
+        await self.verifier.verify(token)
+        self.verifier.forget(token)
+        assert len(self.verifier._tokens) == 0
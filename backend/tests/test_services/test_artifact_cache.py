@@ -0,0 +1,166 @@
+"""
+Testes do cache de artefatos intermediários (app/services/artifact_cache.py)
+"""
+import asyncio
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+import pytest
+from app.services.artifact_cache import ArtifactCache, artifact_key, file_identity
+from app.services.job_workspace import WorkspaceManager
+from app.services.video_processing import VideoProcessingService
+
+
+def builder(calls, content=b"cut", delay=0.0):
+    """Builder falso: registra a chamada e escreve o artefato"""
+    async def build(path):
+        calls.append(path)
+        await asyncio.sleep(delay)
+        path.write_bytes(content)
+    return build
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(root=str(tmp_path / "artifacts"), max_bytes=1024)
+
+
+class TestArtifactKey:
+    """Testes das chaves endereçadas por conteúdo"""
+
+    def test_key_depends_on_input_and_params(self, tmp_path):
+        source = tmp_path / "abc.mp4"
+        source.write_bytes(b"video")
+        key = artifact_key("cut", file_identity(str(source)), {"keep": [[0, 2]]})
+        assert key == artifact_key("cut", file_identity(str(source)), {"keep": [[0, 2]]})
+        assert key != artifact_key("cut", file_identity(str(source)), {"keep": [[0, 3]]})
+        source.write_bytes(b"other video")
+        assert key != artifact_key("cut", file_identity(str(source)), {"keep": [[0, 2]]})
+
+
+class TestArtifactCache:
+    """Testes de hit/miss, single-flight e cota"""
+
+    async def test_hit_after_build(self, cache):
+        calls = []
+        first = await cache.get_or_build("k1", builder(calls))
+        second = await cache.get_or_build("k1", builder(calls))
+
+        assert first == second and first.read_bytes() == b"cut"
+        assert len(calls) == 1
+        # Escrito em arquivo temporário (.tmp.mp4) e publicado atomicamente
+        assert calls[0].name == "k1.tmp.mp4"
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    async def test_concurrent_requests_share_one_build(self, cache):
+        calls = []
+        await asyncio.gather(*[cache.get_or_build("k1", builder(calls, delay=0.05)) for _ in range(3)])
+        assert len(calls) == 1
+
+    async def test_failed_build_leaves_nothing(self, cache):
+        async def failing(path):
+            path.write_bytes(b"partial")
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_build("k1", failing)
+        assert list(cache.root.iterdir()) == []
+        assert cache.get_stats()["failed"] == 1
+
+    async def test_lru_eviction_skips_leased(self, tmp_path):
+        cache = ArtifactCache(root=str(tmp_path / "artifacts"), max_bytes=25)
+        calls = []
+        async with cache.open("k1", builder(calls, b"x" * 10)):
+            await cache.get_or_build("k2", builder(calls, b"x" * 10))
+            await cache.get_or_build("k3", builder(calls, b"x" * 10))
+        assert cache.path("k1").exists()
+        assert not cache.path("k2").exists()
+        assert cache.path("k3").exists()
+        assert cache.get_stats()["evictions"] == 1
+        # Tamanho atual do store (k1 + k3), não o total já gravado
+        assert cache.get_stats()["bytes_stored"] == 20
+
+    def test_zero_quota_disables(self, tmp_path):
+        assert not ArtifactCache(root=str(tmp_path), max_bytes=0).enabled
+
+
+class TestReRender:
+    """Testes da reutilização do corte quando só a legenda muda"""
+
+    async def test_subtitle_change_reuses_cut(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+
+        source = tmp_path / "source.mp4"
+        source.write_bytes(b"video")
+        info = {
+            "duration": 10.0, "size": 5, "video_codec": "h264", "audio_codec": "aac",
+            "width": 1920, "height": 1080, "keyframes": [0.0, 2.0, 4.0, 6.0, 8.0]
+        }
+        silence_removal = {"enabled": True, "silences": [{"start": 2.0, "end": 3.0}]}
+        segments = [{"start": 3.5, "end": 4.0, "text": "olá"}]
+        cache = ArtifactCache(root=str(tmp_path / "artifacts"), max_bytes=1024 ** 2)
+        workspaces = WorkspaceManager(root=str(tmp_path / "jobs"), min_free_bytes=0)
+
+        async def fake_cut(input_path, output_path, *args, **kwargs):
+            Path(output_path).write_bytes(b"cut")
+
+        async def fake_render(input_path, output_path, *args, **kwargs):
+            Path(output_path).write_bytes(b"out")
+
+        with patch.object(service, "get_video_info", AsyncMock(return_value=info)), \
+             patch("app.services.video_processing.workspace_manager", workspaces), \
+             patch("app.services.video_processing.artifact_cache", cache), \
+             patch.object(service, "_create_subtitle_file", side_effect=lambda path, *a: path.write_text("")), \
+             patch("app.services.video_processing.smart_cut", AsyncMock(side_effect=fake_cut)) as mock_cut, \
+             patch.object(service, "render", AsyncMock(side_effect=fake_render)) as mock_render:
+            for color in ("#FFFFFF", "#FFD700"):
+                subtitles = {"enabled": True, "segments": segments, "style": {"textColor": color}}
+                await service.process_video(
+                    str(source), "vid-1",
+                    subtitles=subtitles, trim={"start": 0, "end": 8}, silence_removal=silence_removal
+                )
+
+        # Corte feito uma vez, a partir da fonte
+        mock_cut.assert_awaited_once()
+        assert mock_cut.await_args.args[0] == str(source)
+        assert mock_cut.await_args.args[2] == [(0.0, 2.0), (3.0, 8.0)]
+        # Peças do smart-cut no workspace do job (não em temp_path)
+        work_dir = Path(mock_cut.await_args.kwargs["work_dir"])
+        assert work_dir.parent == workspaces.root
+        assert Path(mock_cut.await_args.kwargs["scratch_dir"]).is_relative_to(work_dir)
+        # Legenda renderizada duas vezes sobre o corte em cache (timeline inteira)
+        assert mock_render.await_count == 2
+        for call in mock_render.await_args_list:
+            assert Path(call.args[0]).parent == cache.root
+            assert call.args[2:4] == ([(0.0, 7.0)], 7.0)
+        assert (cache.get_stats()["hits"], cache.get_stats()["misses"]) == (1, 1)
+
+    async def test_cut_without_smart_cut_is_not_cached(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+
+        source = tmp_path / "source.mp4"
+        source.write_bytes(b"video")
+        # VP9: o corte seria re-encodado (geração extra com perda), então não vai para o cache
+        info = {
+            "duration": 10.0, "size": 5, "video_codec": "vp9", "audio_codec": "aac",
+            "width": 1920, "height": 1080, "keyframes": [0.0, 2.0, 4.0, 6.0, 8.0]
+        }
+        cache = ArtifactCache(root=str(tmp_path / "artifacts"), max_bytes=1024 ** 2)
+        workspaces = WorkspaceManager(root=str(tmp_path / "jobs"), min_free_bytes=0)
+
+        async def fake_render(input_path, output_path, *args, **kwargs):
+            Path(output_path).write_bytes(b"out")
+
+        with patch.object(service, "get_video_info", AsyncMock(return_value=info)), \
+             patch("app.services.video_processing.workspace_manager", workspaces), \
+             patch("app.services.video_processing.artifact_cache", cache), \
+             patch.object(service, "render", AsyncMock(side_effect=fake_render)) as mock_render:
+            await service.process_video(str(source), "vid-1", trim={"start": 1, "end": 8})
+
+        assert mock_render.await_args.args[0] == str(source)
+        assert mock_render.await_args.args[2] == [(1.0, 8.0)]
+        assert (cache.get_stats()["hits"], cache.get_stats()["misses"]) == (0, 0)
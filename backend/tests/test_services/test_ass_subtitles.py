@@ -0,0 +1,129 @@
+"""
+Testes do gerador de legendas ASS (app/services/ass_subtitles.py)
+"""
+import io
+from app.services.ass_subtitles import (
+    ass_color,
+    ass_time,
+    create_ass_file,
+    group_lines,
+    group_sentences,
+    karaoke_text,
+    write_ass,
+)
+
+
+def words(*items):
+    """Palavras (texto, início, fim)"""
+    return [{"text": text, "start": start, "end": end} for text, start, end in items]
+
+
+def dialogues(script):
+    return [line for line in script.splitlines() if line.startswith("Dialogue:")]
+
+
+STYLE = {
+    "preset": "word-by-word",
+    "textColor": "#FFFFFF",
+    "highlightColor": "#FFD700",
+    "backgroundColor": "#000000",
+    "backgroundOpacity": 0.7,
+    "fontFamily": "Montserrat",
+    "fontSize": 32,
+    "position": "top",
+    "marginBottom": 40,
+}
+
+
+class TestFormatting:
+    """Testes de cores e tempos ASS"""
+
+    def test_color_is_bgr_with_alpha(self):
+        assert ass_color("#FFD700") == "&H0000D7FF"
+        assert ass_color("#102030", 0.0) == "&HFF302010"
+        assert ass_color("#000000", 0.7) == "&H4D000000"
+
+    def test_time_centiseconds(self):
+        assert ass_time(0) == "0:00:00.00"
+        assert ass_time(3725.456) == "1:02:05.46"
+
+
+class TestGrouping:
+    """Testes do agrupamento de palavras em linhas e frases"""
+
+    def test_lines_break_on_punctuation_and_pause(self):
+        stream = words(
+            ("Olá,", 0.0, 0.3), ("tudo", 0.4, 0.6), ("bem?", 0.7, 1.0),
+            ("Hoje", 2.0, 2.2), ("vamos", 2.3, 2.5)
+        )
+        lines = [[w["text"] for w in line] for line in group_lines(stream)]
+        assert lines == [["Olá,"], ["tudo", "bem?"], ["Hoje", "vamos"]]
+
+    def test_lines_respect_max_length(self):
+        stream = words(*[(f"palavra{i}", i * 0.3, i * 0.3 + 0.2) for i in range(10)])
+        lines = list(group_lines(stream))
+        assert len(lines) > 1
+        assert all(len(" ".join(w["text"] for w in line)) <= 32 for line in lines)
+        assert sum(len(line) for line in lines) == 10
+
+    def test_sentences_keep_clauses_together(self):
+        stream = words(
+            ("Olá,", 0.0, 0.3), ("tudo", 0.4, 0.6), ("bem?", 0.7, 1.0),
+            ("Hoje", 1.2, 1.4), ("vamos", 1.5, 1.7), ("editar", 3.0, 3.4)
+        )
+        sentences = [[w["text"] for w in s] for s in group_sentences(stream)]
+        assert sentences == [["Olá,", "tudo", "bem?"], ["Hoje", "vamos"], ["editar"]]
+
+    def test_empty_words_and_override_tags_are_cleaned(self):
+        stream = words(("{\\b1}oi", 0.0, 0.2), ("  ", 0.2, 0.3), ("você", 0.3, 0.5))
+        lines = list(group_lines(stream))
+        assert [w["text"] for w in lines[0]] == ["(/b1)oi", "você"]
+
+
+class TestKaraoke:
+    """Testes das tags \\k"""
+
+    def test_durations_cover_gaps_without_drift(self):
+        line = words(("um", 0.004, 0.3), ("dois", 0.333, 0.6), ("três", 0.666, 1.0))
+        assert karaoke_text(line) == "{\\k33}um {\\k34}dois {\\k33}três"
+
+
+class TestScript:
+    """Testes do arquivo ASS gerado"""
+
+    def test_style_block_replaces_force_style(self):
+        out = io.StringIO()
+        write_ass(out, words(("oi", 0.0, 0.5)), STYLE)
+        script = out.getvalue()
+        assert "[V4+ Styles]" in script
+        style_line = next(line for line in script.splitlines() if line.startswith("Style:"))
+        # Destaque = PrimaryColour, texto = SecondaryColour, topo = alinhamento 8
+        assert style_line.startswith("Style: Default,Montserrat,32,&H0000D7FF,&H00FFFFFF,&H4D000000,&H4D000000")
+        assert style_line.endswith(",8,10,10,40,1")
+
+    def test_word_by_word_is_one_event_per_line(self):
+        stream = words(
+            ("Olá,", 0.0, 0.3), ("tudo", 0.4, 0.6), ("bem?", 0.7, 1.0), ("Sim.", 1.1, 1.5)
+        )
+        out = io.StringIO()
+        assert write_ass(out, stream, STYLE) == 3
+        events = dialogues(out.getvalue())
+        assert events[1] == "Dialogue: 0,0:00:00.40,0:00:01.00,Default,,0,0,0,,{\\k30}tudo {\\k30}bem?"
+
+    def test_sentence_preset(self):
+        stream = words(("Olá,", 0.0, 0.3), ("tudo", 0.4, 0.6), ("bem?", 0.7, 1.0), ("Sim.", 1.1, 1.5))
+        out = io.StringIO()
+        write_ass(out, stream, {**STYLE, "preset": "sentence"})
+        events = dialogues(out.getvalue())
+        assert events == [
+            "Dialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,Olá, tudo bem?",
+            "Dialogue: 0,0:00:01.10,0:00:01.50,Default,,0,0,0,,Sim.",
+        ]
+
+    def test_full_preset_and_generator_input(self, tmp_path):
+        stream = (w for w in words(("a", 0.0, 0.5), ("b.", 0.6, 1.0), ("c", 5.0, 5.5)))
+        path = tmp_path / "subs.ass"
+        assert create_ass_file(path, stream, {**STYLE, "preset": "full"}) == 1
+        assert dialogues(path.read_text(encoding="utf-8")) == [
+            "Dialogue: 0,0:00:00.00,0:00:05.50,Default,,0,0,0,,a b. c"
+        ]
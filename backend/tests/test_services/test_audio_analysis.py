@@ -0,0 +1,279 @@
+"""
+Testes da análise de áudio com decode único (app/services/audio_analysis.py)
+"""
+import asyncio
+import wave
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+import numpy as np
+import pytest
+from app.services import audio_analysis as audio_analysis_module
+from app.services import video_processing as video_processing_module
+from app.services.audio_analysis import (
+    ENVELOPE_SUFFIX,
+    AudioAnalyzer,
+    analyze_wav,
+    build_pyramid,
+    compute_envelopes,
+    find_silences,
+    wav_layout,
+)
+from app.services.job_workspace import WorkspaceManager
+from app.services.media_proxy import Proxy
+from app.services.video_processing import VideoProcessingService
+
+RATE = 16000
+
+
+def write_wav(path, pattern):
+    """WAV 16 kHz mono: pattern = [(segundos, amplitude)] (tom de 440 Hz ou silêncio)"""
+    chunks = []
+    for seconds, amplitude in pattern:
+        t = np.arange(int(seconds * RATE)) / RATE
+        chunks.append(amplitude * np.sin(2 * np.pi * 440 * t))
+    samples = (np.concatenate(chunks) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+@pytest.fixture
+def speech_wav(tmp_path):
+    # 2s de som, 1.5s de silêncio, 1s de som, 0.3s de silêncio, 1.2s de som
+    return write_wav(tmp_path / "audio.wav", [(2.0, 0.5), (1.5, 0.0), (1.0, 0.5), (0.3, 0.0), (1.2, 0.5)])
+
+
+def fake_proxy_open(proxy):
+    @asynccontextmanager
+    async def open_proxy(video_id, video_url):
+        yield proxy
+    return open_proxy
+
+
+class TestEnvelope:
+    """Testes do envelope RMS, dos picos e do que deriva deles"""
+
+    def test_envelope_levels(self, speech_wav):
+        envelope, low, high, duration = compute_envelopes(str(speech_wav))
+        assert duration == pytest.approx(6.0)
+        assert len(envelope) == len(low) == len(high) == 600
+        assert envelope.dtype == low.dtype == np.int8
+        # Senoide de amplitude 0.5: RMS ≈ -9 dBFS, picos ≈ ±64
+        assert envelope[50] == -9
+        assert (low[50], high[50]) == (-64, 63)
+        assert envelope[250] == -100
+
+    def test_partial_last_frame(self, tmp_path):
+        wav = write_wav(tmp_path / "short.wav", [(0.015, 0.5)])
+        envelope, _, _, duration = compute_envelopes(str(wav))
+        assert len(envelope) == 2
+        assert duration == pytest.approx(0.015)
+
+    def test_layout_skips_extra_chunks(self, tmp_path, speech_wav):
+        data = speech_wav.read_bytes()
+        # Insere um chunk LIST entre fmt e data (como o ffmpeg faz)
+        extra = b"LIST" + (4).to_bytes(4, "little") + b"INFO"
+        patched = tmp_path / "list.wav"
+        patched.write_bytes(data[:36] + extra + data[36:])
+        layout = wav_layout(str(patched))
+        assert (layout.offset, layout.frames, layout.rate, layout.channels) == (56, 96000, RATE, 1)
+
+    def test_silences(self, speech_wav):
+        envelope, _, _, _ = compute_envelopes(str(speech_wav))
+        assert find_silences(envelope, -30, 1.0) == [{"start": 2.0, "end": 3.5, "duration": 1.5}]
+        assert len(find_silences(envelope, -30, 0.2)) == 2
+
+    def test_trailing_silence(self):
+        envelope = np.array([-10] * 50 + [-80] * 150, dtype=np.int8)
+        assert find_silences(envelope, -30, 1.0) == [{"start": 0.5, "end": 2.0, "duration": 1.5}]
+
+
+class TestSilenceDetector:
+    """Testes do detector vetorizado (run-length em NumPy)"""
+
+    def reference(self, envelope, threshold, min_duration):
+        """Implementação em Python puro usada como referência"""
+        runs, start = [], None
+        for index, value in enumerate(envelope.tolist() + [0]):
+            if value < threshold and start is None:
+                start = index
+            elif value >= threshold and start is not None:
+                runs.append((start, index))
+                start = None
+        return [
+            {"start": round(a * 0.01, 3), "end": round(b * 0.01, 3), "duration": round((b - a) * 0.01, 3)}
+            for a, b in runs if (b - a) * 0.01 >= min_duration - 1e-9
+        ]
+
+    def test_matches_reference(self):
+        rng = np.random.default_rng(7)
+        envelope = np.repeat(rng.integers(-90, -5, 400), rng.integers(1, 120, 400)).astype(np.int8)
+        for threshold in (-60, -40, -30, -20):
+            for min_duration in (0.1, 0.5, 1.0):
+                assert find_silences(envelope, threshold, min_duration) == self.reference(
+                    envelope, threshold, min_duration
+                )
+
+    def test_edges_and_empty(self):
+        envelope = np.array([-80] * 100 + [-10] * 10 + [-80] * 100, dtype=np.int8)
+        assert [s["start"] for s in find_silences(envelope, -30, 1.0)] == [0.0, 1.1]
+        assert find_silences(np.zeros(0, dtype=np.int8), -30, 1.0) == []
+        assert find_silences(envelope, -90, 0.1) == []
+
+    def test_requery_is_instant(self):
+        import time
+        # Uma hora de envelope (10 ms por quadro)
+        envelope = np.random.default_rng(1).integers(-90, -5, 360000).astype(np.int8)
+        started = time.perf_counter()
+        for threshold in range(-50, -20, 5):
+            find_silences(envelope, threshold, 0.5)
+        assert (time.perf_counter() - started) / 6 < 0.1
+
+    def test_pyramid_levels(self):
+        low = np.arange(-100, 0, dtype=np.int8)
+        high = np.arange(0, 100, dtype=np.int8)
+        levels = build_pyramid(low, high, factor=4, min_length=10)
+        assert [len(level[0]) for level in levels] == [100, 25, 7]
+        assert levels[1][0][0] == -100 and levels[1][1][0] == 3
+        # Padding pela borda não altera o último máximo
+        assert levels[2][1][-1] == 99
+
+
+class TestWaveform:
+    """Testes da consulta de waveform (qualquer número de amostras e janela)"""
+
+    def test_any_sample_count(self, speech_wav):
+        analysis = analyze_wav(speech_wav, persist=False)
+        for samples in (12, 100, 1000):
+            peaks = analysis.peaks(samples)
+            assert len(peaks["min"]) == len(peaks["max"]) == samples
+        peaks = analysis.peaks(12)
+        assert peaks["max"][0] == pytest.approx(0.49, abs=0.01)
+        assert peaks["max"][5] == 0.0
+        assert peaks["sampleDuration"] == 0.5
+
+    def test_zoom_window(self, speech_wav):
+        analysis = analyze_wav(speech_wav, persist=False)
+        peaks = analysis.peaks(10, start=2.0, end=3.5)
+        assert (peaks["start"], peaks["end"]) == (2.0, 3.5)
+        # O último bucket cruza o fim do silêncio (nível de 40 ms)
+        assert max(peaks["max"][:-1]) == 0.0
+        # Zoom abaixo da resolução de 10 ms repete quadros
+        assert len(analysis.peaks(100, start=1.0, end=1.05)["max"]) == 100
+
+    def test_waveform_is_normalized(self, speech_wav):
+        waveform = analyze_wav(speech_wav, persist=False).waveform(12)
+        assert all(0.0 <= value <= 1.0 for value in waveform)
+        assert waveform[0] == pytest.approx(0.5, abs=0.01)
+
+    def test_envelopes_are_persisted(self, speech_wav):
+        analyze_wav(speech_wav)
+        cache_path = speech_wav.with_name(speech_wav.stem + ENVELOPE_SUFFIX)
+        assert cache_path.exists()
+        with patch.object(audio_analysis_module, "compute_envelopes") as mock_compute:
+            analysis = analyze_wav(speech_wav)
+        mock_compute.assert_not_called()
+        assert analysis.silences(1.0, -30)["totalSilenceDuration"] == 1.5
+
+
+class TestAudioAnalyzer:
+    """Testes do cache por vídeo (uma leitura do WAV, consultas instantâneas)"""
+
+    async def test_proxy_wav_is_analyzed_once(self, tmp_path, speech_wav):
+        analyzer = AudioAnalyzer(root=str(tmp_path / "audio"))
+        proxy = Proxy(tmp_path / "proxy.mp4", speech_wav, 6.02, 1920, 1080)
+
+        with patch.object(audio_analysis_module.media_proxy, "open", fake_proxy_open(proxy)), \
+             patch.object(audio_analysis_module, "analyze_wav", wraps=analyze_wav) as mock_read:
+            async with analyzer.open("vid-1", "http://x") as first:
+                report = first.silences(1.0, -30)
+            async with analyzer.open("vid-1", "http://x") as second:
+                strict = second.silences(0.2, -30)
+
+        assert mock_read.call_count == 1
+        assert (analyzer.get_stats()["hits"], analyzer.get_stats()["decodes"]) == (1, 0)
+        assert report["videoDuration"] == 6.02
+        assert report["totalSilenceDuration"] == 1.5
+        assert len(strict["silences"]) == 2
+
+    async def test_concurrent_requests_share_one_analysis(self, tmp_path, speech_wav):
+        analyzer = AudioAnalyzer(root=str(tmp_path / "audio"))
+        proxy = Proxy(tmp_path / "proxy.mp4", speech_wav, 6.0, 1920, 1080)
+
+        async def use():
+            async with analyzer.open("vid-1", "http://x") as analysis:
+                return analysis
+
+        with patch.object(audio_analysis_module.media_proxy, "open", fake_proxy_open(proxy)), \
+             patch.object(audio_analysis_module, "analyze_wav", wraps=analyze_wav) as mock_read:
+            first, second = await asyncio.gather(use(), use())
+        assert mock_read.call_count == 1
+        assert first is second
+
+    async def test_without_proxy_audio_is_extracted_once(self, tmp_path, speech_wav):
+        analyzer = AudioAnalyzer(root=str(tmp_path / "audio"))
+
+        async def fake_ffmpeg(cmd, **kwargs):
+            Path(cmd[-1]).write_bytes(speech_wav.read_bytes())
+
+        with patch.object(audio_analysis_module.settings, "proxy_enabled", False), \
+             patch.object(audio_analysis_module.media_cache, "fetch", AsyncMock(return_value=tmp_path / "src.mp4")), \
+             patch.object(audio_analysis_module, "run_ffmpeg", AsyncMock(side_effect=fake_ffmpeg)) as mock_ffmpeg:
+            async with analyzer.open("vid-1", "http://x") as analysis:
+                assert analysis.wav_path == tmp_path / "audio" / "vid-1.wav"
+            async with analyzer.open("vid-1", "http://x"):
+                pass
+
+        assert mock_ffmpeg.await_count == 1
+        assert analyzer.get_stats()["decodes"] == 1
+        assert analysis.duration == 6.0
+
+
+class TestEndpointsUseAnalysis:
+    """Testes dos serviços lendo a análise em cache"""
+
+    async def test_detect_silences_without_video_id(self, tmp_path, speech_wav):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+
+        leases = []
+
+        async def fake_extract(source, output_path):
+            leases.append(dict(video_processing_module.media_cache._leases))
+            Path(output_path).write_bytes(speech_wav.read_bytes())
+
+        workspaces = WorkspaceManager(root=str(tmp_path / "jobs"), min_free_bytes=0)
+
+        with patch("app.services.video_processing.media_cache.fetch", AsyncMock(return_value=tmp_path / "src.mp4")), \
+             patch("app.services.video_processing.workspace_manager", workspaces), \
+             patch.object(service, "extract_audio", AsyncMock(side_effect=fake_extract)), \
+             patch.object(service, "get_video_info", AsyncMock(return_value={"duration": 6.0})):
+            result = await service.detect_silences("http://x", 1.0, -30)
+
+        assert result["totalSilenceDuration"] == 1.5
+        # Fonte presa no cache de mídia durante o FFmpeg
+        assert leases == [{str(tmp_path / "src.mp4"): 1}]
+        # WAV temporário removido com o workspace
+        assert list(tmp_path.glob("*.wav")) == [speech_wav]
+        assert list(workspaces.root.iterdir()) == []
+
+    async def test_detect_silences_is_a_lookup(self, tmp_path, speech_wav):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+
+        analyzer = AudioAnalyzer(root=str(tmp_path / "audio"))
+        proxy = Proxy(tmp_path / "proxy.mp4", speech_wav, 6.0, 1920, 1080)
+        with patch("app.services.video_processing.audio_analyzer", analyzer), \
+             patch.object(audio_analysis_module.media_proxy, "open", fake_proxy_open(proxy)), \
+             patch("app.services.video_processing.run_ffmpeg", AsyncMock()) as mock_ffmpeg:
+            result = await service.detect_silences("http://x", 1.0, -30, video_id="vid-1")
+
+        mock_ffmpeg.assert_not_awaited()
+        assert result["silences"] == [{"start": 2.0, "end": 3.5, "duration": 1.5}]
+        assert result["silencePercentage"] == 25.0
@@ -0,0 +1,262 @@
+"""
+Testes do compilador de filter graph (app/services/ffmpeg_graph.py)
+"""
+import pytest
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+from app.services.ffmpeg_graph import (
+    build_filter_graph,
+    compute_keep_segments,
+    covers_whole_source,
+    remap_subtitle_segments,
+    remap_time,
+    rendition_filter,
+    rendition_size,
+)
+from app.services.artifact_cache import ArtifactCache
+from app.services.job_workspace import WorkspaceManager
+from app.services.video_processing import VideoProcessingService
+
+
+class TestKeepSegments:
+    """Testes do cálculo de trechos mantidos"""
+
+    def test_no_operations_keeps_everything(self):
+        assert compute_keep_segments(10.0) == [(0.0, 10.0)]
+
+    def test_trim_only(self):
+        assert compute_keep_segments(10.0, trim={"start": 2, "end": 8}) == [(2.0, 8.0)]
+
+    def test_silences_are_removed(self):
+        silences = [{"start": 6, "end": 7}, {"start": 2, "end": 3}]
+        assert compute_keep_segments(10.0, silences=silences) == [(0.0, 2.0), (3.0, 6.0), (7.0, 10.0)]
+
+    def test_silences_are_clipped_to_trim(self):
+        silences = [{"start": 0, "end": 3}, {"start": 7, "end": 9.5}]
+        assert compute_keep_segments(10.0, {"start": 1, "end": 9}, silences) == [(3.0, 7.0)]
+
+    def test_overlapping_silences(self):
+        silences = [{"start": 2, "end": 5}, {"start": 4, "end": 6}]
+        assert compute_keep_segments(10.0, silences=silences) == [(0.0, 2.0), (6.0, 10.0)]
+
+    def test_tiny_segments_are_dropped(self):
+        silences = [{"start": 2, "end": 5}, {"start": 5.01, "end": 6}]
+        assert compute_keep_segments(10.0, silences=silences) == [(0.0, 2.0), (6.0, 10.0)]
+
+    def test_covers_whole_source(self):
+        assert covers_whole_source([(0.0, 10.0)], 10.0)
+        assert not covers_whole_source([(0.0, 5.0)], 10.0)
+        assert not covers_whole_source([(0.0, 5.0), (6.0, 10.0)], 10.0)
+
+
+class TestSubtitleRemap:
+    """Testes do remapeamento de legendas para a linha do tempo cortada"""
+
+    KEEP = [(0.0, 2.0), (3.0, 6.0)]
+
+    def test_remap_time(self):
+        assert remap_time(1.0, self.KEEP) == 1.0
+        assert remap_time(4.0, self.KEEP) == 3.0
+        assert remap_time(2.5, self.KEEP) is None
+
+    def test_words_are_shifted(self):
+        segments = [{"start": 3.5, "end": 4.0, "text": "olá"}]
+        assert remap_subtitle_segments(segments, self.KEEP) == [{"start": 2.5, "end": 3.0, "text": "olá"}]
+
+    def test_words_in_removed_range_are_dropped(self):
+        segments = [{"start": 2.2, "end": 2.8, "text": "hmm"}, {"start": 7.0, "end": 8.0, "text": "fim"}]
+        assert remap_subtitle_segments(segments, self.KEEP) == []
+
+    def test_word_crossing_cut_is_clipped(self):
+        segments = [{"start": 1.5, "end": 3.5, "text": "longa"}]
+        assert remap_subtitle_segments(segments, self.KEEP) == [{"start": 1.5, "end": 2.5, "text": "longa"}]
+
+    def test_extra_fields_are_preserved(self):
+        segments = [{"start": 0.5, "end": 1.0, "text": "a", "confidence": 0.9}]
+        assert remap_subtitle_segments(segments, self.KEEP)[0]["confidence"] == 0.9
+
+
+class TestBuildFilterGraph:
+    """Testes da montagem do filter_complex"""
+
+    def test_multiple_segments_use_split_and_concat(self):
+        graph = build_filter_graph([(0.0, 2.0), (3.0, 6.0)], 10.0)
+        assert "[0:v]split=2[vs0][vs1]" in graph.filter_complex
+        assert "[0:a]asplit=2[as0][as1]" in graph.filter_complex
+        assert "[vs1]trim=start=3.000:end=6.000,setpts=PTS-STARTPTS[v1]" in graph.filter_complex
+        assert "[as1]atrim=start=3.000:end=6.000,asetpts=PTS-STARTPTS[a1]" in graph.filter_complex
+        assert "[v0][a0][v1][a1]concat=n=2:v=1:a=1[vcut][acut]" in graph.filter_complex
+        assert (graph.video_map, graph.audio_map) == ("[vcut]", "[acut]")
+
+    def test_subtitles_run_after_concat(self):
+        graph = build_filter_graph([(0.0, 2.0), (3.0, 6.0)], 10.0, subtitle_filter="subtitles=x.srt")
+        assert graph.filter_complex.endswith("[vcut]subtitles=x.srt[vout]")
+        assert graph.video_map == "[vout]"
+
+    def test_single_segment_without_split(self):
+        graph = build_filter_graph([(1.0, 4.0)], 10.0)
+        assert "split" not in graph.filter_complex
+        assert "concat" not in graph.filter_complex
+        assert (graph.video_map, graph.audio_map) == ("[v0]", "[a0]")
+
+    def test_no_audio(self):
+        graph = build_filter_graph([(0.0, 2.0), (3.0, 6.0)], 10.0, has_audio=False)
+        assert "atrim" not in graph.filter_complex
+        assert "concat=n=2:v=1:a=0[vcut]" in graph.filter_complex
+        assert graph.audio_map is None
+
+    def test_subtitles_only_passes_audio_through(self):
+        graph = build_filter_graph([(0.0, 10.0)], 10.0, subtitle_filter="subtitles=x.srt")
+        assert graph.filter_complex == "[0:v]subtitles=x.srt[vout]"
+        assert graph.audio_map == "0:a?"
+
+    def test_invalid_graphs(self):
+        with pytest.raises(ValueError):
+            build_filter_graph([], 10.0)
+        with pytest.raises(ValueError):
+            build_filter_graph([(0.0, 10.0)], 10.0)
+
+
+class TestRenditions:
+    """Testes das renditions (vários formatos a partir de um decode)"""
+
+    RENDITIONS = [
+        {"name": "tiktok", "aspectRatio": "9:16", "fit": "crop", "maxResolution": 1920},
+        {"name": "youtube", "aspectRatio": "16:9", "fit": "pad", "maxResolution": 1280},
+    ]
+
+    def test_rendition_size(self):
+        assert rendition_size("9:16", 1920) == (1080, 1920)
+        assert rendition_size("16:9", 1280) == (1280, 720)
+        assert rendition_size("1:1", 1080) == (1080, 1080)
+        # Sem upscale: o lado maior fica limitado ao da fonte
+        assert rendition_size("9:16", 1920, source_size=(1280, 720)) == (720, 1280)
+
+    def test_crop_and_pad_filters(self):
+        assert rendition_filter(self.RENDITIONS[0]) == (
+            "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,setsar=1"
+        )
+        assert "pad=1280:720:(ow-iw)/2:(oh-ih)/2" in rendition_filter(self.RENDITIONS[1])
+        with pytest.raises(ValueError):
+            rendition_filter({"aspectRatio": "9:16", "fit": "stretch"})
+        with pytest.raises(ValueError):
+            rendition_size("916", 1920)
+
+    def test_graph_splits_after_cuts(self):
+        graph = build_filter_graph(
+            [(0.0, 2.0), (3.0, 6.0)], 10.0, subtitle_filter="subtitles=x.srt", renditions=self.RENDITIONS
+        )
+        parts = graph.filter_complex.split(";")
+        assert "[vcut]split=2[rv0][rv1]" in parts
+        assert "[acut]asplit=2[ra0][ra1]" in parts
+        assert parts[-1].startswith("[rv1]scale=1280:720") and parts[-1].endswith("subtitles=x.srt[rout1]")
+        assert graph.outputs == [("[rout0]", "[ra0]"), ("[rout1]", "[ra1]")]
+
+    def test_whole_source_renditions_map_audio_directly(self):
+        graph = build_filter_graph([(0.0, 10.0)], 10.0, renditions=self.RENDITIONS)
+        assert graph.filter_complex.startswith("[0:v]split=2[rv0][rv1]")
+        assert [audio for _, audio in graph.outputs] == ["0:a?", "0:a?"]
+
+    def test_renditions_command_has_one_output_per_rendition(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            mock_settings.ffmpeg_threads_per_job = 4
+            service = VideoProcessingService()
+            renditions = [
+                {**self.RENDITIONS[0], "output_path": "tiktok.mp4", "maxBitrateKbps": 6000},
+                {**self.RENDITIONS[1], "output_path": "youtube.mp4"},
+            ]
+            cmd = service._build_renditions_command("in.mp4", renditions, [(0.0, 10.0)], 10.0)
+
+        assert cmd.count("-i") == 1
+        assert cmd.count("libx264") == 2
+        assert cmd[cmd.index("-maxrate") + 1] == "6000k"
+        assert cmd[cmd.index("-bufsize") + 1] == "12000k"
+        assert cmd.count("-maxrate") == 1
+        assert cmd[cmd.index("-threads") + 1] == "2"
+        assert cmd[-1] == "youtube.mp4" and "tiktok.mp4" in cmd
+
+    async def test_process_video_with_renditions(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+
+        source = tmp_path / "source.mp4"
+        source.write_bytes(b"video")
+        info = {"duration": 10.0, "size": 5, "width": 1920, "height": 1080, "audio_codec": "aac"}
+
+        async def fake_render(input_path, renditions, *args, **kwargs):
+            for rendition in renditions:
+                Path(rendition["output_path"]).write_bytes(b"out")
+
+        with patch.object(service, "get_video_info", AsyncMock(return_value=info)), \
+             patch.object(service, "render_renditions", AsyncMock(side_effect=fake_render)) as mock_render, \
+             patch.object(service, "cut_segments", AsyncMock()) as mock_cut:
+            result = await service.process_video(str(source), "vid-1", renditions=self.RENDITIONS)
+
+        mock_render.assert_awaited_once()
+        mock_cut.assert_not_awaited()
+        assert [r["name"] for r in result["renditions"]] == ["tiktok", "youtube"]
+        assert [(r["width"], r["height"]) for r in result["renditions"]] == [(1080, 1920), (1280, 720)]
+        assert result["renditions"][0]["output_path"].endswith("vid-1_tiktok.mp4")
+        assert result["output_path"] == result["renditions"][0]["output_path"]
+        assert result["renditions"][1]["size"] == 3
+
+
+class TestSinglePassRender:
+    """Testes do process_video compilando tudo em uma chamada ao FFmpeg"""
+
+    def test_render_command(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+        cmd = service._build_render_command("in.mp4", "out.mp4", [(0.0, 2.0), (3.0, 6.0)], 10.0)
+        assert cmd.count("-i") == 1
+        assert cmd[cmd.index("-filter_complex") + 1].count("trim=") == 4
+        assert ["-map", "[vcut]", "-map", "[acut]"] == cmd[5:9]
+        assert cmd[-1] == "out.mp4"
+
+    async def test_process_video_renders_once(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            service = VideoProcessingService()
+
+        source = tmp_path / "source.mp4"
+        source.write_bytes(b"video")
+        info = {"duration": 10.0, "size": 5, "audio_codec": "aac"}
+        subtitles = {"enabled": True, "segments": [{"start": 3.5, "end": 4.0, "text": "olá"}]}
+        silence_removal = {"enabled": True, "silences": [{"start": 2.0, "end": 3.0}]}
+        written = {}
+
+        def capture_subtitles(path, segments, style):
+            written["segments"] = segments
+            path.write_text("")
+
+        async def fake_render(input_path, output_path, *args, **kwargs):
+            Path(output_path).write_bytes(b"out")
+
+        workspaces = WorkspaceManager(root=str(tmp_path / "jobs"), min_free_bytes=0)
+
+        with patch.object(service, "get_video_info", AsyncMock(return_value=info)), \
+             patch("app.services.video_processing.workspace_manager", workspaces), \
+             patch("app.services.video_processing.artifact_cache", ArtifactCache(str(tmp_path / "artifacts"), 0)), \
+             patch.object(service, "_create_subtitle_file", side_effect=capture_subtitles), \
+             patch.object(service, "render", AsyncMock(side_effect=fake_render)) as mock_render, \
+             patch.object(service, "trim_video", AsyncMock()) as mock_trim:
+            result = await service.process_video(
+                str(source), "vid-1",
+                subtitles=subtitles, trim={"start": 0, "end": 8}, silence_removal=silence_removal
+            )
+
+        mock_render.assert_awaited_once()
+        mock_trim.assert_not_awaited()
+        assert mock_render.await_args.args[2] == [(0.0, 2.0), (3.0, 8.0)]
+        assert written["segments"] == [{"start": 2.5, "end": 3.0, "text": "olá"}]
+        assert result["output_path"].endswith("vid-1_final.mp4")
+        assert (result["duration"], result["size"]) == (7.0, 3)
+        # The cached source is never consumed by the render
+        assert source.exists()
+        # Output handed over in temp_path, job workspace removed
+        assert Path(result["output_path"]).parent == tmp_path
+        assert Path(result["output_path"]).exists()
+        assert list(workspaces.root.iterdir()) == []
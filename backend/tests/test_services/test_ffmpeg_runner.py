@@ -0,0 +1,131 @@
+"""
+Testes do runner assíncrono de FFmpeg (app/services/ffmpeg_runner.py)
+
+Usam processos reais (scripts de shell no lugar do ffmpeg)
+"""
+import asyncio
+import os
+import sys
+import pytest
+from app.services.ffmpeg_runner import (
+    FFmpegError,
+    FFmpegTimeout,
+    ProgressParser,
+    STDERR_TAIL_LINES,
+    run_ffmpeg,
+    run_process,
+)
+
+
+def write_script(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+    return str(path)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Processo zumbi já terminou
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().split()[2] != "Z"
+
+
+class TestProgressParser:
+    """Testes do parser de -progress pipe:1"""
+
+    def test_reports_percent_fps_and_speed(self):
+        reports = []
+        parser = ProgressParser(duration=10.0, callback=reports.append)
+        for line in ["frame=120", "fps=59.8", "out_time_us=5000000", "speed=2.01x", "progress=continue"]:
+            parser.feed(line)
+        for line in ["out_time_us=10000000", "progress=end"]:
+            parser.feed(line)
+
+        assert (reports[0].percent, reports[0].fps, reports[0].speed) == (50, 59.8, 2.01)
+        assert reports[0].out_time == 5.0
+        assert reports[1].percent == 100 and reports[1].done
+
+    def test_unknown_duration(self):
+        parser = ProgressParser(duration=None, callback=None)
+        parser.feed("out_time_us=N/A")
+        parser.feed("progress=continue")
+        assert parser.last.percent is None
+
+
+class TestRunProcess:
+    """Testes de execução, erros, timeout e cancelamento"""
+
+    async def test_captures_stdout(self):
+        result = await run_process([sys.executable, "-c", "print('{\"ok\": 1}')"], capture_stdout=True)
+        assert result.returncode == 0
+        assert result.stdout == '{"ok": 1}'
+
+    async def test_stderr_is_a_bounded_tail(self):
+        code = "import sys\nfor i in range(1000): print(i, file=sys.stderr)"
+        seen = []
+        result = await run_process([sys.executable, "-c", code], on_stderr_line=seen.append)
+        assert len(seen) == 1000
+        lines = result.stderr.splitlines()
+        assert len(lines) == STDERR_TAIL_LINES
+        assert lines[-1] == "999"
+
+    async def test_failure_raises_and_removes_outputs(self, tmp_path):
+        output = tmp_path / "out.mp4"
+        script = write_script(tmp_path, "fail.sh", f"echo partial > {output}\necho 'Invalid data' >&2\nexit 1\n")
+        with pytest.raises(FFmpegError) as exc:
+            await run_process([script], outputs=[str(output)])
+        assert exc.value.returncode == 1
+        assert "Invalid data" in exc.value.stderr
+        assert not output.exists()
+
+    async def test_timeout_kills_process_tree(self, tmp_path):
+        pid_file = tmp_path / "child.pid"
+        output = tmp_path / "out.mp4"
+        script = write_script(
+            tmp_path, "hang.sh",
+            f"sleep 30 &\necho $! > {pid_file}\necho partial > {output}\nwait\n"
+        )
+        with pytest.raises(FFmpegTimeout):
+            await run_process([script], timeout=0.5, outputs=[str(output)])
+
+        await asyncio.sleep(0.1)
+        assert not pid_alive(int(pid_file.read_text()))
+        assert not output.exists()
+
+    async def test_cancellation_kills_process(self, tmp_path):
+        pid_file = tmp_path / "pid"
+        script = write_script(tmp_path, "slow.sh", f"echo $$ > {pid_file}\nexec sleep 30\n")
+        task = asyncio.create_task(run_process([script]))
+        for _ in range(50):
+            if pid_file.exists() and pid_file.read_text().strip():
+                break
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.1)
+        assert not pid_alive(int(pid_file.read_text()))
+
+
+class TestRunFFmpeg:
+    """Testes do run_ffmpeg com progresso ao vivo"""
+
+    async def test_progress_and_flags(self, tmp_path):
+        args_file = tmp_path / "args"
+        script = write_script(
+            tmp_path, "ffmpeg",
+            f'echo "$@" > {args_file}\n'
+            "printf 'fps=30\\nout_time_us=1000000\\nspeed=1x\\nprogress=continue\\n'\n"
+            "printf 'fps=30\\nout_time_us=2000000\\nspeed=1x\\nprogress=end\\n'\n"
+        )
+        reports = []
+        await run_ffmpeg([script, "-i", "in.mp4", "out.mp4"], duration=2.0, on_progress=reports.append)
+
+        assert [r.percent for r in reports] == [50, 100]
+        assert args_file.read_text().split() == [
+            "-hide_banner", "-nostats", "-progress", "pipe:1", "-i", "in.mp4", "out.mp4"
+        ]
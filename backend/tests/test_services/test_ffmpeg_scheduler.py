@@ -0,0 +1,165 @@
+"""
+Testes do agendador de jobs do FFmpeg (app/services/ffmpeg_scheduler.py)
+"""
+import asyncio
+import pytest
+from app.services.ffmpeg_scheduler import BACKGROUND_PLAN, FFmpegScheduler, SchedulerQueueFull, default_slots
+
+
+class Recorder:
+    """Jobs controláveis: cada um espera seu evento para terminar"""
+
+    def __init__(self):
+        self.started = []
+        self.events = {}
+
+    def job(self, job_id):
+        self.events[job_id] = asyncio.Event()
+
+        async def run():
+            self.started.append(job_id)
+            await self.events[job_id].wait()
+        return run
+
+    async def finish(self, job_id):
+        self.events[job_id].set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+
+class TestFFmpegScheduler:
+    """Testes de slots, prioridade, fairness e admissão"""
+
+    async def test_runs_up_to_slots_and_queues_the_rest(self):
+        scheduler = FFmpegScheduler(slots=2)
+        rec = Recorder()
+        statuses = [scheduler.submit(f"j{i}", "org", "pro", rec.job(f"j{i}"))["status"] for i in range(3)]
+        await asyncio.sleep(0)
+
+        assert statuses == ["processing", "processing", "queued"]
+        assert rec.started == ["j0", "j1"]
+        await rec.finish("j0")
+        assert rec.started == ["j0", "j1", "j2"]
+        await scheduler.shutdown()
+
+    async def test_priority_by_plan(self):
+        scheduler = FFmpegScheduler(slots=1)
+        rec = Recorder()
+        scheduler.submit("busy", "org-x", "free", rec.job("busy"))
+        scheduler.submit("free", "org-a", "free", rec.job("free"))
+        scheduler.submit("starter", "org-b", "starter", rec.job("starter"))
+        result = scheduler.submit("pro", "org-c", "pro", rec.job("pro"))
+
+        assert result == {"status": "queued", "position": 1}
+        await rec.finish("busy")
+        await rec.finish("pro")
+        await rec.finish("starter")
+        assert rec.started == ["busy", "pro", "starter", "free"]
+        await scheduler.shutdown()
+
+    async def test_round_robin_between_organizations(self):
+        scheduler = FFmpegScheduler(slots=1)
+        rec = Recorder()
+        scheduler.submit("busy", "org-x", "pro", rec.job("busy"))
+        for job_id, org in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")]:
+            scheduler.submit(job_id, org, "pro", rec.job(job_id))
+
+        assert scheduler.position("b1") == 2
+        for job_id in ["busy", "a1", "b1", "a2"]:
+            await rec.finish(job_id)
+        assert rec.started == ["busy", "a1", "b1", "a2", "a3"]
+        await scheduler.shutdown()
+
+    async def test_admission_control(self):
+        scheduler = FFmpegScheduler(slots=1, max_queue=1)
+        rec = Recorder()
+        scheduler.submit("j0", "org", "pro", rec.job("j0"))
+        scheduler.submit("j1", "org", "pro", rec.job("j1"))
+        with pytest.raises(SchedulerQueueFull):
+            scheduler.submit("j2", "org", "pro", rec.job("j2"))
+        assert scheduler.get_stats()["rejected"] == 1
+        await scheduler.shutdown()
+
+    async def test_failed_job_frees_slot_and_records_metrics(self):
+        scheduler = FFmpegScheduler(slots=1)
+        rec = Recorder()
+
+        async def boom():
+            raise RuntimeError("ffmpeg crashed")
+
+        scheduler.submit("bad", "org", "pro", boom)
+        scheduler.submit("next", "org", "pro", rec.job("next"))
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        stats = scheduler.get_stats()
+        assert rec.started == ["next"]
+        assert (stats["failed"], stats["running"], stats["queued"]) == (1, 1, 0)
+        assert stats["run_seconds"]["max"] >= 0
+        await scheduler.shutdown()
+
+    async def test_cancel_queued_job(self):
+        scheduler = FFmpegScheduler(slots=1)
+        rec = Recorder()
+        scheduler.submit("j0", "org", "pro", rec.job("j0"))
+        scheduler.submit("j1", "org", "pro", rec.job("j1"))
+        assert scheduler.cancel("j1") is True
+        assert scheduler.queued == 0
+        await rec.finish("j0")
+        assert rec.started == ["j0"]
+        await scheduler.shutdown()
+
+    async def test_run_waits_for_result_and_counts_failures(self):
+        scheduler = FFmpegScheduler(slots=1)
+
+        async def ok():
+            return "proxy.mp4"
+
+        async def boom():
+            raise RuntimeError("ffmpeg crashed")
+
+        assert await scheduler.run("ok", "org", "pro", ok) == "proxy.mp4"
+        with pytest.raises(RuntimeError):
+            await scheduler.run("bad", "org", "pro", boom)
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        stats = scheduler.get_stats()
+        assert (stats["completed"], stats["failed"]) == (1, 1)
+        await scheduler.shutdown()
+
+    async def test_background_jobs_run_after_user_jobs(self):
+        scheduler = FFmpegScheduler(slots=1)
+        rec = Recorder()
+        scheduler.submit("busy", "org-x", "pro", rec.job("busy"))
+        background = asyncio.create_task(scheduler.run("proxy", "proxies", BACKGROUND_PLAN, rec.job("proxy")))
+        await asyncio.sleep(0)
+        scheduler.submit("free", "org-a", "free", rec.job("free"))
+
+        await rec.finish("busy")
+        await rec.finish("free")
+        await rec.finish("proxy")
+        await background
+        assert rec.started == ["busy", "free", "proxy"]
+        await scheduler.shutdown()
+
+    def test_default_slots(self):
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("os.sched_getaffinity", lambda pid: set(range(9)), raising=False)
+            assert default_slots(threads_per_job=2) == 4
+            mp.setattr("os.sched_getaffinity", lambda pid: {0}, raising=False)
+            assert default_slots(threads_per_job=2) == 1
+
+    def test_default_slots_use_affinity_not_host_cores(self):
+        with pytest.MonkeyPatch.context() as mp:
+            # Container limitado a 3 núcleos num host de 64
+            mp.setattr("os.cpu_count", lambda: 64)
+            mp.setattr("os.sched_getaffinity", lambda pid: {0, 1, 2}, raising=False)
+            assert default_slots(threads_per_job=2) == 1
+            mp.delattr("os.sched_getaffinity", raising=False)
+            assert default_slots(threads_per_job=2) == 31
+
+    def test_default_slots_setting_override(self):
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("app.services.ffmpeg_scheduler.settings.ffmpeg_cpu_cores", 5)
+            assert default_slots(threads_per_job=2) == 2
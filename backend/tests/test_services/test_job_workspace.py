@@ -0,0 +1,121 @@
+"""
+Testes dos workspaces por job (app/services/job_workspace.py)
+"""
+import asyncio
+import json
+import os
+import time
+from unittest.mock import patch
+import pytest
+from app.services.job_workspace import InsufficientDiskSpace, OWNER_FILE, WorkspaceManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return WorkspaceManager(root=str(tmp_path / "jobs"), min_free_bytes=0)
+
+
+class TestWorkspaceLifecycle:
+    """Testes de isolamento e limpeza garantida"""
+
+    async def test_concurrent_jobs_are_isolated(self, manager):
+        async with manager.open("vid-1") as first, manager.open("vid-1") as second:
+            assert first.path != second.path
+            first.file("final.mp4").write_bytes(b"a")
+            second.file("final.mp4").write_bytes(b"b")
+            assert first.file("final.mp4").read_bytes() == b"a"
+            assert manager.get_stats()["active"] == 2
+
+        assert list(manager.root.iterdir()) == []
+        assert manager.get_stats()["active"] == 0
+
+    async def test_cleanup_on_failure(self, manager):
+        with pytest.raises(RuntimeError):
+            async with manager.open("vid-1") as workspace:
+                workspace.file("piece.mp4").write_bytes(b"x")
+                raise RuntimeError("boom")
+        assert list(manager.root.iterdir()) == []
+
+    async def test_cleanup_on_cancellation(self, manager):
+        opened = asyncio.Event()
+
+        async def job():
+            async with manager.open("vid-1") as workspace:
+                workspace.file("piece.mp4").write_bytes(b"x")
+                opened.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(job())
+        await opened.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert list(manager.root.iterdir()) == []
+
+    async def test_job_id_is_sanitized(self, manager):
+        async with manager.open("../../etc/passwd") as workspace:
+            assert workspace.path.parent == manager.root
+
+
+class TestScratchTier:
+    """Testes do tier em RAM (tmpfs) para intermediários pequenos"""
+
+    async def test_scratch_in_separate_root(self, tmp_path):
+        manager = WorkspaceManager(root=str(tmp_path / "jobs"), scratch_root=str(tmp_path / "shm"), min_free_bytes=0)
+        async with manager.open("vid-1") as workspace:
+            assert workspace.scratch.parent == tmp_path / "shm"
+            assert workspace.scratch_file("subtitles.ass").parent == workspace.scratch
+            assert workspace.file("final.mp4").parent == workspace.path
+        assert list((tmp_path / "shm").iterdir()) == []
+        assert manager.get_stats()["scratch_in_ram"] == 1
+
+    async def test_full_scratch_falls_back_to_disk(self, tmp_path):
+        manager = WorkspaceManager(
+            root=str(tmp_path / "jobs"), scratch_root=str(tmp_path / "shm"),
+            scratch_min_free_bytes=10 ** 18, min_free_bytes=0
+        )
+        async with manager.open("vid-1") as workspace:
+            assert workspace.scratch == workspace.path
+
+
+class TestReservation:
+    """Testes da reserva de disco antes do job"""
+
+    async def test_reservations_add_up(self, manager):
+        with patch.object(manager, "_free_bytes", return_value=1000):
+            async with manager.open("vid-1", reserve_bytes=600):
+                assert manager.get_stats()["reserved_bytes"] == 600
+                with pytest.raises(InsufficientDiskSpace):
+                    async with manager.open("vid-2", reserve_bytes=600):
+                        pass
+            async with manager.open("vid-2", reserve_bytes=600):
+                pass
+        assert manager.get_stats()["rejected"] == 1
+        assert list(manager.root.iterdir()) == []
+
+
+class TestSweeper:
+    """Testes da remoção de workspaces órfãos"""
+
+    def _orphan(self, manager, name, pid, age=0.0):
+        directory = manager.root / name
+        directory.mkdir(parents=True)
+        (directory / OWNER_FILE).write_text(json.dumps({"pid": pid, "created": time.time() - age}))
+        return directory
+
+    async def test_sweeps_dead_lost_and_stale_workspaces(self, manager):
+        dead_pid = 999999
+        dead = self._orphan(manager, "dead-0001", pid=dead_pid)
+        lost = self._orphan(manager, "lost-0001", pid=os.getpid())
+        stale = self._orphan(manager, "stale-0001", pid=os.getppid(), age=2 * 24 * 3600)
+        other = self._orphan(manager, "other-0001", pid=os.getppid())
+
+        with patch("app.services.job_workspace._pid_alive", side_effect=lambda pid: pid != dead_pid):
+            async with manager.open("vid-1") as active:
+                assert manager.sweep() == 3
+                # Workspace aberto e job de outro worker vivo ficam
+                assert active.path.exists()
+                assert other.exists()
+
+        assert not dead.exists() and not lost.exists() and not stale.exists()
+        assert manager.get_stats()["swept"] == 3
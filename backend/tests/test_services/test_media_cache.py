@@ -0,0 +1,155 @@
+"""
+Testes do cache local de mídia (app/services/media_cache.py)
+"""
+import asyncio
+import os
+import httpx
+import pytest
+from app.services.media_cache import MediaCache, MediaDownloadError, PART_SUFFIX
+
+CONTENT = b"0123456789" * 100
+
+
+class FakeStorage:
+    """Servidor HTTP falso com suporte a HEAD, Range e If-Range"""
+
+    def __init__(self, content=CONTENT, etag='"v1"', fail_after=None):
+        self.content = content
+        self.etag = etag
+        self.fail_after = fail_after
+        self.gets = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        headers = {"etag": self.etag, "content-length": str(len(self.content))}
+        if request.method == "HEAD":
+            return httpx.Response(200, headers=headers)
+
+        self.gets.append(request.headers.get("range"))
+        body = self.content
+        status = 200
+        range_header = request.headers.get("range")
+        if range_header and request.headers.get("if-range") == self.etag:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            body = self.content[start:]
+            status = 206
+        if self.fail_after is not None:
+            # Simula conexão interrompida na primeira tentativa
+            body = body[:self.fail_after]
+            self.fail_after = None
+        return httpx.Response(status, headers={"etag": self.etag}, content=body)
+
+
+def build_cache(tmp_path, storage, **kwargs):
+    kwargs.setdefault("max_bytes", 10 * 1024 * 1024)
+    return MediaCache(
+        root=str(tmp_path / "media"),
+        chunk_size=64,
+        transport=httpx.MockTransport(storage.handler),
+        **kwargs
+    )
+
+
+class TestMediaCache:
+    """Testes de download, cache e quota"""
+
+    async def test_download_then_hit(self, tmp_path):
+        storage = FakeStorage()
+        cache = build_cache(tmp_path, storage)
+
+        path = await cache.fetch("https://storage/v/1.mp4", "vid-1")
+        assert path.read_bytes() == CONTENT
+        again = await cache.fetch("https://storage/v/1.mp4", "vid-1")
+
+        assert again == path
+        assert len(storage.gets) == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    async def test_new_etag_is_a_new_entry(self, tmp_path):
+        storage = FakeStorage()
+        cache = build_cache(tmp_path, storage)
+        first = await cache.fetch("https://storage/v/1.mp4", "vid-1")
+        storage.etag = '"v2"'
+        second = await cache.fetch("https://storage/v/1.mp4", "vid-1")
+        assert first != second
+        assert len(storage.gets) == 2
+
+    async def test_concurrent_fetches_share_one_download(self, tmp_path):
+        storage = FakeStorage()
+        cache = build_cache(tmp_path, storage)
+        paths = await asyncio.gather(*[cache.fetch("https://storage/v/1.mp4", "vid-1") for _ in range(5)])
+        assert len(set(paths)) == 1
+        assert len(storage.gets) == 1
+
+    async def test_interrupted_download_resumes_with_range(self, tmp_path):
+        storage = FakeStorage(fail_after=300)
+        cache = build_cache(tmp_path, storage)
+
+        path = await cache.fetch("https://storage/v/1.mp4", "vid-1")
+
+        assert path.read_bytes() == CONTENT
+        assert storage.gets == [None, "bytes=300-"]
+        assert cache.resumed == 1
+        assert not path.with_name(path.name + PART_SUFFIX).exists()
+
+    async def test_http_error_raises(self, tmp_path):
+        transport = httpx.MockTransport(lambda request: httpx.Response(404))
+        cache = MediaCache(root=str(tmp_path / "media"), max_bytes=1024, retries=1, transport=transport)
+        with pytest.raises(MediaDownloadError):
+            await cache.fetch("https://storage/v/missing.mp4", "missing")
+
+    async def test_local_path_is_returned_as_is(self, tmp_path):
+        local = tmp_path / "local.mp4"
+        local.write_bytes(b"x")
+        cache = build_cache(tmp_path, FakeStorage())
+        assert await cache.fetch(str(local)) == local
+
+    async def test_lru_eviction_respects_quota_and_leases(self, tmp_path):
+        storage = FakeStorage()
+        cache = build_cache(tmp_path, storage, max_bytes=len(CONTENT) * 2)
+
+        async with cache.open("https://storage/v/1.mp4", "vid-1") as held:
+            second = await cache.fetch("https://storage/v/2.mp4", "vid-2")
+            os.utime(held, (1, 1))  # mais antigo, mas em uso
+            third = await cache.fetch("https://storage/v/3.mp4", "vid-3")
+            assert held.exists()
+            assert not second.exists()
+            assert third.exists()
+
+        assert cache.evictions == 1
+
+    async def test_open_refetches_entry_evicted_before_lease(self, tmp_path):
+        storage = FakeStorage()
+        cache = build_cache(tmp_path, storage)
+        fetch = cache.fetch
+        calls = []
+
+        async def evicting_fetch(url, video_id=None):
+            path = await fetch(url, video_id)
+            if not calls:
+                # Evicção entre o fim do download e o lease
+                path.unlink()
+            calls.append(path)
+            return path
+
+        cache.fetch = evicting_fetch
+        async with cache.open("https://storage/v/1.mp4", "vid-1") as path:
+            assert path.read_bytes() == CONTENT
+            assert cache._leases == {str(path): 1}
+        assert len(calls) == 2
+        assert len(storage.gets) == 2
+        assert not cache._leases
+
+    async def test_stale_partial_download_counts_toward_quota(self, tmp_path):
+        cache = build_cache(tmp_path, FakeStorage(), max_bytes=len(CONTENT) * 2)
+        cache.root.mkdir(parents=True)
+        stale = cache.root / f"abandoned.mp4{PART_SUFFIX}"
+        stale.write_bytes(CONTENT)
+        os.utime(stale, (1, 1))
+
+        first = await cache.fetch("https://storage/v/1.mp4", "vid-1")
+        second = await cache.fetch("https://storage/v/2.mp4", "vid-2")
+
+        # .part abandonado é o mais antigo: removido para caber o novo download
+        assert not stale.exists()
+        assert first.exists() and second.exists()
+        assert cache.evictions == 1
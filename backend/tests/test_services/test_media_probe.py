@@ -0,0 +1,188 @@
+"""
+Testes da camada memoizada de ffprobe (app/services/media_probe.py)
+"""
+import json
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.services.media_probe import (
+    KeyframeIndex,
+    MediaProbe,
+    info_keyframes,
+    parse_packet_index,
+    parse_probe_output,
+)
+
+FFPROBE_OUTPUT = {
+    "format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "12.5", "size": "5", "bit_rate": "800000"},
+    "streams": [
+        {
+            "codec_type": "video", "codec_name": "h264", "profile": "High", "pix_fmt": "yuv420p",
+            "width": 1080, "height": 1920, "avg_frame_rate": "30000/1001", "r_frame_rate": "30/1",
+            "time_base": "1/15360", "bit_rate": "700000",
+        },
+        {"codec_type": "audio", "codec_name": "aac", "sample_rate": "48000", "channels": 2, "bit_rate": "96000"},
+    ],
+}
+
+# pts_time,size,pos,flags (ordem de demux)
+PACKETS = (
+    "0.000000,1000,48,K__\n0.033333,200,1048,___\n2.002000,900,1248,K__\n"
+    "N/A,50,2148,K__\n2.035000,100,2198,___\n4.004000,800,2298,K_\n"
+)
+
+
+def fake_ffprobe(probe: MediaProbe):
+    """Substitui o subprocess do ffprobe por saídas fixas"""
+    async def run(args):
+        probe.probes += 1
+        return PACKETS if "-show_entries" in args else json.dumps(FFPROBE_OUTPUT)
+    return patch.object(probe, "_run_ffprobe", side_effect=run)
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"video")
+    return str(path)
+
+
+class TestParsing:
+    """Testes da normalização da saída do ffprobe"""
+
+    def test_parse_probe_output(self):
+        info = parse_probe_output(FFPROBE_OUTPUT)
+        assert info["duration"] == 12.5
+        assert info["fps"] == 29.97
+        assert info["container"].startswith("mov,mp4")
+        assert (info["video_codec"], info["audio_codec"]) == ("h264", "aac")
+        assert info["audio"]["sample_rate"] == 48000
+        assert info["video"]["pix_fmt"] == "yuv420p"
+
+    def test_no_video_stream(self):
+        with pytest.raises(ValueError):
+            parse_probe_output({"format": {}, "streams": [{"codec_type": "audio"}]})
+
+    def test_parse_packet_index(self):
+        index = parse_packet_index(PACKETS)
+        assert index.times == [0.0, 2.002, 4.004]
+        assert index.records["offset"].tolist() == [48, 1248, 2298]
+        # Tamanho do GOP: pacotes e bytes até o próximo keyframe
+        assert index.records["packets"].tolist() == [2, 3, 1]
+        assert index.records["bytes"].tolist() == [1200, 1050, 800]
+
+    def test_packed_round_trip(self):
+        index = parse_packet_index(PACKETS)
+        packed = index.pack()
+        assert packed["count"] == 3
+        assert isinstance(packed["data"], str)
+        json.dumps(packed)
+        assert KeyframeIndex.unpack(packed).records.tolist() == index.records.tolist()
+        assert info_keyframes({"keyframe_index": packed}) == [0.0, 2.002, 4.004]
+
+    def test_seek(self):
+        index = parse_packet_index(PACKETS)
+        assert index.seek(3.0) == (2.002, 1248)
+        assert index.seek(4.004) == (4.004, 2298)
+        assert parse_packet_index("").seek(1.0) is None
+
+    def test_negative_pts(self):
+        # Edit lists podem gerar pts negativo no primeiro keyframe
+        index = parse_packet_index("-0.042000,100,48,K__\n0.000000,50,148,___\n2.002000,80,198,K__")
+        assert index.times == [-0.042, 2.002]
+        assert index.seek(0.0) == (-0.042, 48)
+        assert index.seek(-1.0) is None
+
+    def test_full_precision_pts(self):
+        # pts com precisão de microssegundos (pontos de corte do smart-cut)
+        index = parse_packet_index("0.000000,10,0,K__\n1.001001,10,10,K__")
+        assert index.times == [0.0, 1.001001]
+        assert KeyframeIndex.unpack(index.pack()).times == [0.0, 1.001001]
+
+
+class TestMediaProbe:
+    """Testes da memoização por (path, size, mtime)"""
+
+    async def test_probe_is_memoized(self, video_file):
+        probe = MediaProbe()
+        with fake_ffprobe(probe):
+            first = await probe.probe(video_file)
+            second = await probe.probe(video_file)
+        assert first is second
+        assert probe.probes == 1
+        assert (probe.hits, probe.misses) == (1, 1)
+
+    async def test_changed_file_is_probed_again(self, video_file):
+        probe = MediaProbe()
+        with fake_ffprobe(probe):
+            await probe.probe(video_file)
+            with open(video_file, "ab") as f:
+                f.write(b"more")
+            await probe.probe(video_file)
+        assert probe.probes == 2
+
+    async def test_keyframes_scanned_once(self, video_file):
+        probe = MediaProbe()
+        with fake_ffprobe(probe):
+            assert await probe.keyframes(video_file) == [0.0, 2.002, 4.004]
+            info = await probe.media_info(video_file)
+        assert info_keyframes(info) == [0.0, 2.002, 4.004]
+        assert probe.probes == 2
+
+    def test_lru_bound(self, tmp_path):
+        probe = MediaProbe(max_entries=2)
+        for i in range(3):
+            path = tmp_path / f"{i}.mp4"
+            path.write_bytes(b"x")
+            probe._put(probe.file_key(str(path)), {"i": i})
+        assert len(probe._entries) == 2
+
+    def test_remember_checks_version_and_size(self, video_file):
+        probe = MediaProbe()
+        info = {**parse_probe_output(FFPROBE_OUTPUT), "keyframe_index": parse_packet_index("").pack()}
+        assert probe.remember(video_file, info) is True
+        assert probe.remember(video_file, {**info, "size": 999}) is False
+        assert probe.remember(video_file, {**info, "version": 0}) is False
+
+
+class TestForVideo:
+    """Testes do índice persistido em videos.metadata"""
+
+    def build_db(self, metadata):
+        table = MagicMock()
+        select = table.select.return_value.eq.return_value.limit.return_value
+        select.execute = AsyncMock(return_value=MagicMock(data=[{"metadata": metadata}]))
+        table.update.return_value.eq.return_value.execute = AsyncMock()
+        db = MagicMock()
+        db.table.return_value = table
+        return db, table
+
+    async def test_uses_persisted_media_info(self, video_file):
+        probe = MediaProbe()
+        media_info = {**parse_probe_output(FFPROBE_OUTPUT), "keyframe_index": parse_packet_index("0.0,10,0,K_").pack()}
+        db, table = self.build_db({"duration": 12.5, "media_info": media_info})
+        with fake_ffprobe(probe), patch("app.database.get_async_supabase", return_value=db):
+            info = await probe.for_video(video_file, "vid-1")
+        assert info_keyframes(info) == [0.0]
+        assert probe.probes == 0
+        table.update.assert_not_called()
+
+    async def test_probes_and_persists_when_missing(self, video_file):
+        probe = MediaProbe()
+        db, table = self.build_db({"duration": 12.5})
+        with fake_ffprobe(probe), patch("app.database.get_async_supabase", return_value=db):
+            info = await probe.for_video(video_file, "vid-1")
+            again = await probe.for_video(video_file, "vid-1")
+        assert again is info
+        assert probe.probes == 2
+        update = table.update.call_args.args[0]
+        assert update["metadata"]["duration"] == 12.5
+        assert info_keyframes(update["metadata"]["media_info"]) == [0.0, 2.002, 4.004]
+
+    async def test_stale_layout_is_probed_again(self, video_file):
+        probe = MediaProbe()
+        media_info = {**parse_probe_output(FFPROBE_OUTPUT), "version": 1, "keyframes": [0.0]}
+        db, table = self.build_db({"media_info": media_info})
+        with fake_ffprobe(probe), patch("app.database.get_async_supabase", return_value=db):
+            info = await probe.for_video(video_file, "vid-1")
+        assert info_keyframes(info) == [0.0, 2.002, 4.004]
+        assert probe.probes == 2
@@ -0,0 +1,160 @@
+"""
+Testes dos proxies de edição (app/services/media_proxy.py)
+"""
+import asyncio
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+import pytest
+from app.services import media_proxy as media_proxy_module
+from app.services.ffmpeg_runner import FFmpegError
+from app.services.ffmpeg_scheduler import FFmpegScheduler
+from app.services.media_proxy import MediaProxy, AUDIO_FILE, VIDEO_FILE
+
+INFO = {"duration": 12.5, "width": 1920, "height": 1080, "audio_codec": "aac"}
+
+
+def fake_ffmpeg(commands, delay=0.0):
+    """run_ffmpeg falso: registra o comando e cria as saídas (.mp4 e .wav)"""
+    async def run(cmd, **kwargs):
+        commands.append(cmd)
+        await asyncio.sleep(delay)
+        for arg in cmd:
+            if arg.endswith((".mp4", ".wav")) and arg != cmd[cmd.index("-i") + 1]:
+                Path(arg).write_bytes(b"x" * 10)
+    return run
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MediaProxy(root=str(tmp_path / "proxies"), height=360, video_bitrate_kbps=500)
+
+
+@pytest.fixture
+def probe():
+    with patch.object(media_proxy_module.media_probe, "probe", AsyncMock(return_value=INFO)) as mock_probe:
+        yield mock_probe
+
+
+class TestProxyCommand:
+    """Testes do comando de geração (um decode, duas saídas)"""
+
+    def test_single_decode_two_outputs(self, store, tmp_path):
+        cmd = store.build_command("src.mp4", tmp_path, has_audio=True)
+        assert cmd.count("-i") == 1
+        assert "scale=-2:min(360\\,ih)" in cmd
+        assert cmd[cmd.index("-maxrate") + 1] == "500k"
+        assert ["-ar", "16000", "-ac", "1"] == cmd[cmd.index("-ar"):cmd.index("-ar") + 4]
+        assert cmd[-1].endswith(AUDIO_FILE)
+
+    def test_no_audio_output_without_audio(self, store, tmp_path):
+        cmd = store.build_command("src.mp4", tmp_path, has_audio=False)
+        assert "pcm_s16le" not in cmd
+        assert cmd[-1].endswith(VIDEO_FILE)
+
+
+class TestProxyGeneration:
+    """Testes da geração em background, espera e remoção da fonte"""
+
+    async def test_schedule_generates_and_removes_source(self, store, probe, tmp_path):
+        source = tmp_path / "upload.mp4"
+        source.write_bytes(b"video")
+        commands = []
+        with patch.object(media_proxy_module, "run_ffmpeg", side_effect=fake_ffmpeg(commands)):
+            proxy = await store.schedule("vid-1", str(source), remove_source=True)
+
+        assert proxy.video.read_bytes() == b"x" * 10
+        assert proxy.audio.name == AUDIO_FILE
+        assert (proxy.duration, proxy.width, proxy.height) == (12.5, 1920, 1080)
+        assert not source.exists()
+        assert store.get("vid-1") == proxy
+        # Arquivos temporários foram publicados
+        assert sorted(p.name for p in store.proxy_dir("vid-1").iterdir()) == [AUDIO_FILE, "proxy.json", VIDEO_FILE]
+
+    async def test_ensure_waits_for_scheduled_generation(self, store, probe, tmp_path):
+        source = tmp_path / "upload.mp4"
+        source.write_bytes(b"video")
+        commands = []
+        with patch.object(media_proxy_module, "run_ffmpeg", side_effect=fake_ffmpeg(commands, delay=0.05)), \
+             patch.object(media_proxy_module.media_cache, "fetch", AsyncMock()) as mock_fetch:
+            store.schedule("vid-1", str(source))
+            proxies = await asyncio.gather(store.ensure("vid-1", "http://x"), store.ensure("vid-1", "http://x"))
+
+        assert len(commands) == 1
+        assert proxies[0] == proxies[1]
+        mock_fetch.assert_not_awaited()
+
+    async def test_missing_proxy_is_generated_on_demand(self, store, probe, tmp_path):
+        source = tmp_path / "cached.mp4"
+        source.write_bytes(b"video")
+        commands = []
+        with patch.object(media_proxy_module, "run_ffmpeg", side_effect=fake_ffmpeg(commands)), \
+             patch.object(media_proxy_module.media_cache, "fetch", AsyncMock(return_value=source)):
+            await store.ensure("vid-1", "http://x")
+            await store.ensure("vid-1", "http://x")
+
+        assert len(commands) == 1
+        assert store.get_stats()["on_demand"] == 1
+        assert store.get_stats()["hits"] == 1
+        # Fonte do cache de mídia não é removida
+        assert source.exists()
+
+    async def test_on_demand_source_is_leased_during_generation(self, store, probe, tmp_path):
+        source = tmp_path / "cached.mp4"
+        source.write_bytes(b"video")
+        leases = []
+
+        async def run(cmd, **kwargs):
+            leases.append(dict(media_proxy_module.media_cache._leases))
+            await fake_ffmpeg([])(cmd)
+
+        with patch.object(media_proxy_module, "run_ffmpeg", side_effect=run), \
+             patch.object(media_proxy_module.media_cache, "fetch", AsyncMock(return_value=source)):
+            await store.ensure("vid-1", "http://x")
+
+        # Fonte não pode ser despejada do cache de mídia durante o FFmpeg
+        assert leases == [{str(source): 1}]
+        assert str(source) not in media_proxy_module.media_cache._leases
+
+    async def test_generation_runs_in_ffmpeg_scheduler_slot(self, store, probe, tmp_path):
+        source = tmp_path / "upload.mp4"
+        source.write_bytes(b"video")
+        scheduler = FFmpegScheduler(slots=1)
+        running = []
+
+        async def run(cmd, **kwargs):
+            running.append(scheduler.get_stats()["running"])
+            await fake_ffmpeg([])(cmd)
+
+        with patch.object(media_proxy_module, "run_ffmpeg", side_effect=run), \
+             patch.object(media_proxy_module, "ffmpeg_scheduler", scheduler):
+            await store.schedule("vid-1", str(source))
+
+        # Proxy ocupa um slot do agendador (conta no orçamento de CPU)
+        assert running == [1]
+        assert scheduler.get_stats()["completed"] == 1
+        await scheduler.shutdown()
+
+    async def test_failure_leaves_nothing_behind(self, store, probe, tmp_path):
+        source = tmp_path / "upload.mp4"
+        source.write_bytes(b"video")
+        with patch.object(media_proxy_module, "run_ffmpeg", AsyncMock(side_effect=FFmpegError("boom"))):
+            with pytest.raises(FFmpegError):
+                await store.schedule("vid-1", str(source), remove_source=True)
+
+        assert store.get("vid-1") is None
+        assert not store.proxy_dir("vid-1").exists()
+        assert not source.exists()
+        assert store.get_stats()["failed"] == 1
+
+    async def test_lru_eviction_skips_leased(self, tmp_path, probe):
+        store = MediaProxy(root=str(tmp_path / "proxies"), max_bytes=45)
+        commands = []
+        with patch.object(media_proxy_module, "run_ffmpeg", side_effect=fake_ffmpeg(commands)), \
+             patch.object(media_proxy_module.media_cache, "fetch", AsyncMock(return_value=tmp_path / "src.mp4")):
+            async with store.open("vid-1", "http://x"):
+                await store.ensure("vid-2", "http://x")
+                await store.ensure("vid-3", "http://x")
+            assert store.get("vid-1") is not None
+            assert store.get("vid-2") is None
+            assert store.get("vid-3") is not None
+
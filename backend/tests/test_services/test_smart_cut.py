@@ -0,0 +1,219 @@
+"""
+Testes do smart-cut (app/services/smart_cut.py)
+"""
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+from app.services import smart_cut as smart_cut_module
+from app.services.ffmpeg_runner import FFmpegError
+from app.services.media_probe import parse_packet_index
+from app.services.smart_cut import (
+    COPY,
+    ENCODE,
+    Piece,
+    encoder_args,
+    piece_command,
+    plan_pieces,
+    smart_cut,
+    supports_smart_cut,
+)
+from app.services.job_workspace import WorkspaceManager
+from app.services.video_processing import VideoProcessingService
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+INFO = {
+    "duration": 10.0,
+    "fps": 25.0,
+    "video_codec": "h264",
+    "audio_codec": "aac",
+    "video": {"pix_fmt": "yuv420p", "profile": "High", "time_base": "1/12800"},
+    "audio": {"sample_rate": 48000, "channels": 2},
+}
+
+
+def fake_ffmpeg(commands):
+    """run_ffmpeg falso: registra o comando e cria o arquivo de saída"""
+    async def run(cmd, **kwargs):
+        commands.append(cmd)
+        Path(cmd[-1]).write_bytes(b"piece")
+    return run
+
+
+class TestPlanPieces:
+    """Testes do plano copy/encode por trecho"""
+
+    def test_edges_are_encoded_middle_copied(self):
+        assert plan_pieces([(1.0, 7.0)], KEYFRAMES) == [
+            Piece(1.0, 2.0, ENCODE), Piece(2.0, 6.0, COPY), Piece(6.0, 7.0, ENCODE)
+        ]
+
+    def test_keyframe_aligned_range_is_pure_copy(self):
+        assert plan_pieces([(2.0, 6.0)], KEYFRAMES) == [Piece(2.0, 6.0, COPY)]
+
+    def test_near_keyframe_within_half_frame(self):
+        assert plan_pieces([(2.01, 6.0)], KEYFRAMES, fps=25.0) == [Piece(2.0, 6.0, COPY)]
+
+    def test_range_inside_one_gop_is_encoded(self):
+        assert plan_pieces([(2.5, 3.5)], KEYFRAMES) == [Piece(2.5, 3.5, ENCODE)]
+
+    def test_range_with_single_keyframe_is_encoded(self):
+        assert plan_pieces([(1.5, 2.5)], KEYFRAMES) == [Piece(1.5, 2.5, ENCODE)]
+
+    def test_multiple_segments_keep_order(self):
+        pieces = plan_pieces([(0.0, 4.0), (5.0, 9.0)], KEYFRAMES)
+        assert [(p.start, p.end, p.mode) for p in pieces] == [
+            (0.0, 4.0, COPY), (5.0, 6.0, ENCODE), (6.0, 8.0, COPY), (8.0, 9.0, ENCODE)
+        ]
+
+    def test_supports_smart_cut(self):
+        assert supports_smart_cut(INFO, KEYFRAMES)
+        assert not supports_smart_cut(INFO, [])
+        assert not supports_smart_cut({**INFO, "video_codec": "vp9"}, KEYFRAMES)
+        assert supports_smart_cut({**INFO, "audio_codec": None}, KEYFRAMES)
+        with patch.object(smart_cut_module.settings, "smart_cut_enabled", False):
+            assert not supports_smart_cut(INFO, KEYFRAMES)
+
+
+class TestCommands:
+    """Testes dos comandos de cada pedaço"""
+
+    def test_encoder_args_match_source(self):
+        args = encoder_args(INFO)
+        assert args[:2] == ["-c:v", "libx264"]
+        assert ["-pix_fmt", "yuv420p"] == args[2:4]
+        assert "-profile:v" in args and "high" in args
+        assert ["-c:a", "aac", "-ar", "48000", "-ac", "2"] == args[-6:]
+
+    def test_copy_piece(self):
+        cmd = piece_command("src.mp4", Piece(2.0, 6.0, COPY), "out.mp4", INFO)
+        assert cmd[cmd.index("-ss") + 1] == "2.000000"
+        assert cmd[cmd.index("-t") + 1] == "4.000000"
+        assert ["-c", "copy"] == cmd[cmd.index("-c"):cmd.index("-c") + 2]
+        assert cmd[cmd.index("-video_track_timescale") + 1] == "12800"
+        # Parâmetros (SPS/PPS) repetidos em cada keyframe do pedaço
+        assert cmd[cmd.index("-bsf:v") + 1] == "h264_mp4toannexb,dump_extra=freq=keyframe"
+
+    def test_encode_piece(self):
+        cmd = piece_command("src.mp4", Piece(1.0, 2.0, ENCODE), "out.mp4", INFO)
+        assert "libx264" in cmd
+        assert "-c" not in cmd
+        assert "-bsf:v" in cmd
+
+    def test_hevc_piece_keeps_parameter_sets(self):
+        cmd = piece_command("src.mp4", Piece(2.0, 6.0, COPY), "out.mp4", {**INFO, "video_codec": "hevc"})
+        assert cmd[cmd.index("-bsf:v") + 1] == "hevc_mp4toannexb,dump_extra=freq=keyframe"
+
+
+class TestSmartCut:
+    """Testes da execução e do concat"""
+
+    async def test_pieces_are_concatenated(self, tmp_path):
+        commands = []
+        output = tmp_path / "out.mp4"
+        with patch.object(smart_cut_module, "run_ffmpeg", side_effect=fake_ffmpeg(commands)):
+            await smart_cut("src.mp4", str(output), [(1.0, 7.0)], INFO, KEYFRAMES, work_dir=str(tmp_path))
+
+        assert len(commands) == 4
+        assert commands[-1][commands[-1].index("-f") + 1] == "concat"
+        assert output.exists()
+        # Diretório temporário dos pedaços é removido
+        assert [p.name for p in tmp_path.iterdir()] == ["out.mp4"]
+
+    async def test_single_piece_is_moved(self, tmp_path):
+        commands = []
+        output = tmp_path / "out.mp4"
+        with patch.object(smart_cut_module, "run_ffmpeg", side_effect=fake_ffmpeg(commands)):
+            await smart_cut("src.mp4", str(output), [(2.0, 6.0)], INFO, KEYFRAMES, work_dir=str(tmp_path))
+        assert len(commands) == 1
+        assert output.read_bytes() == b"piece"
+
+
+class TestCutSegments:
+    """Testes da escolha smart-cut × re-encode no VideoProcessingService"""
+
+    def build_service(self, tmp_path):
+        with patch("app.services.video_processing.settings") as mock_settings:
+            mock_settings.temp_video_path = str(tmp_path)
+            return VideoProcessingService()
+
+    async def test_uses_smart_cut_when_supported(self, tmp_path):
+        service = self.build_service(tmp_path)
+        with patch("app.services.video_processing.smart_cut", AsyncMock(return_value="out.mp4")) as mock_cut, \
+             patch.object(service, "render", AsyncMock()) as mock_render:
+            await service.cut_segments("src.mp4", "out.mp4", [(1.0, 7.0)], {**INFO, "keyframes": KEYFRAMES})
+        mock_cut.assert_awaited_once()
+        mock_render.assert_not_awaited()
+
+    async def test_falls_back_to_render(self, tmp_path):
+        service = self.build_service(tmp_path)
+        info = {**INFO, "video_codec": "vp9", "keyframes": KEYFRAMES}
+        with patch("app.services.video_processing.smart_cut", AsyncMock()) as mock_cut, \
+             patch.object(service, "render", AsyncMock(return_value="out.mp4")) as mock_render:
+            await service.cut_segments("src.mp4", "out.mp4", [(1.0, 7.0)], info)
+        mock_cut.assert_not_awaited()
+        mock_render.assert_awaited_once()
+
+    async def test_non_aac_audio_falls_back_to_render(self, tmp_path):
+        service = self.build_service(tmp_path)
+        for codec in ("mp3", "opus", "ac3", "pcm_s16le"):
+            info = {**INFO, "audio_codec": codec, "keyframes": KEYFRAMES}
+            assert not supports_smart_cut(info, KEYFRAMES)
+            # Bordas seriam AAC e os trechos copiados não: concat misturaria codecs
+            with patch("app.services.video_processing.smart_cut", AsyncMock()) as mock_cut, \
+                 patch.object(service, "render", AsyncMock(return_value="out.mp4")) as mock_render:
+                await service.cut_segments("src.mp4", "out.mp4", [(1.0, 7.0)], info)
+            mock_cut.assert_not_awaited()
+            mock_render.assert_awaited_once()
+
+    async def test_smart_cut_failure_falls_back_to_render(self, tmp_path):
+        service = self.build_service(tmp_path)
+        with patch("app.services.video_processing.smart_cut", AsyncMock(side_effect=FFmpegError("concat"))), \
+             patch.object(service, "render", AsyncMock(return_value="out.mp4")) as mock_render:
+            await service.cut_segments("src.mp4", "out.mp4", [(1.0, 7.0)], {**INFO, "keyframes": KEYFRAMES})
+        mock_render.assert_awaited_once()
+
+    def trim_setup(self, tmp_path):
+        """Fonte real (tamanho para a reserva) e workspaces em tmp_path"""
+        source = tmp_path / "src.mp4"
+        source.write_bytes(b"video")
+        workspaces = WorkspaceManager(root=str(tmp_path / "jobs"), min_free_bytes=0)
+        return str(source), patch("app.services.video_processing.workspace_manager", workspaces)
+
+    async def test_trim_smart_cut_failure_falls_back_to_render(self, tmp_path):
+        service = self.build_service(tmp_path)
+        source, workspaces = self.trim_setup(tmp_path)
+        info = {**INFO, "keyframes": KEYFRAMES}
+        with workspaces, patch.object(service, "get_video_info", AsyncMock(return_value=info)), \
+             patch("app.services.video_processing.smart_cut", AsyncMock(side_effect=FFmpegError("concat"))), \
+             patch.object(service, "render", AsyncMock(return_value="out.mp4")) as mock_render:
+            assert await service.trim_video(source, "out.mp4", 1.0, 7.0) == "out.mp4"
+        assert mock_render.await_args.args[2:4] == ([(1.0, 7.0)], 10.0)
+
+    async def test_trim_pieces_go_in_job_workspace(self, tmp_path):
+        service = self.build_service(tmp_path)
+        source, workspaces = self.trim_setup(tmp_path)
+        info = {**INFO, "keyframes": KEYFRAMES}
+        with workspaces as manager, patch.object(service, "get_video_info", AsyncMock(return_value=info)), \
+             patch("app.services.video_processing.smart_cut", AsyncMock(return_value="out.mp4")) as mock_cut:
+            await service.trim_video(source, "out.mp4", 1.0, 7.0, video_id="vid-1")
+
+        kwargs = mock_cut.await_args.kwargs
+        assert Path(kwargs["work_dir"]).parent == manager.root
+        assert Path(kwargs["work_dir"]).name.startswith("vid-1-")
+        assert kwargs["scratch_dir"] == kwargs["work_dir"]
+        # Workspace com reserva aberto para o corte e removido ao final
+        assert manager.get_stats()["opened"] == 1
+        assert list(manager.root.iterdir()) == []
+
+    async def test_trim_reads_persisted_keyframe_index(self, tmp_path):
+        service = self.build_service(tmp_path)
+        source, workspaces = self.trim_setup(tmp_path)
+        packets = "".join(f"{t},100,{int(t * 1000)},K_\n" for t in KEYFRAMES)
+        info = {**INFO, "keyframe_index": parse_packet_index(packets).pack()}
+        with workspaces, patch.object(service, "get_video_info", AsyncMock(return_value=info)) as mock_info, \
+             patch("app.services.video_processing.media_probe.keyframes", AsyncMock()) as mock_scan, \
+             patch("app.services.video_processing.smart_cut", AsyncMock(return_value="out.mp4")) as mock_cut:
+            await service.trim_video(source, "out.mp4", 1.0, 7.0, video_id="vid-1")
+        mock_info.assert_awaited_once_with(source, "vid-1")
+        mock_scan.assert_not_awaited()
+        assert mock_cut.await_args.args[4] == KEYFRAMES